@@ -0,0 +1,25 @@
+"""Kennzahlen für den Analyse-Tab und für Berichte, ohne Streamlit."""
+from datetime import datetime
+import pandas as pd
+
+
+def kennzahlen(songs_df, aggregat, heute=None):
+    """Alle KPIs des Analyse-Tabs als Dictionary.
+
+    ``aggregat`` ist das ``HistoryAggregate`` der History; die Songliste
+    liefert Reifegrad, Pausen und nie gespielte Songs.
+    """
+    heute = pd.Timestamp(heute or datetime.today())
+    top = aggregat.meistgespielt(1)
+    pausen = (heute - songs_df.set_index('Songtitel')['Zuletzt_gespielt']).dt.days
+    return {
+        "anzahl_proben": aggregat.anzahl_proben,
+        "songs_pro_probe": aggregat.songs_pro_probe,
+        "meistgespielt": top.index[0] if not top.empty else "-",
+        "laengste_pause_song": pausen.idxmax() if not pausen.empty else "-",
+        "laengste_pause_tage": int(pausen.max()) if not pausen.empty else 0,
+        "avg_reifegrad": float(songs_df['Reifegrad'].mean()) if not songs_df.empty else 0.0,
+        "reifegrad_unter_4": int((songs_df['Reifegrad'] < 4).sum()),
+        "nie_gespielt": int(songs_df['Anzahl_gespielt'].eq(0).sum()),
+        "anzahl_songs": len(songs_df),
+    }
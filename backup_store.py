@@ -0,0 +1,274 @@
+"""Inhaltsadressierter Backup-Speicher mit Aufbewahrungsregeln.
+
+Jede Datei wird in Blöcke fester Größe zerlegt, die unter ihrem SHA-256
+komprimiert in ``<backup_dir>/objekte`` liegen. Ein Snapshot ist nur noch
+eine kleine JSON-Liste der Blöcke je Datei. Unveränderte Dateien werden am
+Dateistand erkannt und gar nicht gelesen, unveränderte Blöcke nicht erneut
+geschrieben. Bei der nur wachsenden History kommt pro Backup also nur der
+letzte Block hinzu.
+
+Wie viele Snapshots jeden Block benutzen, steht in ``referenzen.json``. Beim
+Löschen eines Snapshots werden nur dessen Blöcke heruntergezählt und die
+unbenutzten entfernt, ohne die übrigen Snapshots oder alle Objekte zu lesen.
+Die Zählung wird vor einem neuen Snapshot erhöht und erst nach dem Löschen
+gesenkt; nach einem Abbruch ist sie also höchstens zu hoch.
+"""
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from config import APP_CONFIG
+import mandant
+
+BLOCKGROESSE = 1024 * 1024
+
+
+class BackupStore:
+    """Snapshots von Dateien als Listen inhaltsadressierter Blöcke"""
+
+    def __init__(self, verzeichnis=None):
+        self.verzeichnis = verzeichnis or APP_CONFIG["files"]["backup_dir"]
+        self.objekte = os.path.join(self.verzeichnis, "objekte")
+        self.snapshot_dir = os.path.join(self.verzeichnis, "snapshots")
+        self.referenz_datei = os.path.join(self.verzeichnis, "referenzen.json")
+        self._lock = threading.Lock()
+
+    # --- Objekte ---
+    def _objekt_pfad(self, hash_):
+        return os.path.join(self.objekte, hash_[:2], hash_)
+
+    def _schreibe_objekt(self, daten):
+        hash_ = hashlib.sha256(daten).hexdigest()
+        pfad = self._objekt_pfad(hash_)
+        if not os.path.exists(pfad):
+            os.makedirs(os.path.dirname(pfad), exist_ok=True)
+            tmp = f"{pfad}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(zlib.compress(daten, 6))
+            os.replace(tmp, pfad)
+        return hash_
+
+    def _lese_objekt(self, hash_):
+        with open(self._objekt_pfad(hash_), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    # --- Snapshots ---
+    def snapshots(self):
+        """IDs aller Snapshots, älteste zuerst"""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.snapshot_dir) if name.endswith(".json"))
+
+    def lade_snapshot(self, snapshot_id):
+        with open(os.path.join(self.snapshot_dir, f"{snapshot_id}.json"), encoding='utf-8') as f:
+            return json.load(f)
+
+    def sichere(self, dateien):
+        """Legt einen Snapshot der Dateien an; schreibt nur neue Blöcke.
+
+        Liefert die Snapshot-ID. Hat sich seit dem letzten Snapshot nichts
+        geändert, wird kein neuer angelegt und dessen ID zurückgegeben.
+        """
+        with self._lock:
+            referenzen = self._lade_referenzen()
+            vorher = self.snapshots()
+            letzter = self.lade_snapshot(vorher[-1])["dateien"] if vorher else {}
+            eintraege = {}
+            for pfad in dateien:
+                if not os.path.exists(pfad):
+                    continue
+                stat = os.stat(pfad)
+                stand = [stat.st_mtime_ns, stat.st_size]
+                alt = letzter.get(pfad)
+                if alt is not None and alt["stand"] == stand:
+                    eintraege[pfad] = alt
+                    continue
+                bloecke = []
+                with open(pfad, 'rb') as f:
+                    while True:
+                        block = f.read(BLOCKGROESSE)
+                        if not block:
+                            break
+                        bloecke.append(self._schreibe_objekt(block))
+                eintraege[pfad] = {"stand": stand, "bloecke": bloecke}
+            if vorher and _inhalt(eintraege) == _inhalt(letzter):
+                return vorher[-1]
+            referenzen.update(_bloecke(eintraege))
+            self._speichere_referenzen(referenzen)
+            snapshot_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            pfad = os.path.join(self.snapshot_dir, f"{snapshot_id}.json")
+            with open(pfad + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({"erstellt": datetime.now().isoformat(), "dateien": eintraege}, f)
+            os.replace(pfad + ".tmp", pfad)
+            return snapshot_id
+
+    def stelle_wieder_her(self, snapshot_id, ziel_verzeichnis=None, dateien=()):
+        """Schreibt die Dateien eines Snapshots zurück (oder in ``ziel_verzeichnis``).
+
+        ``dateien`` sind alle Dateien des gesicherten Datenstands (``backend.dateien()``).
+        Beim Zurückschreiben an die Originalpfade werden die davon gelöscht, die
+        der Snapshot nicht enthält, etwa ein erst danach angelegtes Ereignisprotokoll;
+        sonst kämen neuere Änderungen auf den alten Stand.
+        """
+        eintraege = self.lade_snapshot(snapshot_id)["dateien"]
+        geschrieben = []
+        for pfad, eintrag in eintraege.items():
+            ziel = os.path.join(ziel_verzeichnis, os.path.basename(pfad)) if ziel_verzeichnis else pfad
+            if os.path.dirname(ziel):
+                os.makedirs(os.path.dirname(ziel), exist_ok=True)
+            with open(ziel + ".tmp", 'wb') as f:
+                for hash_ in eintrag["bloecke"]:
+                    f.write(self._lese_objekt(hash_))
+            os.replace(ziel + ".tmp", ziel)
+            geschrieben.append(ziel)
+        if not ziel_verzeichnis:
+            for pfad in dateien:
+                if pfad not in eintraege and os.path.exists(pfad):
+                    os.remove(pfad)
+        return geschrieben
+
+    # --- Aufbewahrung ---
+    def wende_aufbewahrung_an(self, letzte=None, stuendlich=None, taeglich=None, woechentlich=None):
+        """Behält die letzten Snapshots sowie je Stunde/Tag/Woche den neuesten.
+
+        Ohne Angaben gelten die Werte aus ``APP_CONFIG["backup"]``. Der neueste
+        Snapshot bleibt immer erhalten. Liefert die gelöschten Snapshot-IDs.
+        """
+        regeln = APP_CONFIG["backup"]
+        letzte = regeln["letzte"] if letzte is None else letzte
+        stufen = [
+            ('%Y%m%d%H', regeln["stuendlich"] if stuendlich is None else stuendlich),
+            ('%Y%m%d', regeln["taeglich"] if taeglich is None else taeglich),
+            ('%G%V', regeln["woechentlich"] if woechentlich is None else woechentlich),
+        ]
+        with self._lock:
+            alle = self.snapshots()
+            if not alle:
+                return []
+            behalten = {alle[-1]} | set(alle[-letzte:] if letzte > 0 else [])
+            for format_, anzahl in stufen:
+                gesehen = set()
+                for snapshot_id in reversed(alle):
+                    if len(gesehen) >= anzahl:
+                        break
+                    periode = datetime.strptime(snapshot_id, '%Y%m%d_%H%M%S_%f').strftime(format_)
+                    if periode not in gesehen:
+                        gesehen.add(periode)
+                        behalten.add(snapshot_id)
+            geloescht = [s for s in alle if s not in behalten]
+            if not geloescht:
+                return []
+            referenzen = self._lade_referenzen()
+            frei = Counter()
+            for snapshot_id in geloescht:
+                frei.update(_bloecke(self.lade_snapshot(snapshot_id)["dateien"]))
+                os.remove(os.path.join(self.snapshot_dir, f"{snapshot_id}.json"))
+            referenzen.subtract(frei)
+            for hash_ in frei:
+                if referenzen[hash_] <= 0:
+                    del referenzen[hash_]
+                    if os.path.exists(self._objekt_pfad(hash_)):
+                        os.remove(self._objekt_pfad(hash_))
+            self._speichere_referenzen(referenzen)
+            return geloescht
+
+    # --- Referenzzählung ---
+    def _lade_referenzen(self):
+        """Anzahl der Snapshots je Block.
+
+        Fehlt ``referenzen.json`` (ältere Backups), wird sie einmal aus allen
+        Snapshots aufgebaut; dabei fliegen auch schon verwaiste Objekte.
+        """
+        if os.path.exists(self.referenz_datei):
+            with open(self.referenz_datei, encoding='utf-8') as f:
+                return Counter(json.load(f))
+        referenzen = Counter()
+        for snapshot_id in self.snapshots():
+            referenzen.update(_bloecke(self.lade_snapshot(snapshot_id)["dateien"]))
+        self._entferne_verwaiste_objekte(referenzen)
+        self._speichere_referenzen(referenzen)
+        return referenzen
+
+    def _speichere_referenzen(self, referenzen):
+        os.makedirs(self.verzeichnis, exist_ok=True)
+        with open(self.referenz_datei + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(dict(referenzen), f)
+        os.replace(self.referenz_datei + ".tmp", self.referenz_datei)
+
+    def _entferne_verwaiste_objekte(self, benutzt):
+        if not os.path.isdir(self.objekte):
+            return
+        for unterordner in os.listdir(self.objekte):
+            ordner = os.path.join(self.objekte, unterordner)
+            for hash_ in os.listdir(ordner):
+                if hash_ not in benutzt:
+                    os.remove(os.path.join(ordner, hash_))
+
+
+def _bloecke(eintraege):
+    """Die Blöcke eines Snapshots, jeder nur einmal"""
+    return {hash_ for e in eintraege.values() for hash_ in e["bloecke"]}
+
+
+def _inhalt(eintraege):
+    return {pfad: e["bloecke"] for pfad, e in eintraege.items()}
+
+
+_stores = {}
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+# Je Backup-Verzeichnis (also je Band) höchstens ein wartender Auftrag
+_ausstehend = {}
+_ausstehend_lock = threading.Lock()
+
+
+def get_backup_store():
+    """Backup-Speicher der aktiven Band"""
+    verzeichnis = mandant.pfad(APP_CONFIG["files"]["backup_dir"])
+    if verzeichnis not in _stores:
+        _stores[verzeichnis] = BackupStore(verzeichnis)
+    return _stores[verzeichnis]
+
+
+def sichere_im_hintergrund(dateien, vorbereitung=None):
+    """Erstellt Snapshot und Aufbewahrung außerhalb des Request-Threads.
+
+    Wartet für dieselbe Band bereits ein Backup auf seinen Start, wird kein
+    weiteres eingereiht: es sichert ohnehin den dann aktuellen Stand.
+    Liefert ein Future.
+    """
+    store = get_backup_store()
+
+    def auftrag():
+        with _ausstehend_lock:
+            _ausstehend.pop(store.verzeichnis, None)
+        if vorbereitung is not None:
+            vorbereitung()
+        snapshot_id = store.sichere(dateien)
+        store.wende_aufbewahrung_an()
+        return snapshot_id
+
+    with _ausstehend_lock:
+        if store.verzeichnis not in _ausstehend:
+            _ausstehend[store.verzeichnis] = _executor.submit(auftrag)
+        return _ausstehend[store.verzeichnis]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Backups auflisten und wiederherstellen")
+    parser.add_argument("--wiederherstellen", metavar="SNAPSHOT", help="Snapshot zurückschreiben")
+    parser.add_argument("--ziel", help="Verzeichnis statt der Originalpfade")
+    args = parser.parse_args()
+    store = get_backup_store()
+    if args.wiederherstellen:
+        from storage import get_backend
+        for pfad in store.stelle_wieder_her(args.wiederherstellen, args.ziel, get_backend().dateien()):
+            print(f"wiederhergestellt: {pfad}")
+    else:
+        for snapshot_id in store.snapshots():
+            print(snapshot_id, ", ".join(store.lade_snapshot(snapshot_id)["dateien"]))
@@ -0,0 +1,190 @@
+"""Benchmarks der Lade-, Auswahl-, Analyse- und Speicherpfade auf synthetischen Daten.
+
+Jede Größe läuft in einem eigenen Prozess mit frisch erzeugten Daten in
+einem temporären Verzeichnis, damit sich Caches und Speicher nicht
+gegenseitig beeinflussen. Zeit ist der Median mehrerer Durchläufe, der
+Speicher-Spitzenwert stammt aus einem separaten Durchlauf mit tracemalloc.
+Das Ergebnis ist JSON mit Commit, Versionen und einem Eintrag je Fall und
+Größe (Sekunden, MiB); mit ``--vergleiche`` lassen sich
+zwei Läufe, etwa verschiedener Commits, gegenüberstellen.
+
+    python benchmarks/benchmark.py --groessen 1000:10000 100000:1000000 --ausgabe vorher.json
+    python benchmarks/benchmark.py --vergleiche vorher.json nachher.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HIER = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.join(HIER, os.pardir)
+sys.path.insert(0, REPO)
+sys.path.insert(0, HIER)
+
+
+def _messe(funktion, wiederholungen, vorbereitung=None):
+    """Median der Laufzeit in Sekunden und Speicher-Spitzenwert in MiB"""
+    zeiten = []
+    for _ in range(wiederholungen):
+        argument = vorbereitung() if vorbereitung else None
+        start = time.perf_counter()
+        funktion(argument) if vorbereitung else funktion()
+        zeiten.append(time.perf_counter() - start)
+    argument = vorbereitung() if vorbereitung else None
+    tracemalloc.start()
+    funktion(argument) if vorbereitung else funktion()
+    _, spitze = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(zeiten), spitze / 2**20
+
+
+def _faelle():
+    """Die gemessenen Pfade; Importe erst hier, nachdem das Arbeitsverzeichnis steht"""
+    from data_manager import DataManager
+    from history_aggregate import HistoryAggregate
+    from selection import berechne_gewichte, ziehe_setlists
+    from optimierung import optimiere_setlist, songdauer
+    from simulation import simuliere
+    from tag_index import TagIndex
+    from history_index import HistoryIndex
+    import analyse
+    import storage
+    import datensatz_cache
+
+    def frisch_laden():
+        # Ohne Zwischenspeicher der Backends, also wie nach einem Neustart
+        storage._backends.clear()
+        DataManager._history_logs.clear()
+
+    def ohne_datensatz_cache():
+        frisch_laden()
+        datensatz_cache._cache = None
+
+    songs = DataManager.lade_songliste()
+    history = DataManager.lade_history()
+    gewichte = berechne_gewichte(songs)
+    tag_index = TagIndex(songs['Tags'])
+    aggregat = HistoryAggregate.aus_history(history)
+    history_index = HistoryIndex(history)
+    jahr = history_index.jahre[-1]
+    return [
+        ("lade_songliste", lambda _: DataManager.lade_songliste(), frisch_laden),
+        ("lade_history", lambda _: DataManager.lade_history(), frisch_laden),
+        # Der erste Aufruf nach einem Neustart lädt in den Datensatz-Cache; die
+        # "gecacht"-Fälle wärmen ihn vor jeder Messung auf und messen nur Treffer
+        ("songliste_erster_aufruf", lambda _: DataManager.songliste(), ohne_datensatz_cache),
+        ("history_erster_aufruf", lambda _: DataManager.history(), ohne_datensatz_cache),
+        ("songliste_gecacht", lambda _: DataManager.songliste(), DataManager.songliste),
+        ("history_gecacht", lambda _: DataManager.history(), DataManager.history),
+        ("berechne_gewichte", lambda: berechne_gewichte(songs), None),
+        ("ziehe_setlists_1000x10", lambda: ziehe_setlists(gewichte, 10, 1000, seed=1), None),
+        ("optimiere_setlist_90min", lambda: optimiere_setlist(gewichte, dauer=songdauer(songs), dauer_max=90,
+                                                              zeitbudget=0, vergleich=0), None),
+        ("simuliere_3x3_gewichte", lambda: simuliere(songs, [1.0, 2.0, 3.0], [0.5, 1.0, 1.5], proben=10, laeufe=5,
+                                                     seed=1), None),
+        ("tag_index_aufbauen", lambda: TagIndex(songs['Tags']), None),
+        ("tag_filter", lambda: tag_index.maske(irgendein=["rock", "live"], keins=["ballad"]), None),
+        ("history_index_aufbauen", lambda: HistoryIndex(history), None),
+        ("history_filter_jahr_monat", lambda: history_index.jahr_monat(jahr, 3).iloc[::-1], None),
+        ("kennzahlen_aufbauen", lambda: HistoryAggregate.aus_history(history), None),
+        ("kennzahlen_abfragen", lambda: analyse.kennzahlen(songs, aggregat), None),
+        ("kennzahlen_fortschreiben", lambda a: a.hinzufuegen(songs['Songtitel'].iloc[:10], "2030-01-01"),
+         aggregat.kopie),
+        ("speichere_songliste", lambda _: DataManager.speichere_songliste(songs).result(),
+         lambda: DataManager.warte_auf_schreibvorgaenge()),
+    ]
+
+
+def laufe_groesse(anzahl_songs, anzahl_history, wiederholungen, backend):
+    """Erzeugt die Daten und misst alle Fälle; liefert eine Liste von Ergebnissen"""
+    from synthetische_daten import erzeuge_daten, schreibe_csv
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        schreibe_csv(*erzeuge_daten(anzahl_songs, anzahl_history), verzeichnis)
+        os.chdir(verzeichnis)
+        from config import APP_CONFIG
+        APP_CONFIG["storage"]["backend"] = backend
+        # Backups würden die Messung des Speicherns verfälschen
+        import data_manager
+        data_manager.backup_im_hintergrund = lambda: None
+        ergebnisse = []
+        for name, funktion, vorbereitung in _faelle():
+            sekunden, spitze = _messe(funktion, wiederholungen, vorbereitung)
+            ergebnisse.append({"fall": name, "songs": anzahl_songs, "history": anzahl_history,
+                               "backend": backend, "sekunden": round(sekunden, 6),
+                               "spitze_mib": round(spitze, 2)})
+        os.chdir(REPO)
+        return ergebnisse
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def vergleiche(alt_datei, neu_datei):
+    """Gibt je Fall und Größe das Verhältnis neu/alt aus (über 1 heißt langsamer)"""
+    def lade(pfad):
+        with open(pfad, encoding='utf-8') as f:
+            daten = json.load(f)
+        return {(e["fall"], e["songs"], e["history"], e["backend"]): e for e in daten["ergebnisse"]}
+    alt, neu = lade(alt_datei), lade(neu_datei)
+    for schluessel in sorted(alt.keys() & neu.keys()):
+        a, n = alt[schluessel], neu[schluessel]
+        faktor = n["sekunden"] / a["sekunden"] if a["sekunden"] else float('inf')
+        print(f"{schluessel[0]:<26} {schluessel[1]:>8} {schluessel[2]:>9}  "
+              f"{a['sekunden']:9.4f}s -> {n['sekunden']:9.4f}s  x{faktor:5.2f}  "
+              f"{a['spitze_mib']:8.1f} -> {n['spitze_mib']:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Songpicker-Benchmarks")
+    parser.add_argument("--groessen", nargs="+", default=["1000:10000", "10000:100000"],
+                        help="Songs:History-Zeilen je Lauf, z.B. 1000000:10000000")
+    parser.add_argument("--wiederholungen", type=int, default=5)
+    parser.add_argument("--backend", default="csv", help="csv, sqlite, parquet oder feather")
+    parser.add_argument("--ausgabe", help="JSON-Datei statt Standardausgabe")
+    parser.add_argument("--vergleiche", nargs=2, metavar=("ALT", "NEU"), help="Zwei Ergebnisdateien vergleichen")
+    parser.add_argument("--einzeln", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.vergleiche:
+        vergleiche(*args.vergleiche)
+        return
+    if args.einzeln:
+        songs, history = (int(x) for x in args.einzeln.split(":"))
+        print(json.dumps(laufe_groesse(songs, history, args.wiederholungen, args.backend)))
+        return
+
+    ergebnisse = []
+    for groesse in args.groessen:
+        lauf = subprocess.run([sys.executable, os.path.abspath(__file__), "--einzeln", groesse,
+                               "--wiederholungen", str(args.wiederholungen), "--backend", args.backend],
+                              capture_output=True, text=True, check=True)
+        teil = json.loads(lauf.stdout.strip().splitlines()[-1])
+        for e in teil:
+            print(f"{e['fall']:<26} {e['songs']:>8} {e['history']:>9}  {e['sekunden']:9.4f}s  "
+                  f"{e['spitze_mib']:8.1f} MiB", file=sys.stderr)
+        ergebnisse.extend(teil)
+    import numpy
+    import pandas
+    bericht = {"commit": _commit(), "python": platform.python_version(), "pandas": pandas.__version__,
+               "numpy": numpy.__version__, "erstellt": time.strftime('%Y-%m-%dT%H:%M:%S'),
+               "ergebnisse": ergebnisse}
+    if args.ausgabe:
+        with open(args.ausgabe, "w", encoding="utf-8") as f:
+            json.dump(bericht, f, indent=2)
+    else:
+        print(json.dumps(bericht, indent=2))
+
+
+if __name__ == "__main__":
+    main()
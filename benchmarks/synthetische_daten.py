@@ -0,0 +1,109 @@
+"""Synthetische Songlisten und Spielhistorien in beliebiger Größe.
+
+Die Daten haben dasselbe Dateiformat wie ``songliste.csv`` und
+``spielhistorie.csv`` und folgen grob echten Verteilungen: Tags und
+Songbeliebtheit sind Zipf-verteilt, geprobt wird dienstags und donnerstags
+ohne Sommerpause, ``Zuletzt_gespielt`` und ``Anzahl_gespielt`` passen zur
+History.
+
+    python benchmarks/synthetische_daten.py --songs 100000 --history 1000000 --ziel /tmp/daten
+"""
+import argparse
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from config import APP_CONFIG  # noqa: E402
+from storage import SONG_SPALTEN  # noqa: E402
+
+WOERTER = ["Long", "Road", "Ruin", "Best", "Hero", "Learn", "Fly", "Cold", "Day", "Sun", "Times", "These",
+           "Walk", "Rope", "Arlandria", "Breakout", "Monkey", "Wrench", "Everlong", "Pretender", "Saint",
+           "Nothing", "Bridge", "Burning", "Run", "Outside", "Johnny", "Park", "Shame", "Skin", "Bones"]
+TAGS = ["rock", "ballad", "live", "akustisch", "cover", "opener", "zugabe", "neu", "schnell", "langsam",
+        "laut", "leise", "drop-d", "capo", "duett", "solo", "medley", "klassiker", "hit", "b-seite",
+        "instrumental", "englisch", "deutsch", "tanzbar", "warmup", "finale", "unplugged", "punk",
+        "grunge", "pop", "blues", "funk", "metal", "indie", "retro", "festival", "hochzeit", "geburtstag",
+        "weihnachten", "sommer"]
+
+
+def _zipf_gewichte(n, s=1.1):
+    gewichte = 1.0 / np.arange(1, n + 1) ** s
+    return gewichte / gewichte.sum()
+
+
+def erzeuge_titel(anzahl, rng):
+    """Eindeutige Songtitel aus zwei Wörtern und einer laufenden Nummer"""
+    erste = rng.choice(WOERTER, anzahl)
+    zweite = rng.choice(WOERTER, anzahl)
+    return [f"{a} {b} {i}" for i, (a, b) in enumerate(zip(erste, zweite))]
+
+
+def erzeuge_tags(anzahl, rng):
+    """0-4 Tags je Song, Zipf-verteilt über das Vokabular"""
+    je_song = np.minimum(rng.poisson(1.5, anzahl), 4)
+    gezogen = rng.choice(len(TAGS), size=(anzahl, 4), p=_zipf_gewichte(len(TAGS)))
+    return [",".join(dict.fromkeys(TAGS[t] for t in zeile[:k])) for zeile, k in zip(gezogen, je_song)]
+
+
+def probetage(anzahl_eintraege, rng, jahre=20, songs_je_probe=12):
+    """Probetage dienstags und donnerstags, ohne Juli/August, höchstens ``jahre`` zurück"""
+    ende = pd.Timestamp.today().normalize()
+    tage = pd.date_range(ende - pd.DateOffset(years=jahre), ende, freq='D')
+    tage = tage[tage.dayofweek.isin([1, 3]) & ~tage.month.isin([7, 8])]
+    anzahl = int(np.clip(anzahl_eintraege // songs_je_probe, 1, len(tage)))
+    return np.sort(rng.choice(tage.to_numpy(), anzahl, replace=False))
+
+
+def erzeuge_daten(anzahl_songs, anzahl_history, seed=0):
+    """Songliste und History als DataFrames (History nach Datum sortiert)"""
+    rng = np.random.default_rng(seed)
+    titel = erzeuge_titel(anzahl_songs, rng)
+
+    tage = probetage(anzahl_history, rng)
+    tag_je_eintrag = np.sort(rng.integers(0, len(tage), anzahl_history))
+    beliebtheit = rng.permutation(anzahl_songs)
+    song_je_eintrag = beliebtheit[rng.choice(anzahl_songs, anzahl_history, p=_zipf_gewichte(anzahl_songs, 0.9))]
+    history = pd.DataFrame({'Songtitel': np.asarray(titel, dtype=object)[song_je_eintrag],
+                            'Gespielt_am': tage[tag_je_eintrag]})
+
+    anzahl = np.bincount(song_je_eintrag, minlength=anzahl_songs)
+    zuletzt = np.full(anzahl_songs, np.datetime64('1900-01-01', 'ns'))
+    np.maximum.at(zuletzt, song_je_eintrag, tage[tag_je_eintrag].astype('datetime64[ns]'))
+    songs = pd.DataFrame({
+        'Songtitel': titel,
+        'Zuletzt_gespielt': zuletzt,
+        'Anzahl_gespielt': anzahl,
+        'Reifegrad': np.clip(rng.normal(6, 2.2, anzahl_songs).round(), 0, 10).astype(int),
+        'Kommentar': np.where(rng.random(anzahl_songs) < 0.1, "Übergang üben", ""),
+        'Tags': erzeuge_tags(anzahl_songs, rng),
+        'Must_Play': rng.random(anzahl_songs) < 0.05,
+    }, columns=SONG_SPALTEN)
+    return songs, history
+
+
+def _als_text(datumswerte, format_):
+    # Wenige verschiedene Tage: nur die eindeutigen Werte formatieren
+    codes, eindeutig = pd.factorize(pd.Series(datumswerte))
+    return pd.Series(pd.DatetimeIndex(eindeutig).strftime(format_).to_numpy()[codes])
+
+
+def schreibe_csv(songs, history, verzeichnis):
+    """Schreibt beide Tabellen im Format der App-Dateien nach ``verzeichnis``"""
+    os.makedirs(verzeichnis, exist_ok=True)
+    songs = songs.assign(Zuletzt_gespielt=_als_text(songs['Zuletzt_gespielt'], '%m/%d/%Y'),
+                         Must_Play=np.where(songs['Must_Play'], 'TRUE', 'FALSE'))
+    history = history.assign(Gespielt_am=_als_text(history['Gespielt_am'], '%Y-%m-%d'))
+    songs.to_csv(os.path.join(verzeichnis, APP_CONFIG["files"]["songs"]), sep=';', index=False)
+    history.to_csv(os.path.join(verzeichnis, APP_CONFIG["files"]["history"]), sep=';', index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetische Songpicker-Daten erzeugen")
+    parser.add_argument("--songs", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ziel", required=True, help="Zielverzeichnis")
+    args = parser.parse_args()
+    schreibe_csv(*erzeuge_daten(args.songs, args.history, args.seed), args.ziel)
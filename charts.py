@@ -0,0 +1,106 @@
+"""Diagramme für den Analyse-Tab als fertige PNG-Bytes bzw. echarts-Optionen.
+
+Die Figuren werden ohne pyplot direkt als ``Figure`` mit Agg-Canvas erzeugt;
+matplotlib wird erst beim ersten Zeichnen importiert.
+Sie landen dadurch nicht in der globalen Figurenverwaltung von pyplot und
+werden nach dem Rendern sofort freigegeben. Der Aufrufer kann die Bytes je
+Datenversion cachen; ein erneutes Anzeigen kostet dann kein Zeichnen mehr.
+"""
+import io
+from messung import gemessen
+
+HINTERGRUND = '#0e1117'
+SCHRIFT = '#fafafa'
+DPI = 150
+
+
+def _neue_figur():
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    fig.patch.set_facecolor(HINTERGRUND)
+    ax = fig.add_subplot()
+    ax.set_facecolor(HINTERGRUND)
+    ax.tick_params(colors=SCHRIFT)
+    ax.xaxis.label.set_color(SCHRIFT)
+    ax.yaxis.label.set_color(SCHRIFT)
+    ax.title.set_color(SCHRIFT)
+    return fig, ax
+
+
+def _als_png(fig):
+    puffer = io.BytesIO()
+    try:
+        fig.tight_layout()
+        fig.savefig(puffer, format='png', dpi=DPI, facecolor=fig.get_facecolor())
+    finally:
+        fig.clear()
+    return puffer.getvalue()
+
+
+@gemessen("chart:top_songs")
+def top_songs_png(titel, anzahl, farben):
+    """Horizontales Balkendiagramm der meistgespielten Songs"""
+    from matplotlib import style
+    with style.context('dark_background'):
+        fig, ax = _neue_figur()
+        ax.barh(y=list(titel), width=list(anzahl), color=list(farben))
+        ax.set_xlabel("Anzahl gespielt")
+        ax.set_ylabel("Songtitel")
+        return _als_png(fig)
+
+
+@gemessen("chart:reifegrad")
+def reifegrad_histogramm_png(reifegrade):
+    """Histogramm der Reifegrade aller Songs"""
+    from matplotlib import style
+    with style.context('dark_background'):
+        fig, ax = _neue_figur()
+        ax.hist(list(reifegrade), bins=11, color='skyblue')
+        ax.grid(True)
+        ax.set_xlabel("Reifegrad")
+        ax.set_ylabel("Anzahl Songs")
+        return _als_png(fig)
+
+
+def band_health_option(avg_reifegrad):
+    """echarts-Option für das Band-Health-Meter (Tachometer 0-10)"""
+    return {
+        "series": [
+            {
+                "type": "gauge",
+                "startAngle": 210,
+                "endAngle": -30,
+                "min": 0,
+                "max": 10,
+                "progress": {"show": True, "width": 18},
+                "axisLine": {
+                    "lineStyle": {
+                        "width": 18,
+                        "color": [
+                            [0.4, "#fc5454"],   # Rot
+                            [0.8, "#fcdf1f"],   # Gelb
+                            [1,   "#3cb371"]    # Grün
+                        ]
+                    }
+                },
+                "pointer": {"icon": "rect", "width": 8, "length": "70%", "offsetCenter": [0, "8%"]},
+                "axisTick": {"show": False},
+                "splitLine": {"show": False},
+                "axisLabel": {"distance": 25, "fontSize": 14, "color": SCHRIFT},
+                "detail": {
+                    "valueAnimation": True,
+                    "formatter": "{value} / 10",
+                    "fontSize": 24,
+                    "color": SCHRIFT,
+                    "backgroundColor": "#222a",
+                    "borderRadius": 8,
+                    "padding": [6, 12],
+                    "offsetCenter": [0, '60%']
+                },
+                "data": [{"value": round(avg_reifegrad, 1)}]
+            }
+        ],
+        "backgroundColor": HINTERGRUND
+    }
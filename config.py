@@ -5,7 +5,43 @@ APP_CONFIG = {
         "history": "spielhistorie.csv",
         "logo": "logo_white_foo_fight.png",
         "backup_dir": "backups",
-        "settings": "app_settings.json"
+        "settings": "app_settings.json",
+        "naechste_probe": "naechste_probe.csv",
+        "export_dir": "exporte"
+    },
+    "mandanten": {
+        "verzeichnis": None,         # je Band ein Unterverzeichnis; None: nur das Arbeitsverzeichnis
+        "cache_mb": 512              # Obergrenze des gemeinsamen Caches geladener Tabellen
+    },
+    "storage": {
+        "backend": "csv",            # "csv", "sqlite", "parquet" oder "feather"
+        "sqlite": "songpicker.db",
+        "columnar_dir": "daten"
+    },
+    "backup": {
+        "letzte": 10,                # die jüngsten Snapshots bleiben immer erhalten
+        "stuendlich": 24,            # außerdem je Stunde/Tag/Woche der neueste
+        "taeglich": 7,
+        "woechentlich": 8
+    },
+    "history_log": {
+        "kompaktierung_ab": 0.2,     # Anteil Entfernen/Wiederherstellen je Basiszeile
+        "max_events": 5000           # spätestens ab so vielen Ereignissen verdichten
+    },
+    "optimierung": {
+        "zeitbudget_s": 1.0,         # Rechenzeit je optimierter Setlist
+        "exakt_bis": 60,             # exakte Suche nur bis zu so vielen freien Kandidaten
+        "dauer_standard_min": 4.0,   # Minuten je Song ohne Angabe in der Spalte "Dauer"
+        "vergleich_ziehungen": 1000  # Zufallsziehungen zum Vergleich
+    },
+    "simulation": {
+        "proben": 26,                # simulierte künftige Proben je Lauf
+        "laeufe": 20,                # Läufe je Gewichtungs-Kombination
+        "abstand_tage": 7            # Tage zwischen zwei simulierten Proben
+    },
+    "messung": {
+        "debug_panel": False,        # Performance-Panel in der Seitenleiste (auch per ?debug=1)
+        "log": None                  # z.B. "messung.jsonl": ein JSON-Objekt je Durchlauf
     },
     "colors": {
         "low": "#ff9999",    # Rot für niedrigen Reifegrad
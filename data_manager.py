@@ -1,82 +1,631 @@
 import pandas as pd
+import numpy as np
+import logging
 import os
-from datetime import datetime
+import threading
+from collections import defaultdict
 from config import APP_CONFIG
-from utils import backup_dateien
+import mandant
+import storage
+from storage import (get_backend, atomar_schreiben, parse_datum, SONG_SPALTEN, HISTORY_SPALTEN,
+                     SONG_DATUMSFORMATE, HISTORY_DATUMSFORMATE)
+from history_log import HistoryLog, HINZUFUEGEN, ENTFERNEN, WIEDERHERSTELLEN
+from history_aggregate import HistoryAggregate
+from song_index import SongIndex
+from tag_index import TagIndex
+from history_index import HistoryIndex
+from songstatistik import berechne_songstatistik, songstatistik_aenderungen
+from schreib_queue import get_schreib_queue
+from utils import backup_im_hintergrund
+from backup_store import get_backup_store
+from datensatz_cache import get_datensatz_cache
+from messung import gemessen, cache_verfehlt
+
+logger = logging.getLogger(__name__)
+
 
 class DataManager:
-    """Verwaltet alle Datenoperationen für die App"""
+    """Verwaltet alle Datenoperationen für die App, ohne selbst Streamlit zu benutzen.
+
+    Schreibvorgänge laufen über die prozessweite Schreib-Warteschlange und
+    kehren sofort mit einem Future zurück. Die Versionsabfragen warten auf
+    offene Schreibaufträge der jeweiligen Tabelle, sodass ein anschließendes
+    Laden den eigenen Schreibvorgang immer schon sieht.
+
+    Alle Zustände (Zähler, Indizes, Aggregate, Protokolle) gelten je Band,
+    also je aktivem Verzeichnis aus ``mandant``; die Warteschlange teilen
+    sich alle Bands, ihre Tabellen und Schlüssel tragen aber die Band mit.
+    """
+    # Monotoner Zähler je (Band, Tabelle), wird bei jedem Schreibvorgang erhöht
+    _schreibzaehler = defaultdict(int)
+    _zaehler_lock = threading.Lock()
+    # Titel-Index je Band: (Datenversion, SongIndex)
+    _song_indizes = {}
+    # Datums-Index je Band: (Datenversion, Zeilen der History, HistoryIndex)
+    _history_indizes = {}
+    # Tag-Index je Band: (Datenversion, TagIndex)
+    _tag_indizes = {}
+
+    @staticmethod
+    def _geschrieben(band, tabelle):
+        with DataManager._zaehler_lock:
+            DataManager._schreibzaehler[(band, tabelle)] += 1
+
+    @staticmethod
+    def _einreihen(auftrag, tabelle=None, schluessel=None):
+        """Reiht ``auftrag`` für die aktive Band ein; er läuft im Schreib-Thread mit derselben Band"""
+        band = mandant.aktiv()
+        tabellen = tabelle if isinstance(tabelle, tuple) else (tabelle,)
+
+        def ausfuehren():
+            with mandant.verwende(band):
+                return auftrag()
+        return get_schreib_queue().einreihen(
+            ausfuehren, tabelle=tuple((band, t) for t in tabellen) if tabelle is not None else None,
+            schluessel=(band, schluessel) if schluessel is not None else None, gruppe=band)
+
+    @staticmethod
+    def _warte(tabelle):
+        get_schreib_queue().warte((mandant.aktiv(), tabelle))
+
+    @staticmethod
+    def _schreibe(tabelle, auftrag, schluessel=None):
+        """Reiht ``auftrag`` in die Schreib-Warteschlange ein und zählt danach die Version hoch"""
+        tabellen = tabelle if isinstance(tabelle, tuple) else (tabelle,)
+
+        def ausfuehren():
+            ergebnis = auftrag()
+            for t in tabellen:
+                if t in ("songs", "history"):
+                    DataManager._geschrieben(mandant.aktiv(), t)
+            return ergebnis
+        return DataManager._einreihen(ausfuehren, tabelle, schluessel)
+
+    # Fehlermeldungen beim Laden je Band, bis die Oberfläche sie abholt
+    _fehler = defaultdict(list)
+
+    @staticmethod
+    def _melde_fehler(meldung):
+        logger.exception(meldung)
+        DataManager._fehler[mandant.aktiv()].append(meldung)
+
+    @staticmethod
+    def hole_fehler():
+        """Fehlermeldungen der aktiven Band seit dem letzten Aufruf: beim Laden und aus fehlgeschlagenen
+        Schreibaufträgen"""
+        band = mandant.aktiv()
+        fehler = DataManager._fehler.pop(band, [])
+        return fehler + [f"Fehler beim Speichern: {e}" for e in get_schreib_queue().hole_fehler(band)]
+
+    @staticmethod
+    def warte_auf_schreibvorgaenge(timeout=None):
+        """Blockiert, bis alle eingereihten Schreibaufträge erledigt sind"""
+        return get_schreib_queue().warte(timeout=timeout)
+
+    _history_logs = {}
+
+    @staticmethod
+    def _history_log():
+        backend = get_backend()
+        schluessel = (mandant.aktiv(), backend.name)
+        if schluessel not in DataManager._history_logs:
+            DataManager._history_logs[schluessel] = HistoryLog(backend)
+        return DataManager._history_logs[schluessel]
+
+    @staticmethod
+    def _entlade(band):
+        """Vergisst alles, was zu ``band`` im Speicher liegt (Backends, Protokolle, Indizes)"""
+        if not get_schreib_queue().warte((band, "history"), timeout=0):
+            # Offene Ereignisse haben ihre IDs schon vom vorhandenen Protokoll
+            return
+        DataManager._vergiss(band)
+
+    @staticmethod
+    def _vergiss(band):
+        for schluessel in [s for s in DataManager._history_logs if s[0] == band]:
+            DataManager._history_logs.pop(schluessel, None)
+        DataManager._song_indizes.pop(band, None)
+        DataManager._history_indizes.pop(band, None)
+        DataManager._tag_indizes.pop(band, None)
+        with DataManager._aggregat_lock:
+            DataManager._aggregate.pop(band, None)
+        storage.entlade(band)
+
+    @staticmethod
+    def _aus_cache(tabelle, version, laden):
+        def fehlschlag():
+            cache_verfehlt()
+            return laden()
+        cache = get_datensatz_cache(beim_verdraengen=DataManager._entlade)
+        return cache.hole((version[0], tabelle, version), fehlschlag)
+
     @staticmethod
+    def songliste(version=None):
+        """Songliste zur Datenversion (ohne Angabe: der aktuellen) aus dem prozessweiten Datensatz-Cache.
+
+        Alle Sitzungen derselben Band teilen sich den Datensatz; geliefert wird
+        eine flache Kopie, Änderungen an Spalten bleiben also lokal.
+        """
+        return DataManager._aus_cache("songs", version or DataManager.songs_version(),
+                                      DataManager.lade_songliste)
+
+    @staticmethod
+    def history(version=None):
+        """Wie ``songliste``, für die History"""
+        return DataManager._aus_cache("history", version or DataManager.history_version(),
+                                      DataManager.lade_history)
+
+    @staticmethod
+    @gemessen("DataManager.songs_version")
+    def songs_version():
+        """Datenversion der Songliste: ändert sich nur bei einem Schreibvorgang"""
+        DataManager._warte("songs")
+        return DataManager._songs_stand()
+
+    @staticmethod
+    def _songs_stand():
+        band = mandant.aktiv()
+        return (band, DataManager._schreibzaehler[(band, "songs")], get_backend().version("songs"))
+
+    @staticmethod
+    @gemessen("DataManager.history_version")
+    def history_version():
+        """Datenversion der History: ändert sich nur bei einem Schreibvorgang"""
+        DataManager._warte("history")
+        return DataManager._history_stand()
+
+    @staticmethod
+    def _history_stand():
+        band = mandant.aktiv()
+        return (band, DataManager._schreibzaehler[(band, "history")], get_backend().version("history"))
+
+    # Kennzahlen der History je Band mit der Datenversion, zu der sie gehören
+    _aggregate = {}
+    _aggregat_lock = threading.Lock()
+
+    @staticmethod
+    @gemessen("DataManager.history_aggregat")
+    def history_aggregat():
+        """Kennzahlen der aktuellen History (siehe ``HistoryAggregate``).
+
+        Änderungen über ``_protokolliere`` werden im Schreib-Thread
+        fortgeschrieben; neu aufgebaut wird nur nach Ersetzen oder fremden Änderungen.
+        """
+        version = DataManager.history_version()
+        with DataManager._aggregat_lock:
+            gespeichert, agg = DataManager._aggregate.get(version[0], (None, None))
+        if gespeichert == version:
+            return agg
+        agg = HistoryAggregate.aus_history(DataManager.lade_history())
+        with DataManager._aggregat_lock:
+            # Nur übernehmen, wenn zwischendurch nichts geschrieben wurde
+            if DataManager._history_stand() == version:
+                DataManager._aggregate[version[0]] = (version, agg)
+        return agg
+
+    @staticmethod
+    def _schreibe_aggregat_fort(vorher, typ, songnamen, datum, log):
+        """Im Schreib-Thread nach einem Ereignis: Aggregat auf den neuen Stand bringen und liefern.
+
+        War es vorher nicht aktuell, wird es einmal vollständig aufgebaut.
+        """
+        with DataManager._aggregat_lock:
+            gespeichert, agg = DataManager._aggregate.get(vorher[0], (None, None))
+        if gespeichert != vorher:
+            agg = HistoryAggregate.aus_history(DataManager.typisiere_history(log.lade()))
+        else:
+            # Kopie statt Änderung an Ort und Stelle, Leser halten evtl. noch das alte
+            agg = agg.kopie()
+            if typ == HINZUFUEGEN:
+                agg.hinzufuegen(songnamen, datum)
+            else:
+                agg.neu_berechnen(log.lade(), songnamen, [datum])
+        with DataManager._aggregat_lock:
+            # Der Schreibzähler wird direkt nach dem Auftrag erhöht
+            DataManager._aggregate[vorher[0]] = ((vorher[0], vorher[1] + 1, get_backend().version("history")), agg)
+        return agg
+
+    @staticmethod
+    def _gleiche_songs_ab(songnamen, agg):
+        """Im Schreib-Thread: abgeleitete Spalten der betroffenen Songs nachziehen.
+
+        Die Songliste kommt aus dem Datensatz-Cache, sofern sie dort schon
+        liegt, sonst direkt vom Backend. Auf einen laufenden Ladevorgang wird
+        nicht gewartet: dessen Lader wartet womöglich auf die Warteschlange,
+        in der dieser Auftrag selbst steht. Geschrieben werden nur die
+        geänderten Zeilen.
+        """
+        backend = get_backend()
+        if not backend.existiert():
+            return
+        stand = DataManager._songs_stand()
+        df = get_datensatz_cache(beim_verdraengen=DataManager._entlade).nachsehen(
+            (stand[0], "songs", stand))
+        if df is None:
+            df = backend.lade_songs()
+            df = DataManager.normalisiere_songliste(df if df is not None else pd.DataFrame(columns=SONG_SPALTEN))
+        aenderungen = songstatistik_aenderungen(df, songnamen, agg, DataManager._song_index_zu(df, stand))
+        if aenderungen:
+            backend.aendere_songs(aenderungen, [], [])
+
+    @staticmethod
+    @gemessen("DataManager.repariere_songstatistik")
+    def repariere_songstatistik():
+        """Setzt Zuletzt_gespielt und Anzahl_gespielt aller Songs aus der History neu.
+
+        Liefert ein Future mit der Anzahl der geänderten Songs.
+        """
+        backend = get_backend()
+        log = DataManager._history_log()
+
+        def auftrag():
+            df = backend.lade_songs()
+            if df is None:
+                return 0
+            neu, geaendert = berechne_songstatistik(DataManager.normalisiere_songliste(df),
+                                                    DataManager.typisiere_history(log.lade()))
+            if geaendert:
+                backend.speichere_songs(neu)
+                backup_im_hintergrund()
+            return geaendert
+        return DataManager._schreibe("songs", auftrag)
+
+    @staticmethod
+    @gemessen("DataManager.lade_songliste")
     def lade_songliste():
-        """Lädt die Songliste aus der CSV-Datei"""
+        """Lädt die Songliste aus dem konfigurierten Speicher-Backend"""
+        DataManager._warte("songs")
         try:
-            file_path = APP_CONFIG["files"]["songs"]
-            if not os.path.exists(file_path):
-                # Erstelle leere Datei mit Spaltenüberschriften
-                df = pd.DataFrame(columns=['Songtitel', 'Zuletzt_gespielt', 'Reifegrad', 
-                                           'Anzahl_gespielt', 'Kommentar', 'Tags', 'Must_Play'])
-                df.to_csv(file_path, sep=';', index=False)
-                return df
-            
-            df = pd.read_csv(file_path, sep=';', encoding='utf-8-sig')
-            df.columns = df.columns.str.strip()
-            required_columns = {
-                'Songtitel': '',
-                'Zuletzt_gespielt': pd.Timestamp('1900-01-01'),
-                'Reifegrad': 5,
-                'Anzahl_gespielt': 0,
-                'Kommentar': '',
-                'Tags': '',
-                'Must_Play': False
-            }
-            for col, default in required_columns.items():
-                if col not in df.columns:
-                    df[col] = default
-            df['Zuletzt_gespielt'] = pd.to_datetime(df['Zuletzt_gespielt'], errors='coerce').fillna(pd.Timestamp('1900-01-01'))
-            df['Reifegrad'] = pd.to_numeric(df['Reifegrad'], errors='coerce').fillna(5).clip(0, 10).astype(int)
-            df['Anzahl_gespielt'] = pd.to_numeric(df['Anzahl_gespielt'], errors='coerce').fillna(0).astype(int)
-            df['Must_Play'] = df.get('Must_Play', False).astype(bool)
+            backend = get_backend()
+            df = backend.lade_songs()
+            if df is None:
+                # Erstelle leere Songliste mit Spaltenüberschriften
+                df = pd.DataFrame(columns=SONG_SPALTEN)
+                DataManager._schreibe("songs", lambda: backend.speichere_songs(df.copy()), schluessel="songs")
+                return DataManager.normalisiere_songliste(df.copy())
+            bericht = []
+            df = DataManager.normalisiere_songliste(df, bericht)
+            DataManager._pruefbericht[(mandant.aktiv(), "songs")] = bericht
             return df
         except Exception as e:
-            st.error(f"Fehler beim Laden der Songliste: {e}")
-            columns = ['Songtitel', 'Zuletzt_gespielt', 'Reifegrad', 
-                       'Anzahl_gespielt', 'Kommentar', 'Tags', 'Must_Play']
-            return pd.DataFrame(columns=columns)
-    
+            DataManager._melde_fehler(f"Fehler beim Laden der Songliste: {e}")
+            return pd.DataFrame(columns=SONG_SPALTEN)
+
+    # Werte fehlender Spalten bzw. Felder einer Songzeile
+    STANDARDWERTE = {
+        'Songtitel': '',
+        'Zuletzt_gespielt': pd.Timestamp('1900-01-01'),
+        'Reifegrad': 5,
+        'Anzahl_gespielt': 0,
+        'Kommentar': '',
+        'Tags': '',
+        'Must_Play': False
+    }
+    # Typen im Speicher (Zuletzt_gespielt/Gespielt_am: datetime64 über parse_datum).
+    # Die Titel der History sind kategorisch: wenige Songs, aber eine Zeile je Einsatz.
+    SONG_SCHEMA = {'Songtitel': 'str', 'Reifegrad': 'int8', 'Anzahl_gespielt': 'int32',
+                   'Kommentar': 'str', 'Tags': 'str', 'Must_Play': 'bool'}
+    HISTORY_SCHEMA = {'Songtitel': 'category'}
+
+    # Ergebnis der letzten Typprüfung je (Band, Tabelle), siehe pruefbericht()
+    _pruefbericht = {}
+
     @staticmethod
-    def speichere_songliste(df):
-        """Speichert die Songliste in der CSV-Datei mit automatischem Backup"""
-        try:
-            if os.path.exists(APP_CONFIG["files"]["songs"]):
-                backup_dateien()
-            # Sicherstellen, dass alle Spalten vorhanden sind
-            required_columns = ['Songtitel', 'Zuletzt_gespielt', 'Reifegrad', 
-                                'Anzahl_gespielt', 'Kommentar', 'Tags', 'Must_Play']
-            for col in required_columns:
+    def _ungueltig(bericht, tabelle, spalte, maske, ersatz):
+        """Vermerkt die Datensätze (ab 1 gezählt), deren Wert in ``spalte`` nicht passt"""
+        if bericht is None or not maske.any():
+            return
+        zeilen = np.flatnonzero(maske) + 1
+        bericht.append({"Tabelle": tabelle, "Spalte": spalte, "Anzahl": len(zeilen),
+                        "Datensätze": ", ".join(map(str, zeilen[:10])) + (" …" if len(zeilen) > 10 else ""),
+                        "Ersetzt durch": ersatz})
+
+    @staticmethod
+    def pruefbericht():
+        """Ungültige Werte aus dem letzten Laden von Songliste und History"""
+        band = mandant.aktiv()
+        return [eintrag for (b, _), bericht in list(DataManager._pruefbericht.items()) if b == band
+                for eintrag in bericht]
+
+    @staticmethod
+    def normalisiere_songliste(df, bericht=None):
+        """Ergänzt fehlende Spalten und bringt alle Spalten auf die Typen aus ``SONG_SCHEMA``.
+
+        Ungültige Werte werden durch die Standardwerte ersetzt und, falls
+        ``bericht`` eine Liste ist, dort vermerkt.
+        """
+        for col, default in DataManager.STANDARDWERTE.items():
+            if col not in df.columns:
+                df[col] = default
+
+        def nicht_leer(col, kandidaten):
+            # Nur die Kandidaten als Text prüfen: leere Felder gelten nicht als ungültig
+            kandidaten = kandidaten.copy()
+            werte = df[col][kandidaten]
+            kandidaten[kandidaten] = (werte.notna() & (werte.astype(str).str.strip() != '')).to_numpy()
+            return kandidaten
+
+        DataManager._ungueltig(bericht, "Songliste", "Songtitel",
+                               ~nicht_leer('Songtitel', np.ones(len(df), dtype=bool)), "(leer)")
+        datum = parse_datum(df['Zuletzt_gespielt'], SONG_DATUMSFORMATE)
+        DataManager._ungueltig(bericht, "Songliste", "Zuletzt_gespielt",
+                               nicht_leer('Zuletzt_gespielt', datum.isna().to_numpy()), "01.01.1900")
+        df['Zuletzt_gespielt'] = datum.fillna(pd.Timestamp('1900-01-01'))
+        for col, minimum, maximum in (('Reifegrad', 0, 10), ('Anzahl_gespielt', 0, None)):
+            zahl = pd.to_numeric(df[col], errors='coerce')
+            falsch = nicht_leer(col, zahl.isna().to_numpy()) | (zahl < minimum).to_numpy()
+            if maximum is not None:
+                falsch |= (zahl > maximum).to_numpy()
+            DataManager._ungueltig(bericht, "Songliste", col, falsch, "Standardwert bzw. Grenze")
+            df[col] = zahl.fillna(DataManager.STANDARDWERTE[col]).clip(minimum, maximum)
+        df['Must_Play'] = df['Must_Play'].fillna(False)
+        return df.astype(DataManager.SONG_SCHEMA)
+
+    @staticmethod
+    def typisiere_history(df, bericht=None):
+        """Bringt die History auf die Typen aus ``HISTORY_SCHEMA``; ungültige Daten werden NaT"""
+        datum = parse_datum(df['Gespielt_am'], HISTORY_DATUMSFORMATE)
+        DataManager._ungueltig(bericht, "History", "Gespielt_am", datum.isna().to_numpy(), "(ohne Datum)")
+        DataManager._ungueltig(bericht, "History", "Songtitel", df['Songtitel'].isna().to_numpy(), "(leer)")
+        return df.assign(Gespielt_am=datum).astype(DataManager.HISTORY_SCHEMA)
+
+    @staticmethod
+    @gemessen("DataManager.song_index")
+    def song_index(songs_df):
+        """Titel-Index zur Songliste der aktuellen Datenversion, einmal je Version gebaut.
+
+        ``songs_df`` muss die Songliste dieser Version in gespeicherter Reihenfolge sein.
+        """
+        return DataManager._song_index_zu(songs_df, DataManager.songs_version())
+
+    @staticmethod
+    def _song_index_zu(songs_df, version):
+        gespeichert, index = DataManager._song_indizes.get(version[0], (None, None))
+        if gespeichert != version or len(index) + len(index.duplikate) != len(songs_df):
+            index = SongIndex(songs_df)
+            DataManager._song_indizes[version[0]] = (version, index)
+        return index
+
+    @staticmethod
+    @gemessen("DataManager.tag_index")
+    def tag_index(songs_df, version=None):
+        """Tag-Index zur Songliste einer Datenversion (ohne Angabe: der aktuellen), einmal je Version gebaut.
+
+        Gehalten wird einer je Band, bei vielen Bands wird also nichts verdrängt.
+        ``songs_df`` muss die Songliste dieser Version sein.
+        """
+        version = version or DataManager.songs_version()
+        gespeichert, index = DataManager._tag_indizes.get(version[0], (None, None))
+        if gespeichert != version or index.anzahl != len(songs_df):
+            cache_verfehlt()
+            index = TagIndex(songs_df['Tags'])
+            DataManager._tag_indizes[version[0]] = (version, index)
+        return index
+
+    @staticmethod
+    @gemessen("DataManager.history_index")
+    def history_index(history_df, version=None):
+        """Datums-Index zur History einer Datenversion (ohne Angabe: der aktuellen), einmal je Version gebaut.
+
+        ``history_df`` muss die History dieser Version sein (z.B. aus ``history(version)``).
+        """
+        version = version or DataManager.history_version()
+        gespeichert, zeilen, index = DataManager._history_indizes.get(version[0], (None, None, None))
+        if gespeichert != version or zeilen != len(history_df):
+            index = HistoryIndex(history_df)
+            DataManager._history_indizes[version[0]] = (version, len(history_df), index)
+        return index
+
+    @staticmethod
+    @gemessen("DataManager.aktualisiere_songs")
+    def aktualisiere_songs(aenderungen):
+        """Setzt Felder mehrerer Songs auf einmal und speichert die Songliste.
+
+        ``aenderungen`` enthält die Spalte ``Songtitel`` und je zu ändernder
+        Spalte die neuen Werte. Unbekannte Titel werden übersprungen. Laden,
+        Ändern und Speichern laufen zusammen im Schreib-Thread, damit keine
+        gleichzeitige Änderung verloren geht. Liefert ein Future mit der
+        Anzahl der geänderten Songs.
+        """
+        backend = get_backend()
+        aenderungen = aenderungen.copy()
+
+        def auftrag():
+            df = backend.lade_songs()
+            if df is None:
+                return 0
+            df = DataManager.normalisiere_songliste(df)
+            positionen = SongIndex(df).positionen(aenderungen['Songtitel'])
+            gefunden = positionen >= 0
+            if not gefunden.any():
+                return 0
+            for col in aenderungen.columns.drop('Songtitel'):
                 if col not in df.columns:
                     df[col] = ''
-            df.to_csv(APP_CONFIG["files"]["songs"], sep=';', index=False)
-        except Exception as e:
-            st.error(f"Fehler beim Speichern der Songliste: {e}")
+                werte = aenderungen[col].to_numpy()[gefunden]
+                try:
+                    df.iloc[positionen[gefunden], df.columns.get_loc(col)] = werte
+                except (TypeError, ValueError):
+                    # z.B. Text in eine bisher leere (float) Kommentarspalte
+                    df[col] = df[col].astype(object)
+                    df.iloc[positionen[gefunden], df.columns.get_loc(col)] = werte
+            backend.speichere_songs(df)
+            backup_im_hintergrund()
+            return int(gefunden.sum())
+        return DataManager._schreibe("songs", auftrag)
+
+    @staticmethod
+    def _typisiere(col, wert):
+        """Ein Feldwert aus dem Editor mit dem Typ, den ``normalisiere_songliste`` erzeugt"""
+        if col == 'Zuletzt_gespielt':
+            return pd.to_datetime(wert, errors='coerce')
+        if col in ('Reifegrad', 'Anzahl_gespielt'):
+            zahl = pd.to_numeric(wert, errors='coerce')
+            if pd.isna(zahl):
+                return 5 if col == 'Reifegrad' else 0
+            return int(min(max(zahl, 0), 10)) if col == 'Reifegrad' else int(zahl)
+        if col in ('Must_Play', 'Favorit'):
+            return bool(wert) if wert is not None else False
+        return wert
+
+    @staticmethod
+    @gemessen("DataManager.aendere_songliste")
+    def aendere_songliste(geaendert, neu, geloescht):
+        """Speichert nur die Zeilenänderungen aus dem Editor.
+
+        ``geaendert`` ordnet bisherige Songtitel den geänderten Feldern zu,
+        ``neu`` ist eine Liste neuer Zeilen (Dictionaries), ``geloescht``
+        eine Liste bisheriger Songtitel. Zeilen ohne Titel werden nicht
+        angelegt bzw. gelöscht. Nicht betroffene Songs, etwa außerhalb eines
+        Filters, bleiben unverändert. Liefert ein Future.
+        """
+        backend = get_backend()
+
+        def typisiert(felder):
+            return {col: DataManager._typisiere(col, w) for col, w in felder.items()}
+        geaendert = {alt: typisiert(felder) for alt, felder in geaendert.items()}
+        geloescht = list(geloescht) + [alt for alt, felder in geaendert.items()
+                                       if not str(felder.get('Songtitel', alt) or '').strip()]
+        geaendert = {alt: felder for alt, felder in geaendert.items() if alt not in geloescht}
+        neu = [typisiert({**DataManager.STANDARDWERTE, **{col: w for col, w in zeile.items() if w is not None}})
+               for zeile in neu if str(zeile.get('Songtitel') or '').strip()]
+        if not (geaendert or neu or geloescht):
+            return DataManager._einreihen(lambda: None)
+
+        def auftrag():
+            backend.aendere_songs(geaendert, neu, geloescht)
+            backup_im_hintergrund()
+        return DataManager._schreibe("songs", auftrag)
+
+    @staticmethod
+    @gemessen("DataManager.speichere_songliste")
+    def speichere_songliste(df):
+        """Speichert die Songliste im Speicher-Backend und sichert sie im Hintergrund.
+
+        Noch nicht begonnene Speicheraufträge der kompletten Songliste werden
+        durch diesen ersetzt. Liefert ein Future.
+        """
+        backend = get_backend()
+        # Flache Kopie genügt: spätere Änderungen des Aufrufers kopieren ihre Spalten selbst (Copy-on-Write)
+        df = df.copy(deep=False)
+        # Sicherstellen, dass alle Spalten vorhanden sind
+        for col in SONG_SPALTEN:
+            if col not in df.columns:
+                df[col] = ''
+
+        def auftrag():
+            backend.speichere_songs(df)
+            backup_im_hintergrund()
+        return DataManager._schreibe("songs", auftrag, schluessel="songs")
 
     @staticmethod
+    @gemessen("DataManager.stelle_backup_wieder_her")
+    def stelle_backup_wieder_her(snapshot_id):
+        """Schreibt einen Backup-Snapshot zurück; alle Caches werden dadurch ungültig.
+
+        Liefert ein Future mit den zurückgeschriebenen Dateien.
+        """
+        backend = get_backend()
+
+        def auftrag():
+            backend.vor_backup()
+            geschrieben = get_backup_store().stelle_wieder_her(snapshot_id, dateien=backend.dateien())
+            # Protokoll, Kennzahlen und eingelesene Daten gehören zum Stand vor der Wiederherstellung
+            DataManager._vergiss(mandant.aktiv())
+            return geschrieben
+        return DataManager._schreibe(("songs", "history"), auftrag)
+
+    @staticmethod
+    @gemessen("DataManager.lade_history")
     def lade_history():
+        """Lädt die History: Basisdaten plus alle protokollierten Änderungen"""
+        DataManager._warte("history")
         try:
-            file_path = APP_CONFIG["files"]["history"]
-            if not os.path.exists(file_path):
-                return pd.DataFrame(columns=['Songtitel', 'Gespielt_am'])
-            df = pd.read_csv(file_path, sep=';', encoding='utf-8-sig')
-            df.columns = df.columns.str.strip()
-            df['Gespielt_am'] = pd.to_datetime(df['Gespielt_am'], errors='coerce')
+            bericht = []
+            df = DataManager.typisiere_history(DataManager._history_log().lade(), bericht)
+            DataManager._pruefbericht[(mandant.aktiv(), "history")] = bericht
             return df
         except Exception as e:
-            st.error(f"Fehler beim Laden der History: {e}")
-            return pd.DataFrame(columns=['Songtitel', 'Gespielt_am'])
+            DataManager._melde_fehler(f"Fehler beim Laden der History: {e}")
+            return pd.DataFrame(columns=HISTORY_SPALTEN)
 
     @staticmethod
+    @gemessen("DataManager.speichere_history")
+    def speichere_history(df):
+        """Schreibt die komplette History neu und verwirft das Änderungsprotokoll; liefert ein Future"""
+        log = DataManager._history_log()
+        df = df.copy(deep=False)
+        return DataManager._schreibe("history", lambda: log.ersetze(df), schluessel="history")
+
+    @staticmethod
+    def _protokolliere(typ, songnamen, datum, bezug=None):
+        """Vergibt sofort Ereignis-IDs und hängt die Ereignisse im Schreib-Thread an.
+
+        Im selben Auftrag werden Aggregat und die abgeleiteten Spalten der
+        betroffenen Songs (``Zuletzt_gespielt``, ``Anzahl_gespielt``) nachgezogen.
+        """
+        log = DataManager._history_log()
+        events = log.neue_events(typ, songnamen, datum, bezug)
+
+        def auftrag():
+            vorher = DataManager._history_stand()
+            log.haenge_an(events)
+            agg = DataManager._schreibe_aggregat_fort(vorher, typ, events['Songtitel'], datum, log)
+            DataManager._gleiche_songs_ab(events['Songtitel'], agg)
+            if log.braucht_kompaktierung():
+                DataManager._einreihen(DataManager._kompaktiere, "history", "history-kompaktierung")
+        DataManager._schreibe(("history", "songs"), auftrag)
+        return events['Event_ID'].tolist()
+
+    @staticmethod
+    def _kompaktiere():
+        vorher = DataManager._history_stand()
+        DataManager._history_log().kompaktiere()
+        # Der Inhalt bleibt gleich, nur der Dateistand ändert sich
+        with DataManager._aggregat_lock:
+            gespeichert, agg = DataManager._aggregate.get(vorher[0], (None, None))
+            if gespeichert == vorher:
+                DataManager._aggregate[vorher[0]] = (DataManager._history_stand(), agg)
+
+    @staticmethod
+    @gemessen("DataManager.aktualisiere_history")
     def aktualisiere_history(songnamen, datum):
-        try:
-            df = pd.DataFrame({'Songtitel': songnamen, 'Gespielt_am': datum})
-            df.to_csv(APP_CONFIG["files"]["history"], sep=';', mode='a', header=not os.path.exists(APP_CONFIG["files"]["history"]), index=False)
-        except Exception as e:
-            st.error(f"Fehler beim Aktualisieren der History: {e}") 
+        """Trägt Songs als am ``datum`` gespielt ein; liefert die Ereignis-IDs"""
+        return DataManager._protokolliere(HINZUFUEGEN, songnamen, datum)
+
+    @staticmethod
+    @gemessen("DataManager.entferne_aus_history")
+    def entferne_aus_history(songnamen, datum):
+        """Entfernt Songs aus der Probe am ``datum``; liefert die IDs fürs Rückgängigmachen"""
+        return DataManager._protokolliere(ENTFERNEN, songnamen, datum)
+
+    @staticmethod
+    @gemessen("DataManager.stelle_history_wieder_her")
+    def stelle_history_wieder_her(event_id, songtitel, datum):
+        """Macht ein Entfernen (``entferne_aus_history``) rückgängig"""
+        return DataManager._protokolliere(WIEDERHERSTELLEN, [songtitel], datum, bezug=event_id)[0]
+
+    @staticmethod
+    @gemessen("DataManager.lade_naechste_probe")
+    def lade_naechste_probe():
+        """Für die nächste Probe gespeicherte Songtitel, in gespeicherter Reihenfolge"""
+        DataManager._warte("naechste_probe")
+        pfad = mandant.pfad(APP_CONFIG["files"]["naechste_probe"])
+        if not os.path.exists(pfad):
+            return []
+        with open(pfad, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    @staticmethod
+    @gemessen("DataManager.speichere_naechste_probe")
+    def speichere_naechste_probe(songs):
+        """Speichert die Songauswahl für die nächste Probe; liefert ein Future"""
+        pfad = mandant.pfad(APP_CONFIG["files"]["naechste_probe"])
+        songs = list(songs)
+
+        def schreiber(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                for song in songs:
+                    f.write(song + "\n")
+        return DataManager._schreibe("naechste_probe", lambda: atomar_schreiben(pfad, schreiber),
+                                     schluessel="naechste_probe")
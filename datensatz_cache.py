@@ -0,0 +1,107 @@
+"""Prozessweiter Cache geladener Tabellen aller Bands, nach Speicherbedarf begrenzt.
+
+Einträge sind nach (Band, Tabelle, Datenversion) geschlüsselt. Eine neue
+Version verdrängt die alten derselben Band und Tabelle sofort; darüber hinaus
+fliegen die am längsten nicht benutzten Einträge, sobald die Summe ihrer
+Größen (``DataFrame.memory_usage(deep=True)``) die Grenze überschreitet.
+Aufrufer bekommen flache Kopien: alle Sitzungen und Ansichten lesen dieselben
+Spaltendaten, nichts wird kopiert oder serialisiert. Mit Copy-on-Write (ab
+pandas 3 immer aktiv) ist der gemeinsame Eintrag dabei unveränderlich: eine
+Zuweisung an die Kopie, ob ganze Spalte oder einzelne Zellen, kopiert nur die
+betroffenen Spalten, und ``to_numpy()`` liefert schreibgeschützte Arrays.
+Geänderte Daten gibt es nur über die Schreibpfade von ``DataManager``, die
+eine neue Datenversion und damit einen neuen Eintrag erzeugen.
+"""
+import threading
+from collections import OrderedDict
+from config import APP_CONFIG
+
+
+class DatensatzCache:
+    """LRU-Cache für DataFrames mit einer Obergrenze in Bytes"""
+
+    def __init__(self, max_bytes, beim_verdraengen=None):
+        self.max_bytes = max_bytes
+        # Wird mit der Band aufgerufen, deren letzter Eintrag verdrängt wurde
+        self.beim_verdraengen = beim_verdraengen
+        self._eintraege = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Je Schlüssel ein Lock, damit gleichzeitige Fehlschläge nur einmal laden
+        self._ladesperren = {}
+        self.treffer = 0
+        self.fehlschlaege = 0
+
+    def hole(self, schluessel, laden):
+        """Eintrag zu ``(band, tabelle, version)``; bei Bedarf über ``laden()`` erzeugt"""
+        with self._lock:
+            if schluessel in self._eintraege:
+                return self._treffer(schluessel)
+            sperre = self._ladesperren.setdefault(schluessel, threading.Lock())
+        with sperre:
+            with self._lock:
+                if schluessel in self._eintraege:
+                    return self._treffer(schluessel)
+            try:
+                df = laden()
+            finally:
+                with self._lock:
+                    self._ladesperren.pop(schluessel, None)
+            groesse = int(df.memory_usage(deep=True).sum())
+            verdraengt = set()
+            with self._lock:
+                self.fehlschlaege += 1
+                band, tabelle, _ = schluessel
+                for alt in [k for k in self._eintraege if k[:2] == (band, tabelle)]:
+                    self._entferne(alt)
+                self._eintraege[schluessel] = (df, groesse)
+                self._bytes += groesse
+                # Der neue Eintrag bleibt, auch wenn er allein die Grenze sprengt
+                while self._bytes > self.max_bytes and len(self._eintraege) > 1:
+                    alt = next(iter(self._eintraege))
+                    self._entferne(alt)
+                    verdraengt.add(alt[0])
+                verdraengt -= {k[0] for k in self._eintraege}
+            if self.beim_verdraengen is not None:
+                for band in verdraengt:
+                    self.beim_verdraengen(band)
+            return df.copy(deep=False)
+
+    def nachsehen(self, schluessel):
+        """Eintrag zu ``schluessel``, falls vorhanden, sonst None.
+
+        Wartet nie auf einen laufenden Ladevorgang; für Aufrufer, die selbst
+        ein Laden blockieren könnten (der Schreib-Thread).
+        """
+        with self._lock:
+            if schluessel in self._eintraege:
+                return self._treffer(schluessel)
+        return None
+
+    def _treffer(self, schluessel):
+        self.treffer += 1
+        self._eintraege.move_to_end(schluessel)
+        return self._eintraege[schluessel][0].copy(deep=False)
+
+    def _entferne(self, schluessel):
+        _, groesse = self._eintraege.pop(schluessel)
+        self._bytes -= groesse
+
+    def statistik(self):
+        with self._lock:
+            return {"Einträge": len(self._eintraege), "MiB": round(self._bytes / 2**20, 1),
+                    "Grenze MiB": round(self.max_bytes / 2**20, 1), "Treffer": self.treffer,
+                    "Fehlschläge": self.fehlschlaege}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_datensatz_cache(beim_verdraengen=None):
+    """Der prozessweite Cache; ``beim_verdraengen`` gilt nur beim ersten Aufruf"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DatensatzCache(APP_CONFIG["mandanten"]["cache_mb"] * 2**20, beim_verdraengen)
+        return _cache
@@ -0,0 +1,93 @@
+"""Export-Bündel: Songliste und History als CSV und Parquet in einer ZIP-Datei.
+
+Die Tabellen werden blockweise direkt in die ZIP-Einträge geschrieben, es
+entsteht also nie die komplette CSV als ein String im Speicher. Fertige
+Bündel liegen unter ihrem Schlüssel (Datenversionen und Zeitraum) im
+Export-Verzeichnis; ein erneuter Download desselben Stands liest nur noch
+die Datei.
+"""
+import hashlib
+import io
+import os
+import zipfile
+from config import APP_CONFIG
+import mandant
+from storage import atomar_schreiben
+from history_index import HistoryIndex
+
+BLOCK_ZEILEN = 100_000
+# So viele fertige Bündel bleiben im Export-Verzeichnis liegen
+AUFBEWAHREN = 4
+
+
+def zeitraum(history_df, von=None, bis=None, index=None):
+    """History-Einträge zwischen ``von`` und ``bis`` (jeweils einschließlich, tagesgenau).
+
+    Der Bereich kommt aus dem ``HistoryIndex`` zu ``history_df`` (ohne Angabe
+    wird einer gebaut), wie im History-Tab. Ohne Grenzen bleibt die History
+    vollständig, auch mit Einträgen ohne Datum.
+    """
+    if von is None and bis is None:
+        return history_df
+    return (index or HistoryIndex(history_df)).zeitraum(von, bis)
+
+
+def _schreibe_csv(archiv, name, df):
+    with archiv.open(name, 'w', force_zip64=True) as roh:
+        text = io.TextIOWrapper(roh, encoding='utf-8-sig', newline='')
+        for start in range(0, max(len(df), 1), BLOCK_ZEILEN):
+            df.iloc[start:start + BLOCK_ZEILEN].to_csv(text, sep=';', index=False, header=start == 0)
+        text.flush()
+        text.detach()
+
+
+def _schreibe_parquet(archiv, name, df):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    # Gemischte object-Spalten (z.B. Kommentar) kann Arrow nicht typisieren
+    df = df.astype({col: 'string' for col in df.columns if df[col].dtype == object})
+    tabelle = pa.Table.from_pandas(df, preserve_index=False)
+    with archiv.open(name, 'w', force_zip64=True) as roh:
+        with pq.ParquetWriter(roh, tabelle.schema) as schreiber:
+            for block in tabelle.to_batches(BLOCK_ZEILEN):
+                schreiber.write_batch(block)
+
+
+def schreibe_bundle(ziel, songs_df, history_df, von=None, bis=None, index=None):
+    """Schreibt das ZIP-Bündel nach ``ziel`` (Pfad oder Datei-Objekt)"""
+    history_df = zeitraum(history_df, von, bis, index)
+    with zipfile.ZipFile(ziel, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archiv:
+        _schreibe_csv(archiv, "songliste.csv", songs_df)
+        _schreibe_csv(archiv, "spielhistorie.csv", history_df)
+        _schreibe_parquet(archiv, "songliste.parquet", songs_df)
+        _schreibe_parquet(archiv, "spielhistorie.parquet", history_df)
+
+
+def bundle_datei(schluessel, lade_daten, von=None, bis=None, verzeichnis=None):
+    """Pfad des Bündels zu ``schluessel``; erzeugt es nur, wenn es noch nicht existiert.
+
+    ``schluessel`` beschreibt den Datenstand (z.B. die Datenversionen),
+    ``lade_daten`` liefert bei Bedarf ``(songs_df, history_df, history_index)``;
+    der Index darf None sein.
+    """
+    verzeichnis = verzeichnis or mandant.pfad(APP_CONFIG["files"]["export_dir"])
+    name = hashlib.sha1(repr((schluessel, str(von), str(bis))).encode()).hexdigest()[:16]
+    pfad = os.path.join(verzeichnis, f"{name}.zip")
+    if os.path.exists(pfad):
+        os.utime(pfad)
+        return pfad
+    os.makedirs(verzeichnis, exist_ok=True)
+    songs_df, history_df, index = lade_daten()
+    atomar_schreiben(pfad, lambda tmp: schreibe_bundle(tmp, songs_df, history_df, von, bis, index))
+    _raeume_auf(verzeichnis)
+    return pfad
+
+
+def _raeume_auf(verzeichnis):
+    dateien = sorted((os.path.join(verzeichnis, n) for n in os.listdir(verzeichnis) if n.endswith(".zip")),
+                     key=os.path.getmtime, reverse=True)
+    for pfad in dateien[AUFBEWAHREN:]:
+        try:
+            os.remove(pfad)
+        except OSError:
+            pass
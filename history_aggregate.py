@@ -0,0 +1,97 @@
+"""Laufend gepflegte Kennzahlen zur Spielhistorie.
+
+Statt bei jedem Durchlauf ``value_counts`` & Co. über die ganze History zu
+rechnen, hält ``HistoryAggregate`` die Zählerstände vor: Anzahl je Song,
+zuletzt gespielt je Song, Songs je Probetag und die Menge der Probetage.
+Jede angehängte Zeile kostet O(1). Nach dem Entfernen oder
+Wiederherstellen werden nur die betroffenen Songs und Tage neu gezählt;
+vollständig neu aufgebaut wird das Aggregat, wenn die History ersetzt wurde.
+"""
+from collections import Counter
+import pandas as pd
+
+
+class HistoryAggregate:
+    """Zählerstände der History, inkrementell fortgeschrieben"""
+
+    def __init__(self):
+        self.anzahl_je_song = Counter()
+        self.zuletzt_je_song = {}
+        self.songs_je_probe = Counter()
+        self.zeilen = 0
+
+    @classmethod
+    def aus_history(cls, history_df):
+        """Baut das Aggregat einmal vollständig aus einer History auf"""
+        agg = cls()
+        df = history_df.dropna(subset=['Songtitel', 'Gespielt_am'])
+        if df.empty:
+            return agg
+        # Bei kategorischen Titeln nur die tatsächlich gespielten Songs
+        anzahl = df['Songtitel'].value_counts()
+        agg.anzahl_je_song = Counter(anzahl[anzahl > 0].to_dict())
+        agg.zuletzt_je_song = df.groupby('Songtitel', observed=True)['Gespielt_am'].max().to_dict()
+        agg.songs_je_probe = Counter(df['Gespielt_am'].dt.normalize().value_counts().to_dict())
+        agg.zeilen = len(df)
+        return agg
+
+    def kopie(self):
+        agg = HistoryAggregate()
+        agg.anzahl_je_song = self.anzahl_je_song.copy()
+        agg.zuletzt_je_song = self.zuletzt_je_song.copy()
+        agg.songs_je_probe = self.songs_je_probe.copy()
+        agg.zeilen = self.zeilen
+        return agg
+
+    def hinzufuegen(self, songnamen, datum):
+        """Schreibt neu angehängte Einträge fort: O(1) je Song"""
+        datum = pd.Timestamp(datum)
+        tag = datum.normalize()
+        for titel in songnamen:
+            self.anzahl_je_song[titel] += 1
+            zuletzt = self.zuletzt_je_song.get(titel)
+            if zuletzt is None or datum > zuletzt:
+                self.zuletzt_je_song[titel] = datum
+            self.songs_je_probe[tag] += 1
+            self.zeilen += 1
+
+    def neu_berechnen(self, history_df, songnamen, tage):
+        """Zählt die Songs ``songnamen`` und die Tage ``tage`` in der (geänderten) History neu"""
+        titel = set(songnamen)
+        tage = {pd.Timestamp(tag).normalize() for tag in tage}
+        df = history_df.dropna(subset=['Songtitel', 'Gespielt_am'])
+        teil = HistoryAggregate.aus_history(df[df['Songtitel'].isin(titel).to_numpy()])
+        for t in titel:
+            self.zeilen += teil.anzahl_je_song.get(t, 0) - self.anzahl_je_song.get(t, 0)
+            if t in teil.anzahl_je_song:
+                self.anzahl_je_song[t] = teil.anzahl_je_song[t]
+                self.zuletzt_je_song[t] = teil.zuletzt_je_song[t]
+            else:
+                self.anzahl_je_song.pop(t, None)
+                self.zuletzt_je_song.pop(t, None)
+        tage_df = df['Gespielt_am'].dt.normalize()
+        je_tag = tage_df[tage_df.isin(tage).to_numpy()].value_counts()
+        for tag in tage:
+            if je_tag.get(tag, 0):
+                self.songs_je_probe[tag] = int(je_tag[tag])
+            else:
+                self.songs_je_probe.pop(tag, None)
+
+    @property
+    def probetage(self):
+        """Menge aller Tage mit mindestens einem gespielten Song"""
+        return set(self.songs_je_probe)
+
+    @property
+    def anzahl_proben(self):
+        return len(self.songs_je_probe)
+
+    @property
+    def songs_pro_probe(self):
+        """Durchschnittliche Anzahl Einträge je Probetag"""
+        return self.zeilen / len(self.songs_je_probe) if self.songs_je_probe else 0
+
+    def meistgespielt(self, anzahl=10):
+        """Die ``anzahl`` meistgespielten Songs als Serie Titel -> Anzahl"""
+        top = self.anzahl_je_song.most_common(anzahl)
+        return pd.Series([n for _, n in top], index=[t for t, _ in top], name='count', dtype='int64')
@@ -0,0 +1,67 @@
+"""History nach Datum sortiert, mit den Grenzen je Probetag, Monat und Jahr.
+
+Einmal je Datenversion wird die History stabil nach ``Gespielt_am``
+sortiert; innerhalb eines Tages bleibt die Reihenfolge der Einträge
+erhalten. Danach ist jede Abfrage nach Zeitraum, Jahr, Monat oder Probetag
+eine Binärsuche auf den sortierten Tagen und liefert einen zusammenhängenden
+Ausschnitt der sortierten History (``iloc``-Slice, also ohne Kopie).
+Einträge ohne Datum fallen heraus. Der Index der History bleibt erhalten.
+"""
+import numpy as np
+import pandas as pd
+
+
+class HistoryIndex:
+    """Sortierte History mit Binärsuche nach Tagen"""
+
+    def __init__(self, history_df):
+        tage = history_df['Gespielt_am'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+        gueltig = ~np.isnat(tage)
+        ordnung = np.flatnonzero(gueltig)[np.argsort(tage[gueltig], kind='stable')]
+        self.df = history_df.iloc[ordnung]
+        self._tage = tage[ordnung]
+        self._probetage = np.unique(self._tage)
+
+    def __len__(self):
+        return len(self.df)
+
+    def _zwischen(self, von, bis):
+        """Ausschnitt ab ``von`` (einschließlich) bis ``bis`` (ausschließlich); None heißt offen"""
+        a = 0 if von is None else int(np.searchsorted(self._tage, von.astype('datetime64[D]'), side='left'))
+        b = len(self._tage) if bis is None else int(np.searchsorted(self._tage, bis.astype('datetime64[D]'),
+                                                                    side='left'))
+        return self.df.iloc[a:max(a, b)]
+
+    @property
+    def jahre(self):
+        """Alle Jahre mit Einträgen, aufsteigend"""
+        return (np.unique(self._probetage.astype('datetime64[Y]')).astype(int) + 1970).tolist()
+
+    @property
+    def probetage(self):
+        """Alle Probetage als ``datetime.date``, neueste zuerst"""
+        return self._probetage[::-1].astype(object).tolist()
+
+    def zeitraum(self, von=None, bis=None):
+        """Einträge von ``von`` bis ``bis`` (Tage, jeweils einschließlich)"""
+        return self._zwischen(None if von is None else np.datetime64(von, 'D'),
+                              None if bis is None else np.datetime64(bis, 'D') + 1)
+
+    def tag(self, datum):
+        """Einträge des Probetags ``datum``"""
+        return self.zeitraum(datum, datum)
+
+    def jahr_monat(self, jahr=None, monat=None):
+        """Einträge eines Jahres, eines Monats eines Jahres oder eines Monats über alle Jahre"""
+        if jahr is not None and monat is not None:
+            start = np.datetime64(f"{jahr:04d}-{monat:02d}", 'M')
+            return self._zwischen(start, start + 1)
+        if jahr is not None:
+            start = np.datetime64(f"{jahr:04d}", 'Y')
+            return self._zwischen(start, start + 1)
+        if monat is None:
+            return self.df
+        # Ein Monat über alle Jahre: je Jahr ein Abschnitt, aneinandergereiht
+        teile = [self._zwischen(np.datetime64(f"{j:04d}-{monat:02d}", 'M'),
+                                np.datetime64(f"{j:04d}-{monat:02d}", 'M') + 1) for j in self.jahre]
+        return self.df.iloc[0:0] if not teile else teile[0] if len(teile) == 1 else pd.concat(teile)
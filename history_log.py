@@ -0,0 +1,220 @@
+"""Ereignisprotokoll für Änderungen an der Spielhistorie.
+
+Hinzufügen, Entfernen und Wiederherstellen werden nicht mehr direkt in die
+History geschrieben, sondern als Ereignis mit fortlaufender ID an ein
+Protokoll angehängt (eine Zeile pro Änderung). Beim Lesen wird aus der
+Basis-History und dem Protokoll die aktuelle Sicht berechnet. Die Basis wird
+nur neu geschrieben, wenn das Protokoll zu viele Entfernungen enthält oder
+zu lang wird (``braucht_kompaktierung``/``kompaktiere``; der DataManager
+stößt das im Schreib-Thread an).
+
+Ein Entfernen-Ereignis löscht alle Einträge eines Songs an einem Probetag,
+ein Wiederherstellen-Ereignis macht genau ein Entfernen rückgängig. Ist das
+Entfernen bereits verdichtet, stellt es einen Eintrag wieder her.
+
+Die materialisierte Sicht ist immer nach Datum und innerhalb eines Tages
+nach Titel sortiert, mit oder ohne Protokoll. ``HistoryLog`` hält sie zum Dateistand des Backends und
+spielt beim Anhängen nur die neuen Ereignisse darauf nach; Basis und
+Protokoll werden nur nach fremden Änderungen neu gelesen.
+"""
+import bisect
+import threading
+import time
+import numpy as np
+import pandas as pd
+from config import APP_CONFIG
+from storage import EVENT_SPALTEN, HISTORY_SPALTEN
+
+HINZUFUEGEN = "add"
+ENTFERNEN = "remove"
+WIEDERHERSTELLEN = "restore"
+
+
+def _titel_schluessel(titel):
+    # Titel ohne Wert hinter alle anderen, wie ``sort_values`` sie legt
+    return (0, titel) if isinstance(titel, str) else (1, '')
+
+
+def _sortiert(df):
+    """``df`` stabil nach Datum und Titel sortiert (fehlende Werte ans Ende), mit neuem Index"""
+    return df.sort_values(['Gespielt_am', 'Songtitel'], kind='stable', ignore_index=True)
+
+
+def _einsortiert(rest, neu):
+    """Fügt ``neu`` in die bereits nach Datum und Titel sortierten Zeilen ``rest`` ein.
+
+    Die Positionen kommen aus Binärsuchen (Tag, dann Titel innerhalb des
+    Tages); kopiert wird nur einmal beim Zusammensetzen.
+    """
+    neu = _sortiert(neu)
+    daten = rest['Gespielt_am'].to_numpy()
+    titel = rest['Songtitel']
+    stellen = []
+    for datum, t in zip(neu['Gespielt_am'].to_numpy(), neu['Songtitel'].to_numpy(dtype=object)):
+        von, bis = np.searchsorted(daten, datum, side='left'), np.searchsorted(daten, datum, side='right')
+        stellen.append(von + bisect.bisect_right(titel.iloc[von:bis].tolist(), _titel_schluessel(t),
+                                                 key=_titel_schluessel))
+    reihenfolge = np.insert(np.arange(len(rest)), stellen, np.arange(len(rest), len(rest) + len(neu)))
+    return pd.concat([rest, neu], ignore_index=True).iloc[reihenfolge].reset_index(drop=True)
+
+
+def materialisiere(basis, events, entfernt=None, sortiert=False):
+    """Berechnet die aktuelle History aus Basis und Ereignisprotokoll, nach Datum und Titel sortiert.
+
+    ``entfernt`` hält je bereits nachgespieltem Entfernen-Ereignis, wie viele
+    Einträge es entfernt hat (0, sobald wiederhergestellt); es wird fortgeschrieben.
+    Mit ``sortiert`` ist ``basis`` eine schon materialisierte Sicht: die
+    nachgespielten Zeilen werden dann nur einsortiert statt alles neu zu sortieren.
+    """
+    if basis is None:
+        basis = pd.DataFrame({'Songtitel': pd.Series(dtype=object),
+                              'Gespielt_am': pd.Series(dtype='datetime64[ns]')})
+    entfernt = {} if entfernt is None else entfernt
+    if events is None or events.empty:
+        return basis[HISTORY_SPALTEN].reset_index(drop=True) if sortiert else _sortiert(basis[HISTORY_SPALTEN])
+    events = events.sort_values('Event_ID', kind='stable')
+    tage = events['Gespielt_am'].dt.normalize()
+    schluessel = list(zip(events['Songtitel'], tage))
+    betroffen = set(schluessel)
+
+    # Nur Basiszeilen der betroffenen (Song, Tag)-Paare müssen nachgespielt werden;
+    # vorab nach Tag eingegrenzt, damit nur diese Zeilen Schlüssel bekommen
+    basis_tage = basis['Gespielt_am'].to_numpy().astype('datetime64[D]')
+    kandidaten = np.flatnonzero(np.isin(basis_tage, tage.to_numpy().astype('datetime64[D]')))
+    kandidaten_schluessel = zip(basis['Songtitel'].iloc[kandidaten].tolist(),
+                                pd.DatetimeIndex(basis_tage[kandidaten]))
+    treffer = [k in betroffen for k in kandidaten_schluessel]
+    kandidaten = kandidaten[np.asarray(treffer, dtype=bool)]
+    anzahl = {k: 0 for k in betroffen}
+    for k in zip(basis['Songtitel'].iloc[kandidaten].tolist(), pd.DatetimeIndex(basis_tage[kandidaten])):
+        anzahl[k] += 1
+
+    for event_id, typ, k, bezug in zip(events['Event_ID'], events['Typ'], schluessel, events['Bezug']):
+        if typ == HINZUFUEGEN:
+            anzahl[k] += 1
+        elif typ == ENTFERNEN:
+            entfernt[int(event_id)] = anzahl[k]
+            anzahl[k] = 0
+        elif typ == WIEDERHERSTELLEN and not pd.isna(bezug):
+            if int(bezug) in entfernt:
+                anzahl[k] += entfernt[int(bezug)]
+                entfernt[int(bezug)] = 0
+            else:
+                # Entfernen schon in der Basis verdichtet: einen Eintrag zurückholen
+                anzahl[k] += 1
+
+    titel = [k[0] for k, n in anzahl.items() for _ in range(n)]
+    daten = [k[1] for k, n in anzahl.items() for _ in range(n)]
+    nachgespielt = pd.DataFrame({'Songtitel': pd.Series(titel, dtype='str'), 'Gespielt_am': pd.to_datetime(pd.Series(daten, dtype=object))})
+    rest = basis[HISTORY_SPALTEN]
+    if len(kandidaten):
+        rest = rest.iloc[np.setdiff1d(np.arange(len(basis)), kandidaten, assume_unique=True)]
+    if sortiert:
+        return _einsortiert(rest, nachgespielt)
+    return _sortiert(pd.concat([rest, nachgespielt], ignore_index=True))
+
+
+class HistoryLog:
+    """Schreibt Ereignisse über ein Speicher-Backend und verdichtet auf Anfrage"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.RLock()
+        self._letzte_id = None
+        # (Dateistand der History, materialisierte Sicht, Zähler je Entfernen-Ereignis)
+        self._sicht = None
+
+    def neue_events(self, typ, songnamen, datum, bezug=None):
+        """Erzeugt Ereignisse mit neuen IDs, ohne sie schon zu schreiben (siehe ``haenge_an``)"""
+        with self._lock:
+            if self._letzte_id is None:
+                events = self.backend.lade_history_events()
+                self._letzte_id = 0 if events is None or events.empty else int(events['Event_ID'].max())
+            # Zeitbasiert, damit IDs auch nach einer Verdichtung eindeutig bleiben
+            start = max(self._letzte_id + 1, time.time_ns() // 1000)
+            ids = list(range(start, start + len(songnamen)))
+            if ids:
+                self._letzte_id = ids[-1]
+        return pd.DataFrame({
+            'Event_ID': ids,
+            'Typ': typ,
+            'Songtitel': list(songnamen),
+            'Gespielt_am': pd.to_datetime(datum),
+            'Bezug': pd.array([bezug] * len(ids), dtype='Int64'),
+        }, columns=EVENT_SPALTEN)
+
+    def _aktuelle_sicht(self):
+        if self._sicht is not None and self._sicht[0] == self.backend.version("history"):
+            return self._sicht
+        return None
+
+    def haenge_an(self, events):
+        """Hängt Ereignisse an; eine aktuelle Sicht wird nur um diese Ereignisse fortgeschrieben"""
+        with self._lock:
+            sicht = self._aktuelle_sicht()
+            self.backend.haenge_history_events_an(events)
+            if sicht is None:
+                self._sicht = None
+                return
+            entfernt = dict(sicht[2])
+            df = materialisiere(sicht[1], events, entfernt, sortiert=True)
+            self._sicht = (self.backend.version("history"), df, entfernt)
+
+    def _schreibe(self, typ, songnamen, datum, bezug=None):
+        events = self.neue_events(typ, songnamen, datum, bezug)
+        self.haenge_an(events)
+        return events['Event_ID'].tolist()
+
+    def hinzufuegen(self, songnamen, datum):
+        """Trägt Songs als gespielt ein; liefert die Ereignis-IDs"""
+        return self._schreibe(HINZUFUEGEN, songnamen, datum)
+
+    def entfernen(self, songnamen, datum):
+        """Entfernt Songs aus der Probe am ``datum``; liefert die Ereignis-IDs fürs Rückgängigmachen"""
+        return self._schreibe(ENTFERNEN, songnamen, datum)
+
+    def wiederherstellen(self, event_id, songtitel, datum):
+        """Macht das Entfernen-Ereignis ``event_id`` (Song ``songtitel`` am ``datum``) rückgängig"""
+        return self._schreibe(WIEDERHERSTELLEN, [songtitel], datum, bezug=event_id)[0]
+
+    def lade(self):
+        """Aktuelle History; die gehaltene Sicht wird geteilt und darf nicht verändert werden"""
+        with self._lock:
+            sicht = self._aktuelle_sicht()
+            if sicht is None:
+                entfernt = {}
+                df = materialisiere(self.backend.lade_history(), self.backend.lade_history_events(), entfernt)
+                sicht = self._sicht = (self.backend.version("history"), df, entfernt)
+            return sicht[1]
+
+    def braucht_kompaktierung(self):
+        events = self.backend.lade_history_events()
+        if events is None or events.empty:
+            return False
+        einstellungen = APP_CONFIG["history_log"]
+        if len(events) >= einstellungen["max_events"]:
+            return True
+        grabsteine = events['Typ'].isin([ENTFERNEN, WIEDERHERSTELLEN]).sum()
+        return grabsteine / max(1, self.backend.anzahl_history()) > einstellungen["kompaktierung_ab"]
+
+    def ersetze(self, df):
+        """Übernimmt ``df`` als vollständige History und verwirft das Protokoll"""
+        with self._lock:
+            events = self.backend.lade_history_events()
+            if events is None or events.empty:
+                self.backend.speichere_history(df)
+            else:
+                self.backend.ersetze_history(df, int(events['Event_ID'].max()))
+            self._sicht = None
+
+    def kompaktiere(self):
+        """Schreibt die aktuelle Sicht als neue Basis und leert das Protokoll"""
+        with self._lock:
+            events = self.backend.lade_history_events()
+            if events is None or events.empty:
+                return False
+            aktuell = materialisiere(self.backend.lade_history(), events)
+            self.backend.ersetze_history(aktuell, int(events['Event_ID'].max()))
+            # Gleicher Inhalt; verdichtete Entfernen-Ereignisse zählen ab jetzt als Basis
+            self._sicht = (self.backend.version("history"), aktuell, {})
+            return True
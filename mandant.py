@@ -0,0 +1,54 @@
+"""Mandanten: mehrere Bands mit je eigenem Datenverzeichnis in einem Prozess.
+
+Das Verzeichnis der aktiven Band hängt an einer Kontextvariable; die App
+setzt es zu Beginn jedes Durchlaufs für ihre Sitzung, die CLI je Band. Alle
+relativen Dateipfade aus ``APP_CONFIG`` werden über ``pfad`` darauf bezogen.
+Ohne ``APP_CONFIG["mandanten"]["verzeichnis"]`` gibt es nur eine Band im
+Arbeitsverzeichnis, wie bisher.
+"""
+import contextvars
+import os
+from contextlib import contextmanager
+from config import APP_CONFIG
+
+_verzeichnis = contextvars.ContextVar("mandant_verzeichnis", default=".")
+
+
+def aktiv():
+    """Datenverzeichnis der aktiven Band"""
+    return _verzeichnis.get()
+
+
+def setze(verzeichnis):
+    """Macht ``verzeichnis`` für den aktuellen Kontext zur aktiven Band"""
+    _verzeichnis.set(os.path.normpath(verzeichnis))
+
+
+@contextmanager
+def verwende(verzeichnis):
+    """Aktive Band nur für die Dauer des Blocks, z.B. in Hintergrund-Threads"""
+    token = _verzeichnis.set(os.path.normpath(verzeichnis))
+    try:
+        yield
+    finally:
+        _verzeichnis.reset(token)
+
+
+def pfad(name):
+    """Pfad einer Datei der aktiven Band; absolute Pfade bleiben unverändert"""
+    verzeichnis = _verzeichnis.get()
+    if verzeichnis == "." or os.path.isabs(name):
+        return name
+    return os.path.join(verzeichnis, name)
+
+
+def bands():
+    """Namen aller Bands (Unterverzeichnisse des Mandanten-Verzeichnisses), sortiert"""
+    wurzel = APP_CONFIG["mandanten"]["verzeichnis"]
+    if not wurzel or not os.path.isdir(wurzel):
+        return []
+    return sorted(n for n in os.listdir(wurzel) if os.path.isdir(os.path.join(wurzel, n)))
+
+
+def verzeichnis_der_band(name):
+    return os.path.join(APP_CONFIG["mandanten"]["verzeichnis"], name)
@@ -0,0 +1,144 @@
+"""Zeitmessung je Durchlauf: Spannen um Datenzugriffe, Caches, Diagramme und Ansichten.
+
+Ein Durchlauf des Skripts beginnt mit ``starte_lauf`` und endet mit
+``beende_lauf``. Dazwischen sammelt jede ``spanne`` ihre Dauer in einer
+Liste, die an den aktuellen Kontext gebunden ist, also je Sitzung getrennt.
+Außerhalb eines Durchlaufs (Messung aus, CLI, Schreib-Thread) kosten die
+Messpunkte nur eine Abfrage der Kontextvariable.
+
+``beende_lauf`` hängt den Durchlauf als JSON-Zeile an das Log aus
+``APP_CONFIG["messung"]["log"]``. ``python messung.py`` wertet das Log aus
+(Perzentile je Spanne).
+"""
+import contextvars
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from config import APP_CONFIG
+
+_lauf = contextvars.ContextVar("messung_lauf", default=None)
+_log_lock = threading.Lock()
+
+
+def starte_lauf(**info):
+    """Beginnt die Messung eines Durchlaufs; ``info`` landet mit im Log"""
+    _lauf.set({"start": time.perf_counter(), "info": info, "spannen": [], "offen": []})
+
+
+def aktiv():
+    return _lauf.get() is not None
+
+
+@contextmanager
+def spanne(name, **attribute):
+    """Misst den Block als Spanne ``name``; liefert das Spannen-Dictionary (oder None)"""
+    lauf = _lauf.get()
+    if lauf is None:
+        yield None
+        return
+    eintrag = {"name": name, "tiefe": len(lauf["offen"]), **attribute}
+    lauf["offen"].append(eintrag)
+    start = time.perf_counter()
+    try:
+        yield eintrag
+    finally:
+        eintrag["ms"] = round((time.perf_counter() - start) * 1000, 3)
+        lauf["offen"].pop()
+        lauf["spannen"].append(eintrag)
+
+
+def gemessen(name):
+    """Dekorator: jeder Aufruf der Funktion wird zur Spanne ``name``"""
+    def dekorator(funktion):
+        @functools.wraps(funktion)
+        def wrapper(*args, **kwargs):
+            if _lauf.get() is None:
+                return funktion(*args, **kwargs)
+            with spanne(name):
+                return funktion(*args, **kwargs)
+        return wrapper
+    return dekorator
+
+
+def gecacht(name):
+    """Dekorator außen um eine gecachte Funktion: misst den Aufruf als Treffer oder Fehlschlag.
+
+    Der Rumpf der gecachten Funktion ruft ``cache_verfehlt()`` auf; das
+    passiert nur, wenn der Cache ihn tatsächlich ausführt.
+    """
+    def dekorator(funktion):
+        @functools.wraps(funktion)
+        def wrapper(*args, **kwargs):
+            if _lauf.get() is None:
+                return funktion(*args, **kwargs)
+            with spanne(f"cache:{name}", cache=True) as eintrag:
+                ergebnis = funktion(*args, **kwargs)
+                eintrag["treffer"] = not eintrag.pop("verfehlt", False)
+                return ergebnis
+        return wrapper
+    return dekorator
+
+
+def cache_verfehlt():
+    """Im Rumpf einer gecachten Funktion: markiert die umgebende Cache-Spanne als Fehlschlag"""
+    lauf = _lauf.get()
+    if lauf is None:
+        return
+    for eintrag in reversed(lauf["offen"]):
+        if eintrag.get("cache"):
+            eintrag["verfehlt"] = True
+            return
+
+
+def beende_lauf():
+    """Schließt den Durchlauf ab, schreibt ihn ins Log und liefert ihn (oder None)"""
+    lauf = _lauf.get()
+    if lauf is None:
+        return None
+    _lauf.set(None)
+    ergebnis = {
+        "zeit": datetime.now().isoformat(timespec='milliseconds'),
+        "gesamt_ms": round((time.perf_counter() - lauf["start"]) * 1000, 3),
+        **lauf["info"],
+        "spannen": lauf["spannen"],
+    }
+    pfad = APP_CONFIG["messung"]["log"]
+    if pfad:
+        zeile = json.dumps(ergebnis, ensure_ascii=False, default=str)
+        with _log_lock, open(pfad, "a", encoding="utf-8") as f:
+            f.write(zeile + "\n")
+    return ergebnis
+
+
+def zusammenfassen(spannen):
+    """Spannen gleichen Namens zusammengefasst: Anzahl, Summe ms, Cache-Treffer"""
+    gruppen = {}
+    for s in spannen:
+        g = gruppen.setdefault(s["name"], {"Spanne": s["name"], "Anzahl": 0, "ms": 0.0, "Treffer": None})
+        g["Anzahl"] += 1
+        g["ms"] += s["ms"]
+        if "treffer" in s:
+            g["Treffer"] = (g["Treffer"] or 0) + int(s["treffer"])
+    return sorted(gruppen.values(), key=lambda g: -g["ms"])
+
+
+if __name__ == "__main__":
+    import argparse
+    import numpy as np
+    parser = argparse.ArgumentParser(description="Perzentile je Spanne aus dem Mess-Log")
+    parser.add_argument("log", nargs="?", default=APP_CONFIG["messung"]["log"])
+    args = parser.parse_args()
+    dauern = {"Durchlauf": []}
+    with open(args.log, encoding="utf-8") as f:
+        for zeile in f:
+            lauf = json.loads(zeile)
+            dauern["Durchlauf"].append(lauf["gesamt_ms"])
+            for s in lauf["spannen"]:
+                dauern.setdefault(s["name"], []).append(s["ms"])
+    print(f"{'Spanne':<45} {'n':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    for name, werte in sorted(dauern.items(), key=lambda e: -np.percentile(e[1], 90)):
+        p50, p90, p99 = np.percentile(werte, [50, 90, 99])
+        print(f"{name:<45} {len(werte):>6} {p50:9.1f} {p90:9.1f} {p99:9.1f} {max(werte):9.1f}")
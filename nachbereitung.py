@@ -0,0 +1,31 @@
+"""Logik der Nachbereitung einer Probe, ohne Streamlit.
+
+Liefert die Probetage und die Songs eines Probetags samt Songdaten. Die
+History kommt als ``HistoryIndex``, Probetage und Einträge eines Tages sind
+damit Binärsuchen statt Vergleiche über die ganze History.
+"""
+import pandas as pd
+
+
+def probedaten(history_index):
+    """Alle Probetage der History, neueste zuerst"""
+    return history_index.probetage
+
+
+def songs_der_probe(history_index, datum):
+    """History-Einträge des Probetags ``datum``"""
+    return history_index.tag(datum)
+
+
+def weitere_songs(songs_df, history_index, datum):
+    """Songs der Songliste, die am ``datum`` noch nicht gespielt wurden"""
+    return sorted(set(songs_df['Songtitel']) - set(songs_der_probe(history_index, datum)['Songtitel']))
+
+
+def mit_songdaten(gespielt, songs_df, song_index, spalten=('Reifegrad', 'Kommentar')):
+    """Ergänzt History-Einträge um Spalten der Songliste; unbekannte Songs bekommen NaN"""
+    positionen = song_index.positionen(gespielt['Songtitel'])
+    for col in spalten:
+        werte = songs_df[col].to_numpy()[positionen]
+        gespielt[col] = pd.Series(werte, index=gespielt.index, dtype=object).where(positionen >= 0)
+    return gespielt
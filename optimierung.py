@@ -0,0 +1,320 @@
+"""Setlist-Optimierung unter Vorgaben.
+
+Gesucht ist die Setlist mit der größten Summe der Auswahlgewichte
+(``selection.berechne_gewichte``) unter diesen Vorgaben: höchstens
+``anzahl`` Songs, Gesamtdauer höchstens ``dauer_max`` Minuten, alle
+Pflichtsongs dabei, keine gesperrten Songs (z.B. aus den letzten Proben)
+und je begrenztem Tag höchstens so viele Songs wie vorgegeben.
+
+Das ist ein Rucksackproblem mit Zusatzbedingungen. Gelöst wird es in
+Stufen: gierig nach Gewicht und nach Gewicht je Minute, danach lokale Suche
+(einen Song gegen einen anderen tauschen, einen herausnehmen und neu
+auffüllen) und zufällige Störungen mit erneuter lokaler Suche, bis das
+Zeitbudget verbraucht ist. Bei kleinen Katalogen sucht zusätzlich ein
+Branch-and-Bound exakt; endet es im Zeitbudget, ist das Ergebnis beweisbar
+optimal. Jeder Schritt prüft alle Songs auf einmal mit NumPy, auch bei
+zehntausenden Songs kostet eine Runde nur Millisekunden.
+"""
+import time
+import numpy as np
+import pandas as pd
+from config import APP_CONFIG
+from selection import berechne_gewichte, ziehe_setlists, bewerte_setlists
+
+
+class _Abbruch(Exception):
+    pass
+
+
+class _Vorgaben:
+    """Die Vorgaben als Arrays über alle Songs; Setlists sind boolesche Masken"""
+
+    def __init__(self, gewichte, anzahl, dauer, dauer_max, pflicht, kandidaten, tag_grenzen):
+        self.gewichte = gewichte
+        self.anzahl = anzahl
+        self.dauer = dauer
+        self.dauer_max = dauer_max
+        self.pflicht = pflicht
+        self.kandidaten = kandidaten
+        # Songs x begrenzte Tags, dazu die Höchstzahl je Tag
+        self.tags = np.column_stack([m for m, _ in tag_grenzen]).astype(np.int32) if tag_grenzen \
+            else np.zeros((len(gewichte), 0), dtype=np.int32)
+        self.grenzen = np.array([g for _, g in tag_grenzen], dtype=np.int32)
+        if len(self.grenzen) > 64:
+            raise ValueError("Höchstens 64 Tags lassen sich begrenzen.")
+        # Dieselben Tags als Bitmaske je Song: ein Song passt, wenn er keinen ausgeschöpften Tag trägt
+        self.tagbits = (self.tags.astype(np.uint64) << np.arange(len(self.grenzen), dtype=np.uint64)).sum(
+            axis=1, dtype=np.uint64)
+
+    def wert(self, auswahl):
+        return float(self.gewichte[auswahl].sum())
+
+    def reste(self, auswahl):
+        """Freie Plätze, freie Minuten und je Tag freie Plätze"""
+        return (self.anzahl - int(auswahl.sum()), self.dauer_max - float(self.dauer[auswahl].sum()),
+                self.grenzen - self.tags[auswahl].sum(axis=0))
+
+    def zulaessig(self, auswahl):
+        plaetze, minuten, tags = self.reste(auswahl)
+        return (plaetze >= 0 and minuten >= -1e-9 and bool((tags >= 0).all())
+                and not (self.pflicht & ~auswahl).any() and not (auswahl & ~self.kandidaten).any())
+
+    def passend(self, auswahl, plaetze, minuten, tags):
+        """Songs, die zu den angegebenen Resten noch hinzukommen könnten"""
+        if plaetze <= 0:
+            return np.zeros(len(auswahl), dtype=bool)
+        maske = self.kandidaten & ~auswahl & (self.dauer <= minuten + 1e-9)
+        if len(self.grenzen):
+            voll = np.uint64(sum(1 << k for k in np.flatnonzero(tags <= 0)))
+            maske &= (self.tagbits & voll) == 0
+        return maske
+
+    def fuelle(self, auswahl, schluessel, verboten=None):
+        """Nimmt gierig nach ``schluessel`` Songs auf, solange noch einer passt"""
+        while True:
+            maske = self.passend(auswahl, *self.reste(auswahl))
+            if verboten is not None:
+                maske &= ~verboten
+            if not maske.any():
+                return auswahl
+            auswahl[np.argmax(np.where(maske, schluessel, -np.inf))] = True
+
+    def tausche(self, auswahl):
+        """Bester Tausch eines Songs gegen einen schwereren, der noch passt; False, wenn keiner hilft"""
+        plaetze, minuten, tags = self.reste(auswahl)
+        bester = (1e-12, None, None)
+        for i in np.flatnonzero(auswahl & ~self.pflicht):
+            maske = self.passend(auswahl, plaetze + 1, minuten + self.dauer[i], tags + self.tags[i])
+            maske &= self.gewichte > self.gewichte[i] + bester[0]
+            if maske.any():
+                j = int(np.argmax(np.where(maske, self.gewichte, -np.inf)))
+                bester = (self.gewichte[j] - self.gewichte[i], i, j)
+        if bester[1] is None:
+            return False
+        auswahl[bester[1]] = False
+        auswahl[bester[2]] = True
+        return True
+
+    def ersetze(self, auswahl, schluessel):
+        """Nimmt den Song heraus, dessen Platz neu aufgefüllt am meisten bringt (z.B. einer lang gegen zwei kurze)"""
+        wert = self.wert(auswahl)
+        for i in np.flatnonzero(auswahl & ~self.pflicht):
+            versuch = auswahl.copy()
+            versuch[i] = False
+            verboten = np.zeros(len(auswahl), dtype=bool)
+            verboten[i] = True
+            self.fuelle(versuch, schluessel, verboten)
+            if self.wert(versuch) > wert + 1e-12:
+                auswahl[:] = versuch
+                return True
+        return False
+
+    def lokale_suche(self, auswahl, schluessel):
+        while self.tausche(auswahl) or self.ersetze(auswahl, schluessel):
+            pass
+        return auswahl
+
+    def obere_schranke(self):
+        """Schranke ohne Tag-Grenzen: beste Gewichte nach Plätzen bzw. gebrochener Rucksack nach Minuten"""
+        basis = self.pflicht.copy()
+        plaetze, minuten, _ = self.reste(basis)
+        frei = self.kandidaten & ~basis
+        w, d = self.gewichte[frei], self.dauer[frei]
+        nach_plaetzen = np.sort(w)[::-1][:max(plaetze, 0)].sum()
+        if not np.isfinite(minuten):
+            return self.wert(basis) + float(nach_plaetzen)
+        ordnung = np.argsort(-w / d)
+        kumuliert = np.cumsum(d[ordnung])
+        ganz = int(np.searchsorted(kumuliert, minuten, side='right'))
+        nach_minuten = w[ordnung][:ganz].sum()
+        if ganz < len(ordnung):
+            rest = minuten - (kumuliert[ganz - 1] if ganz else 0)
+            nach_minuten += w[ordnung][ganz] * max(rest, 0) / d[ordnung][ganz]
+        return self.wert(basis) + float(min(nach_plaetzen, nach_minuten))
+
+
+def _exakt(vorgaben, beste, frist):
+    """Branch-and-Bound über die freien Kandidaten; liefert (Auswahl, vollständig durchsucht)"""
+    frei = np.flatnonzero(vorgaben.kandidaten & ~vorgaben.pflicht)
+    frei = frei[np.argsort(-vorgaben.gewichte[frei], kind='stable')]
+    w, d, t = vorgaben.gewichte[frei], vorgaben.dauer[frei], vorgaben.tags[frei]
+    summen = np.concatenate([[0.0], np.cumsum(w)])
+    plaetze, minuten, tags = vorgaben.reste(vorgaben.pflicht)
+    basis = vorgaben.wert(vorgaben.pflicht)
+    bestwert = [vorgaben.wert(beste), None]
+    gewaehlt = []
+    knoten = [0]
+
+    def suche(i, wert, plaetze, minuten, tags):
+        knoten[0] += 1
+        if knoten[0] % 4096 == 0 and time.perf_counter() > frist:
+            raise _Abbruch
+        if wert > bestwert[0] + 1e-12:
+            bestwert[:] = [wert, list(gewaehlt)]
+        if i == len(frei) or plaetze == 0:
+            return
+        # Schranke: die schwersten noch freien Plätze, begrenzt durch die kürzesten Songs
+        if np.isfinite(minuten):
+            plaetze = min(plaetze, int(np.searchsorted(np.cumsum(np.sort(d[i:])), minuten + 1e-9, side='right')))
+        if wert + summen[min(i + plaetze, len(frei))] - summen[i] <= bestwert[0] + 1e-12:
+            return
+        if d[i] <= minuten + 1e-9 and (t[i] <= tags).all():
+            gewaehlt.append(i)
+            suche(i + 1, wert + w[i], plaetze - 1, minuten - d[i], tags - t[i])
+            gewaehlt.pop()
+        suche(i + 1, wert, plaetze, minuten, tags)
+
+    try:
+        suche(0, basis, plaetze, minuten, tags)
+        vollstaendig = True
+    except _Abbruch:
+        vollstaendig = False
+    if bestwert[1] is None:
+        return beste, vollstaendig
+    auswahl = vorgaben.pflicht.copy()
+    auswahl[frei[bestwert[1]]] = True
+    return auswahl, vollstaendig
+
+
+def optimiere_setlist(gewichte, anzahl=None, dauer=None, dauer_max=None, pflicht=None, gesperrt=None,
+                      maske=None, tag_grenzen=(), zeitbudget=None, exakt_bis=None, vergleich=None, seed=None):
+    """Beste Setlist unter den Vorgaben, gefunden innerhalb von ``zeitbudget`` Sekunden.
+
+    ``dauer`` sind die Minuten je Song (nur nötig mit ``dauer_max``),
+    ``pflicht``/``gesperrt``/``maske`` boolesche Arrays über alle Songs und
+    ``tag_grenzen`` Paare (Maske, Höchstzahl), z.B. aus ``TagIndex.maske``.
+    Pflichtsongs gehen vor Sperre und Maske. Liefert ein Dictionary mit
+    ``positionen``, ``wert``, ``obere_schranke``, ``optimal``, ``verfahren``,
+    ``sekunden`` und dem Vergleich mit ``vergleich`` Zufallsziehungen unter
+    ``zufall`` (0: kein Vergleich). Ein ValueError heißt, dass schon die
+    Pflichtsongs die Vorgaben verletzen.
+    """
+    einstellungen = APP_CONFIG["optimierung"]
+    zeitbudget = einstellungen["zeitbudget_s"] if zeitbudget is None else zeitbudget
+    exakt_bis = einstellungen["exakt_bis"] if exakt_bis is None else exakt_bis
+    vergleich = einstellungen["vergleich_ziehungen"] if vergleich is None else vergleich
+    start = time.perf_counter()
+    frist = start + zeitbudget
+    rng = np.random.default_rng(seed)
+
+    gewichte = np.asarray(gewichte, dtype=float)
+    n = len(gewichte)
+    if anzahl is None and dauer_max is None:
+        raise ValueError("Es braucht eine Anzahl Songs oder eine Gesamtdauer.")
+    dauer = np.ones(n) if dauer is None else np.asarray(dauer, dtype=float)
+    pflicht = np.zeros(n, dtype=bool) if pflicht is None else np.asarray(pflicht, dtype=bool).copy()
+    kandidaten = gewichte > 0
+    if maske is not None:
+        kandidaten &= np.asarray(maske, dtype=bool)
+    if gesperrt is not None:
+        kandidaten &= ~np.asarray(gesperrt, dtype=bool)
+    kandidaten |= pflicht
+    vorgaben = _Vorgaben(gewichte, n if anzahl is None else anzahl, dauer,
+                         np.inf if dauer_max is None else float(dauer_max), pflicht, kandidaten,
+                         [(np.asarray(m, dtype=bool), g) for m, g in tag_grenzen])
+    if not vorgaben.zulaessig(pflicht):
+        raise ValueError("Die Pflichtsongs allein passen nicht zu Anzahl, Dauer oder Tag-Grenzen.")
+
+    # Gierig nach Gewicht und nach Gewicht je Minute, das bessere weiter verbessern
+    schluessel = [gewichte, gewichte / dauer]
+    beste, verfahren = None, "lokale Suche"
+    for s in schluessel:
+        auswahl = vorgaben.lokale_suche(vorgaben.fuelle(pflicht.copy(), s), s)
+        if beste is None or vorgaben.wert(auswahl) > vorgaben.wert(beste):
+            beste = auswahl
+
+    optimal = False
+    if int((kandidaten & ~pflicht).sum()) <= exakt_bis:
+        auswahl, optimal = _exakt(vorgaben, beste, frist)
+        if vorgaben.wert(auswahl) > vorgaben.wert(beste) + 1e-12:
+            beste = auswahl
+        verfahren = "exakt" if optimal else verfahren
+
+    # Iterierte lokale Suche: zufällig einige Songs herausnehmen, verrauscht auffüllen, verbessern
+    while not optimal and time.perf_counter() < frist:
+        auswahl = beste.copy()
+        frei = np.flatnonzero(auswahl & ~pflicht)
+        if len(frei) == 0:
+            break
+        raus = rng.choice(frei, size=max(1, len(frei) // 4), replace=False)
+        auswahl[raus] = False
+        s = schluessel[rng.integers(2)] * rng.lognormal(0.0, 0.3, n)
+        vorgaben.lokale_suche(vorgaben.fuelle(auswahl, s), schluessel[0])
+        if vorgaben.wert(auswahl) > vorgaben.wert(beste) + 1e-12:
+            beste, verfahren = auswahl, "iterierte lokale Suche"
+
+    wert = vorgaben.wert(beste)
+    positionen = np.flatnonzero(beste)
+    positionen = positionen[np.argsort(-gewichte[positionen], kind='stable')]
+    return {
+        "positionen": positionen,
+        "wert": wert,
+        "obere_schranke": wert if optimal else max(wert, vorgaben.obere_schranke()),
+        "optimal": optimal,
+        "verfahren": verfahren,
+        "sekunden": time.perf_counter() - start,
+        "zufall": _vergleiche_mit_zufall(vorgaben, positionen, wert, vergleich, seed) if vergleich else None,
+    }
+
+
+def _vergleiche_mit_zufall(vorgaben, positionen, wert, ziehungen, seed):
+    """Gewichtete Zufallsziehungen gleicher Länge, wie bisher im Auswahl-Tab, zum Vergleich.
+
+    Liefert den Anteil der Ziehungen, die alle Vorgaben einhalten, Median und
+    Bestwert dieser zulässigen Ziehungen und den Anteil aller Ziehungen, die
+    das Ergebnis mindestens erreicht (unzulässige zählen als schlechter).
+    """
+    setlists = ziehe_setlists(vorgaben.gewichte, len(positionen), ziehungen,
+                              maske=vorgaben.kandidaten, pflicht=vorgaben.pflicht, seed=seed)
+    werte = bewerte_setlists(setlists, vorgaben.gewichte)
+    zulaessig = vorgaben.dauer[setlists].sum(axis=1) <= vorgaben.dauer_max + 1e-9
+    if len(vorgaben.grenzen):
+        zulaessig &= (vorgaben.tags[setlists].sum(axis=1) <= vorgaben.grenzen).all(axis=1)
+    zulaessig &= vorgaben.pflicht[setlists].sum(axis=1) == vorgaben.pflicht.sum()
+    gute = werte[zulaessig]
+    return {
+        "ziehungen": ziehungen,
+        "anteil_zulaessig": float(zulaessig.mean()),
+        "median": float(np.median(gute)) if len(gute) else None,
+        "bester": float(gute.max()) if len(gute) else None,
+        "erreicht_oder_besser_als": float(np.mean(~zulaessig | (werte <= wert + 1e-12))),
+    }
+
+
+def songdauer(songs_df):
+    """Minuten je Song aus der optionalen Spalte ``Dauer``; fehlende Angaben mit dem Standardwert"""
+    standard = APP_CONFIG["optimierung"]["dauer_standard_min"]
+    if 'Dauer' not in songs_df.columns:
+        return np.full(len(songs_df), float(standard))
+    dauer = pd.to_numeric(songs_df['Dauer'], errors='coerce').to_numpy(dtype=float)
+    return np.where(np.isfinite(dauer) & (dauer > 0), dauer, standard)
+
+
+def gesperrt_durch_proben(songs_df, probetage, proben):
+    """Songs, die an einem der letzten ``proben`` Probetage gespielt wurden (über ``Zuletzt_gespielt``)"""
+    if proben <= 0 or not probetage:
+        return np.zeros(len(songs_df), dtype=bool)
+    grenze = sorted(probetage)[-min(proben, len(probetage))]
+    return (songs_df['Zuletzt_gespielt'].dt.normalize() >= grenze).to_numpy()
+
+
+def plane_setlist(songs_df, anzahl=None, dauer_max=None, must_play_pflicht=False, sperre_proben=0,
+                  probetage=(), tag_grenzen=None, tag_index=None, maske=None, must_play_weight=2.0,
+                  reifegrad_weight=1.0, heute=None, zeitbudget=None, vergleich=None, seed=None):
+    """Optimierte Setlist für eine Probe auf Basis der Songliste.
+
+    ``tag_grenzen`` ordnet Tags ihre Höchstzahl zu (braucht ``tag_index``),
+    ``sperre_proben`` sperrt die Songs der letzten so vielen ``probetage``.
+    Liefert das Ergebnis von ``optimiere_setlist``, ergänzt um die ``titel``.
+    """
+    gewichte = berechne_gewichte(songs_df, must_play_weight, reifegrad_weight, heute)
+    ergebnis = optimiere_setlist(
+        gewichte, anzahl=anzahl,
+        dauer=songdauer(songs_df), dauer_max=dauer_max,
+        pflicht=songs_df['Must_Play'].to_numpy(dtype=bool) if must_play_pflicht else None,
+        gesperrt=gesperrt_durch_proben(songs_df, probetage, sperre_proben),
+        maske=maske,
+        tag_grenzen=[(tag_index.maske(irgendein=[tag]), grenze) for tag, grenze in (tag_grenzen or {}).items()],
+        zeitbudget=zeitbudget, vergleich=vergleich, seed=seed)
+    ergebnis["titel"] = songs_df['Songtitel'].to_numpy()[ergebnis["positionen"]].tolist()
+    return ergebnis
@@ -0,0 +1,95 @@
+"""Prozessweite Schreib-Warteschlange.
+
+Alle Schreibvorgänge aller Sitzungen laufen nacheinander in einem einzigen
+Schreib-Thread. Der Aufrufer bekommt sofort ein Future zurück. Aufträge mit
+gleichem Schlüssel, die noch nicht begonnen haben, werden zusammengefasst:
+Es wird nur der zuletzt eingereihte ausgeführt (z.B. mehrere komplette
+Songlisten kurz hintereinander), und zwar an dessen Stelle, also nach allen
+vor ihm eingereihten Aufträgen. Leser einer Tabelle warten über ``warte``
+nur, solange für diese Tabelle noch Aufträge offen sind.
+"""
+import itertools
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class SchreibQueue:
+    """Führt eingereihte Schreibaufträge der Reihe nach in einem Thread aus"""
+
+    def __init__(self):
+        self._auftraege = OrderedDict()
+        self._offen = {}
+        self._fehler = defaultdict(list)
+        self._bedingung = threading.Condition()
+        self._zaehler = itertools.count()
+        self._thread = None
+
+    def einreihen(self, funktion, tabelle=None, schluessel=None, gruppe=None):
+        """Reiht ``funktion`` ein und liefert ein Future mit ihrem Ergebnis.
+
+        ``tabelle`` ("songs"/"history", auch ein Tupel mehrerer) markiert, auf
+        welche Daten Leser warten müssen. Mit ``schluessel`` ersetzt der Auftrag einen noch wartenden
+        Auftrag gleichen Schlüssels und teilt dessen Future; der zusammengefasste Auftrag
+        rückt ans Ende der Warteschlange, damit er nach allen zwischendurch eingereihten läuft.
+        Fehlermeldungen landen unter ``gruppe`` (z.B. der Band) und werden je Gruppe abgeholt.
+        """
+        tabellen = tabelle if isinstance(tabelle, tuple) else (tabelle,)
+        with self._bedingung:
+            if schluessel is not None and schluessel in self._auftraege:
+                _, alte_tabellen, _, future = self._auftraege[schluessel]
+                self._auftraege[schluessel] = (funktion, alte_tabellen, gruppe, future)
+                self._auftraege.move_to_end(schluessel)
+                return future
+            future = Future()
+            if schluessel is None:
+                schluessel = next(self._zaehler)
+            self._auftraege[schluessel] = (funktion, tabellen, gruppe, future)
+            for t in tabellen:
+                self._offen[t] = self._offen.get(t, 0) + 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._arbeite, name="schreib-queue", daemon=True)
+                self._thread.start()
+            self._bedingung.notify_all()
+            return future
+
+    def warte(self, tabelle=None, timeout=None):
+        """Blockiert, bis keine Aufträge für ``tabelle`` (ohne Angabe: überhaupt keine) mehr offen sind"""
+        with self._bedingung:
+            return self._bedingung.wait_for(
+                lambda: (self._offen.get(tabelle, 0) if tabelle is not None else sum(self._offen.values())) == 0,
+                timeout)
+
+    def hole_fehler(self, gruppe=None):
+        """Liefert die Fehlermeldungen fehlgeschlagener Aufträge von ``gruppe`` und leert deren Liste"""
+        with self._bedingung:
+            return self._fehler.pop(gruppe, [])
+
+    def _arbeite(self):
+        while True:
+            with self._bedingung:
+                self._bedingung.wait_for(lambda: self._auftraege)
+                _, (funktion, tabellen, gruppe, future) = self._auftraege.popitem(last=False)
+            try:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(funktion())
+            except Exception as e:
+                logger.exception("Schreibauftrag fehlgeschlagen")
+                future.set_exception(e)
+                with self._bedingung:
+                    self._fehler[gruppe].append(str(e))
+            finally:
+                with self._bedingung:
+                    for t in tabellen:
+                        self._offen[t] -= 1
+                    self._bedingung.notify_all()
+
+
+_queue = SchreibQueue()
+
+
+def get_schreib_queue():
+    return _queue
@@ -0,0 +1,186 @@
+"""Gewichtete Songauswahl für die nächste Probe.
+
+Die Gewichte aller Songs werden in einem NumPy-Durchlauf berechnet. Setlists
+werden als Ziehen ohne Zurücklegen erzeugt, und zwar für beliebig viele
+Ziehungen gleichzeitig: Es wird mit Zurücklegen per Binärsuche auf der
+kumulierten Verteilung gezogen und Wiederholungen werden verworfen. Das ist
+gleichverteilt zum schrittweisen Ziehen ohne Zurücklegen, kostet pro Setlist
+aber nur O(k log n) statt O(n).
+"""
+from datetime import datetime, timedelta
+import numpy as np
+
+# Größe eines Blocks beim exakten Ausweichverfahren (Zeilen x Songs)
+_MAX_BLOCK = 4_000_000
+
+
+def gewichtsformel(reifegrad, must_play, tage, must_play_weight=2.0, reifegrad_weight=1.0):
+    """Ungenormte Auswahlgewichte aus Reifegrad, Must-Play und Tagen seit dem letzten Spielen.
+
+    Niedriger Reifegrad, lange Pause und Must-Play erhöhen das Gewicht.
+    ``tage`` darf eine führende Stapelachse haben (z.B. Simulationsläufe x
+    Songs); die Faktoren haben dann die Form (Läufe, 1). Die Pause wird je
+    Zeile auf die längste Pause bezogen.
+    """
+    max_days = np.max(tage, axis=-1, keepdims=True)
+    max_days = np.where(max_days == 0, 1, max_days)
+    weights = (11 - reifegrad) * reifegrad_weight + tage / max_days * 5 + must_play * must_play_weight
+    return np.clip(weights, 0.1, None)
+
+
+def berechne_gewichte(songs_df, must_play_weight=2.0, reifegrad_weight=1.0, heute=None):
+    """Normierte Auswahlgewichte aller Songs als NumPy-Array (Formel siehe ``gewichtsformel``)"""
+    if len(songs_df) == 0:
+        return np.zeros(0)
+    weights = gewichtsformel(songs_df['Reifegrad'].to_numpy(dtype=float), songs_df['Must_Play'].to_numpy(dtype=bool),
+                             tage_seit(songs_df, heute), must_play_weight, reifegrad_weight)
+    return weights / weights.sum()
+
+
+def tage_seit(songs_df, heute=None):
+    """Tage seit dem letzten Spielen je Song, bezogen auf ``heute``"""
+    heute = np.datetime64(heute or datetime.today(), 'D')
+    zuletzt = songs_df['Zuletzt_gespielt'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    return (heute - zuletzt).astype(np.int64).astype(float)
+
+
+def ziehe_setlists(gewichte, anzahl, ziehungen=1, maske=None, pflicht=None, seed=None):
+    """Zieht ``ziehungen`` Setlists mit je ``anzahl`` Songs ohne Zurücklegen.
+
+    ``maske`` beschränkt die Kandidaten (z.B. auf einen Tag-Filter),
+    ``pflicht`` markiert Songs, die in jeder Setlist enthalten sein müssen.
+    Liefert ein Array der Form (ziehungen, anzahl) mit Zeilenpositionen.
+    """
+    rng = np.random.default_rng(seed)
+    gewichte = np.asarray(gewichte, dtype=float)
+    kandidaten = gewichte > 0
+    if maske is not None:
+        kandidaten &= np.asarray(maske, dtype=bool)
+    anzahl = min(anzahl, int(kandidaten.sum()))
+    if anzahl <= 0:
+        return np.empty((ziehungen, 0), dtype=np.int64)
+
+    feste = np.empty(0, dtype=np.int64)
+    if pflicht is not None:
+        pflicht = kandidaten & np.asarray(pflicht, dtype=bool)
+        feste = np.flatnonzero(pflicht)
+        if len(feste) >= anzahl:
+            # Mehr Pflichtsongs als Plätze: unter den Pflichtsongs gewichtet ziehen
+            return _ziehe(np.where(pflicht, gewichte, 0), anzahl, ziehungen, rng)
+        kandidaten &= ~pflicht
+    rest = _ziehe(np.where(kandidaten, gewichte, 0), anzahl - len(feste), ziehungen, rng)
+    return np.hstack([np.broadcast_to(feste, (ziehungen, len(feste))), rest])
+
+
+def _ziehe(gewichte, anzahl, ziehungen, rng):
+    if anzahl == 0:
+        return np.empty((ziehungen, 0), dtype=np.int64)
+    cdf = np.cumsum(gewichte)
+    # Mit Zurücklegen überziehen; Wiederholungen werden danach verworfen
+    versuche = 2 * anzahl + 8
+    u = rng.random((ziehungen, versuche)) * cdf[-1]
+    gezogen = np.minimum(np.searchsorted(cdf, u, side='right'), len(cdf) - 1)
+    erste = _erstes_vorkommen(gezogen)
+    ok = erste.sum(axis=1) >= anzahl
+    ergebnis = np.empty((ziehungen, anzahl), dtype=np.int64)
+    if ok.any():
+        treffer = erste[ok] & (np.cumsum(erste[ok], axis=1) <= anzahl)
+        ergebnis[ok] = gezogen[ok][treffer].reshape(-1, anzahl)
+    if not ok.all():
+        # Stark konzentrierte Gewichte: die schon gezogenen verschiedenen Songs
+        # bleiben, nur die fehlenden Plätze werden exakt nachgezogen
+        fehlt = ~ok
+        erste, gezogen = erste[fehlt], gezogen[fehlt]
+        anfang = np.full((len(erste), anzahl), -1, dtype=np.int64)
+        zeilen, spalten = np.nonzero(erste)
+        anfang[zeilen, np.cumsum(erste, axis=1)[zeilen, spalten] - 1] = gezogen[zeilen, spalten]
+        ergebnis[fehlt] = _ziehe_exakt(gewichte, anzahl, len(anfang), rng, anfang)
+    return ergebnis
+
+
+def _erstes_vorkommen(gezogen):
+    """Markiert je Zeile das erste Vorkommen jedes Werts"""
+    ordnung = np.argsort(gezogen, axis=1, kind='stable')
+    sortiert = np.take_along_axis(gezogen, ordnung, axis=1)
+    neu = np.ones_like(sortiert, dtype=bool)
+    neu[:, 1:] = sortiert[:, 1:] != sortiert[:, :-1]
+    erste = np.empty_like(neu)
+    np.put_along_axis(erste, ordnung, neu, axis=1)
+    return erste
+
+
+def _ziehe_exakt(gewichte, anzahl, ziehungen, rng, anfang=None):
+    """Efraimidis-Spirakis: die ``anzahl`` kleinsten Schlüssel Exp(1)/Gewicht, aufsteigend.
+
+    ``anfang`` (ziehungen x anzahl, mit -1 aufgefüllt) gibt je Zeile die schon
+    gezogenen Songs vor; gezogen werden dann nur die restlichen Plätze unter
+    den übrigen Songs. Da die Schlüssel gedächtnislos sind, entspricht das
+    dem Weiterziehen ohne Zurücklegen.
+    """
+    with np.errstate(divide='ignore'):
+        kehrwert = np.where(gewichte > 0, 1.0 / gewichte, np.inf)
+    block = max(1, _MAX_BLOCK // len(gewichte))
+    teile = []
+    for start in range(0, ziehungen, block):
+        zeilen = min(block, ziehungen - start)
+        schluessel = rng.standard_exponential((zeilen, len(gewichte))) * kehrwert
+        if anfang is not None:
+            vorgabe = anfang[start:start + zeilen]
+            z, s = np.nonzero(vorgabe >= 0)
+            # NaN sortiert hinter alles, auch hinter Songs ohne Gewicht
+            schluessel[z, vorgabe[z, s]] = np.nan
+        auswahl = np.argpartition(schluessel, anzahl - 1, axis=1)[:, :anzahl]
+        reihenfolge = np.argsort(np.take_along_axis(schluessel, auswahl, axis=1), axis=1)
+        auswahl = np.take_along_axis(auswahl, reihenfolge, axis=1)
+        if anfang is not None:
+            schon = (vorgabe >= 0).sum(axis=1, keepdims=True)
+            platz = np.arange(anzahl)
+            nachgezogen = np.take_along_axis(auswahl, np.maximum(platz - schon, 0), axis=1)
+            auswahl = np.where(platz < schon, vorgabe, nachgezogen)
+        teile.append(auswahl)
+    return np.vstack(teile)
+
+
+def bewerte_setlists(setlists, gewichte):
+    """Summe der Gewichte je Setlist: höher heißt dringender zu proben"""
+    return np.asarray(gewichte)[setlists].sum(axis=1)
+
+
+def beste_setlist(gewichte, anzahl, ziehungen=1000, maske=None, pflicht=None, seed=None):
+    """Zieht viele Kandidaten und liefert die am besten bewertete Setlist"""
+    setlists = ziehe_setlists(gewichte, anzahl, ziehungen, maske=maske, pflicht=pflicht, seed=seed)
+    return setlists[np.argmax(bewerte_setlists(setlists, gewichte))]
+
+
+def waehle_songs(songs_df, anzahl, must_play_weight=2.0, reifegrad_weight=1.0,
+                 maske=None, must_play_pflicht=False, ziehungen=1, seed=None, heute=None):
+    """Wählt Songtitel für eine Probe; bei ``ziehungen`` > 1 die beste von N"""
+    gewichte = berechne_gewichte(songs_df, must_play_weight, reifegrad_weight, heute)
+    pflicht = songs_df['Must_Play'].to_numpy(dtype=bool) if must_play_pflicht else None
+    if ziehungen > 1:
+        positionen = beste_setlist(gewichte, anzahl, ziehungen, maske=maske, pflicht=pflicht, seed=seed)
+    else:
+        positionen = ziehe_setlists(gewichte, anzahl, 1, maske=maske, pflicht=pflicht, seed=seed)[0]
+    return songs_df['Songtitel'].to_numpy()[positionen].tolist()
+
+
+def plane_proben(songs_df, proben, anzahl, start=None, abstand_tage=7, seed=None, **optionen):
+    """Setlists für die nächsten ``proben`` Proben im Abstand von ``abstand_tage``.
+
+    Nach jeder geplanten Probe gelten ihre Songs als an diesem Tag gespielt,
+    damit die folgenden Proben andere Songs bevorzugen. ``optionen`` werden
+    an ``waehle_songs`` durchgereicht. Liefert eine Liste (Datum, Titel).
+    """
+    rng = np.random.default_rng(seed)
+    datum = start or datetime.today()
+    # Copy-on-Write: die Zuweisungen unten kopieren nur die Spalte Zuletzt_gespielt
+    songs_df = songs_df.copy(deep=False)
+    positionen = {titel: i for i, titel in enumerate(songs_df['Songtitel'])}
+    spalte = songs_df.columns.get_loc('Zuletzt_gespielt')
+    plan = []
+    for _ in range(proben):
+        titel = waehle_songs(songs_df, anzahl, seed=int(rng.integers(2**32)), heute=datum, **optionen)
+        songs_df.iloc[[positionen[t] for t in titel], spalte] = datum
+        plan.append((datum, titel))
+        datum = datum + timedelta(days=abstand_tage)
+    return plan
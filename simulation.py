@@ -0,0 +1,115 @@
+"""Monte-Carlo-Simulation der Auswahlgewichte über viele künftige Proben.
+
+Für jede Kombination aus Must-Play- und Reifegrad-Gewichtung werden
+``laeufe`` mögliche Zukünfte mit je ``proben`` Proben durchgespielt. Jede
+Probe zieht ihre Songs mit der Formel aus ``selection.gewichtsformel``;
+danach gelten die gezogenen Songs als gespielt, ihre Pause beginnt also neu
+und ihre Anzahl steigt. Alle Läufe aller Kombinationen laufen als ein
+Stapel (Läufe x Songs) gleichzeitig durch NumPy, gezogen wird wie in
+``selection._ziehe_exakt`` über Exponential-Schlüssel (die ``anzahl``
+kleinsten Exp(1)/Gewicht je Zeile). Große Raster werden in Blöcke geteilt
+und auf Wunsch im Prozesspool gerechnet.
+
+Ausgewertet wird je Kombination:
+
+- Abdeckung: Anteil der Songs, die mindestens einmal drankommen
+- Max_Luecke / Luecke_Median: längste Pause eines Songs in Proben (Beginn
+  und Ende des Zeitraums zählen mit), über alle Songs bzw. ihr Median
+- Fairness: Jain-Index der Anzahl je Song (1 = alle gleich oft)
+- Must_Play_Anteil und Reifegrad_gespielt: wohin die Proben gehen
+"""
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from config import APP_CONFIG
+from selection import gewichtsformel, tage_seit
+
+# Obergrenze für Läufe x Songs je Block und Kombinationen je Block. Die Einteilung hängt
+# nicht von der Zahl der Prozesse ab, damit dieselbe Saat dasselbe Ergebnis liefert.
+_MAX_BLOCK = 2_000_000
+_KOMBIS_JE_BLOCK = 64
+
+
+def _simuliere_block(reifegrad, must_play, tage, mp_gewichte, rg_gewichte, proben, anzahl, abstand, seed):
+    """Ein Block von Läufen; liefert Kennzahlen je Lauf und die Anzahl je Lauf und Song"""
+    rng = np.random.default_rng(seed)
+    laeufe, n = len(mp_gewichte), len(reifegrad)
+    anzahl = min(anzahl, n)
+    tage = np.broadcast_to(tage.astype(np.float32), (laeufe, n)).copy()
+    gespielt = np.zeros((laeufe, n), dtype=np.int32)
+    letzte = np.full((laeufe, n), -1, dtype=np.int32)
+    max_luecke = np.zeros((laeufe, n), dtype=np.int32)
+    # Gezogene Songs als Positionen in den flachen Arrays (Zeile * n + Song)
+    versatz = (np.arange(laeufe) * n)[:, None]
+    mp_gewichte = mp_gewichte.astype(np.float32)[:, None]
+    rg_gewichte = rg_gewichte.astype(np.float32)[:, None]
+    schluessel = np.empty((laeufe, n), dtype=np.float32)
+    for probe in range(proben):
+        gewichte = gewichtsformel(reifegrad, must_play, tage, mp_gewichte, rg_gewichte)
+        rng.standard_exponential(out=schluessel, dtype=np.float32)
+        schluessel /= gewichte
+        gezogen = (np.argpartition(schluessel, anzahl - 1, axis=1)[:, :anzahl] + versatz).ravel()
+        luecke = probe - letzte.flat[gezogen]
+        max_luecke.flat[gezogen] = np.maximum(max_luecke.flat[gezogen], luecke)
+        letzte.flat[gezogen] = probe
+        gespielt.flat[gezogen] += 1
+        tage.flat[gezogen] = 0
+        tage += abstand
+    max_luecke = np.maximum(max_luecke, proben - letzte)
+
+    summe = gespielt.sum(axis=1)
+    kennzahlen = {
+        "Abdeckung": (gespielt > 0).mean(axis=1),
+        "Max_Luecke": max_luecke.max(axis=1),
+        "Luecke_Median": np.median(max_luecke, axis=1),
+        "Fairness": summe.astype(float) ** 2 / (n * (gespielt.astype(float) ** 2).sum(axis=1)),
+        "Must_Play_Anteil": (gespielt * must_play).sum(axis=1) / summe,
+        "Reifegrad_gespielt": (gespielt * reifegrad).sum(axis=1) / summe,
+    }
+    return kennzahlen, gespielt
+
+
+def simuliere(songs_df, must_play_weights, reifegrad_weights, proben=None, anzahl=5, laeufe=None,
+              abstand_tage=None, heute=None, je_song=False, prozesse=1, seed=None):
+    """Simuliert alle Kombinationen der beiden Gewichtungen (kartesisches Raster).
+
+    Liefert einen DataFrame mit einer Zeile je Kombination und den
+    Kennzahlen als Mittel über die Läufe; mit ``je_song`` zusätzlich einen
+    DataFrame (Kombinationen x Songtitel) mit der erwarteten Anzahl je Song.
+    ``prozesse`` > 1 verteilt die Blöcke auf einen Prozesspool; das Ergebnis
+    hängt nur von ``seed`` ab, nicht von der Zahl der Prozesse.
+    """
+    einstellungen = APP_CONFIG["simulation"]
+    proben = einstellungen["proben"] if proben is None else proben
+    laeufe = einstellungen["laeufe"] if laeufe is None else laeufe
+    abstand_tage = einstellungen["abstand_tage"] if abstand_tage is None else abstand_tage
+    mp, rg = (a.ravel() for a in np.meshgrid(np.asarray(must_play_weights, dtype=float),
+                                             np.asarray(reifegrad_weights, dtype=float), indexing='ij'))
+    raster = pd.DataFrame({"must_play_weight": mp, "reifegrad_weight": rg})
+    n = len(songs_df)
+    if n == 0 or anzahl <= 0:
+        return (raster, None) if je_song else raster
+
+    reifegrad = songs_df['Reifegrad'].to_numpy(dtype=np.float32)
+    must_play = songs_df['Must_Play'].to_numpy(dtype=bool)
+    tage = tage_seit(songs_df, heute)
+    # Alle Läufe einer Kombination liegen nebeneinander, Blöcke enthalten nur ganze Kombinationen
+    kombis_je_block = min(_KOMBIS_JE_BLOCK, max(1, _MAX_BLOCK // (n * laeufe)))
+    bloecke = [np.arange(start, min(start + kombis_je_block, len(raster)))
+               for start in range(0, len(raster), kombis_je_block)]
+    seeds = np.random.SeedSequence(seed).spawn(len(bloecke))
+    auftraege = [(reifegrad, must_play, tage, np.repeat(mp[b], laeufe), np.repeat(rg[b], laeufe),
+                  proben, anzahl, abstand_tage, s) for b, s in zip(bloecke, seeds)]
+    if prozesse != 1 and len(auftraege) > 1:
+        with ProcessPoolExecutor(max_workers=prozesse) as pool:
+            teile = list(pool.map(_simuliere_block, *zip(*auftraege)))
+    else:
+        teile = [_simuliere_block(*a) for a in auftraege]
+
+    for name in teile[0][0]:
+        werte = np.concatenate([kennzahlen[name] for kennzahlen, _ in teile])
+        raster[name] = werte.reshape(len(raster), laeufe).mean(axis=1)
+    if not je_song:
+        return raster
+    gespielt = np.vstack([g for _, g in teile]).reshape(len(raster), laeufe, n).mean(axis=1)
+    return raster, pd.DataFrame(gespielt, columns=songs_df['Songtitel'].to_numpy())
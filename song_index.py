@@ -0,0 +1,47 @@
+"""Zuordnung von Songtiteln zu Zeilen der Songliste, unabhängig von Schreibweisen."""
+import numpy as np
+import pandas as pd
+
+
+def normalisiere_titel(titel):
+    """Vergleichsschlüssel für Songtitel: ohne Groß/Klein- und Leerzeichen-Unterschiede"""
+    if isinstance(titel, pd.Series):
+        return titel.astype('string').str.strip().str.replace(r'\s+', ' ', regex=True).str.casefold()
+    return ' '.join(str(titel).split()).casefold()
+
+
+class SongIndex:
+    """Songtitel -> Zeilenposition in der Songliste.
+
+    Nachschlagen erfolgt über den normalisierten Titel. Kommt ein Titel in
+    mehreren Schreibweisen vor, zeigt der Index auf die erste Zeile; die
+    übrigen sind unter ``duplikate`` aufgeführt.
+    """
+
+    def __init__(self, songs_df):
+        schluessel = normalisiere_titel(songs_df['Songtitel']).fillna('')
+        doppelt = schluessel.duplicated()
+        self.duplikate = songs_df['Songtitel'][doppelt.to_numpy()].tolist()
+        self._index = pd.Index(schluessel[~doppelt].to_numpy())
+        self._positionen = np.flatnonzero(~doppelt.to_numpy())
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, titel):
+        return self.position(titel) >= 0
+
+    def position(self, titel):
+        """Zeilenposition eines Titels oder -1, falls unbekannt"""
+        treffer = self._index.get_indexer([normalisiere_titel(titel)])[0]
+        return int(self._positionen[treffer]) if treffer >= 0 else -1
+
+    def positionen(self, titel):
+        """Zeilenpositionen vieler Titel auf einmal, -1 für unbekannte"""
+        if isinstance(getattr(titel, 'dtype', None), pd.CategoricalDtype):
+            # Kategorisch (History): jeden Titel nur einmal nachschlagen
+            codes = titel.cat.codes.to_numpy()
+            je_titel = self.positionen(pd.Series(titel.cat.categories, dtype=object))
+            return np.where(codes >= 0, je_titel[codes], -1)
+        treffer = self._index.get_indexer(normalisiere_titel(pd.Series(titel, dtype=object)).fillna(''))
+        return np.where(treffer >= 0, self._positionen[treffer], -1)
@@ -0,0 +1,153 @@
+"""Kommandozeile für Planung und Auswertung ohne Oberfläche.
+
+Jede Band ist ein Verzeichnis mit eigener Songliste und History (gleiche
+Dateinamen wie in ``APP_CONFIG``). Mehrere Bands werden parallel in einem
+Prozesspool bearbeitet.
+
+    python songpicker_cli.py plane --proben 12 --songs 6 --bands band_a band_b
+    python songpicker_cli.py statistik --schreiben
+    python songpicker_cli.py bericht --bands band_* --prozesse 4
+    python songpicker_cli.py simuliere --songs 6 --must-play 1 2 3 4 5 --reifegrad 0.5 1 1.5 2
+
+``statistik --schreiben`` schreibt direkt ins Speicher-Backend und sollte
+nicht laufen, während die App für dieselbe Band geöffnet ist.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import pandas as pd
+
+from config import APP_CONFIG
+import mandant
+from storage import erstelle_backend, SONG_SPALTEN
+from history_log import materialisiere
+from history_aggregate import HistoryAggregate
+from data_manager import DataManager
+from selection import plane_proben
+from analyse import kennzahlen
+from songstatistik import berechne_songstatistik
+from simulation import simuliere
+
+
+def _lade(backend):
+    songs = backend.lade_songs()
+    songs = DataManager.normalisiere_songliste(songs if songs is not None else pd.DataFrame(columns=SONG_SPALTEN))
+    history = DataManager.typisiere_history(materialisiere(backend.lade_history(), backend.lade_history_events()))
+    return songs, history
+
+
+def plane_band(verzeichnis, proben, songs, start, abstand, ziehungen, must_play_pflicht, seed):
+    """Setlists der nächsten Proben einer Band"""
+    with mandant.verwende(verzeichnis):
+        songs_df, _ = _lade(erstelle_backend(APP_CONFIG["storage"]["backend"]))
+    plan = plane_proben(songs_df, proben, songs, start=start, abstand_tage=abstand, seed=seed,
+                        ziehungen=ziehungen, must_play_pflicht=must_play_pflicht)
+    return [(verzeichnis, datum.strftime('%Y-%m-%d'), titel) for datum, setlist in plan for titel in setlist]
+
+
+def statistik_band(verzeichnis, schreiben):
+    """Zuletzt_gespielt/Anzahl_gespielt einer Band aus der History neu berechnen"""
+    with mandant.verwende(verzeichnis):
+        backend = erstelle_backend(APP_CONFIG["storage"]["backend"])
+        songs_df, history_df = _lade(backend)
+        neu, geaendert = berechne_songstatistik(songs_df, history_df)
+        if schreiben and geaendert:
+            backend.speichere_songs(neu)
+    return {"band": verzeichnis, "geaendert": geaendert, "geschrieben": bool(schreiben and geaendert)}
+
+
+def bericht_band(verzeichnis):
+    """Kennzahlen einer Band wie im Analyse-Tab"""
+    with mandant.verwende(verzeichnis):
+        songs_df, history_df = _lade(erstelle_backend(APP_CONFIG["storage"]["backend"]))
+    werte = kennzahlen(songs_df, HistoryAggregate.aus_history(history_df))
+    return {"band": verzeichnis, **werte}
+
+
+def simuliere_band(verzeichnis, must_play_weights, reifegrad_weights, songs, proben, laeufe, prozesse, seed):
+    """Kennzahlen der Gewichtungen einer Band; die Simulation selbst nutzt den Prozesspool"""
+    with mandant.verwende(verzeichnis):
+        songs_df, _ = _lade(erstelle_backend(APP_CONFIG["storage"]["backend"]))
+    raster = simuliere(songs_df, must_play_weights, reifegrad_weights, proben=proben, anzahl=songs,
+                       laeufe=laeufe, prozesse=prozesse, seed=seed)
+    return raster.assign(Band=verzeichnis)
+
+
+def fuehre_aus(funktion, bands, prozesse, *args):
+    """Ruft ``funktion(band, *args)`` für alle Bands auf, ab zwei Bands im Prozesspool"""
+    bands = [os.path.abspath(b) for b in bands]
+    if len(bands) == 1 or prozesse == 1:
+        return [funktion(band, *args) for band in bands]
+    with ProcessPoolExecutor(max_workers=prozesse) as pool:
+        return list(pool.map(funktion, bands, *[[a] * len(bands) for a in args]))
+
+
+def main(argv=None):
+    gemeinsam = argparse.ArgumentParser(add_help=False)
+    gemeinsam.add_argument("--bands", nargs="+",
+                           default=[mandant.verzeichnis_der_band(b) for b in mandant.bands()] or ["."],
+                           help="Datenverzeichnisse (Standard: alle Bands aus der Konfiguration, sonst das aktuelle)")
+    gemeinsam.add_argument("--prozesse", type=int, default=None, help="Anzahl Prozesse (Standard: CPU-Kerne)")
+    parser = argparse.ArgumentParser(description="Songpicker ohne Oberfläche")
+    befehle = parser.add_subparsers(dest="befehl", required=True)
+
+    plane = befehle.add_parser("plane", parents=[gemeinsam], help="Setlists für die nächsten Proben erzeugen")
+    plane.add_argument("--proben", type=int, default=4)
+    plane.add_argument("--songs", type=int, default=5)
+    plane.add_argument("--start", type=lambda s: datetime.strptime(s, '%Y-%m-%d'), default=None,
+                       help="Datum der ersten Probe (JJJJ-MM-TT, Standard: heute)")
+    plane.add_argument("--abstand", type=int, default=7, help="Tage zwischen zwei Proben")
+    plane.add_argument("--ziehungen", type=int, default=1, help="Beste aus N Ziehungen je Probe")
+    plane.add_argument("--must-play", action="store_true", help="Must-Play Songs immer einplanen")
+    plane.add_argument("--seed", type=int, default=None)
+    plane.add_argument("--ausgabe", help="CSV-Datei statt Standardausgabe")
+
+    statistik = befehle.add_parser("statistik", parents=[gemeinsam], help="Abgeleitete Songdaten aus der History neu berechnen")
+    statistik.add_argument("--schreiben", action="store_true", help="Änderungen speichern")
+
+    befehle.add_parser("bericht", parents=[gemeinsam], help="Kennzahlen als JSON ausgeben")
+
+    simulation = befehle.add_parser("simuliere", parents=[gemeinsam],
+                                    help="Auswahl-Gewichtungen über viele künftige Proben simulieren")
+    simulation.add_argument("--must-play", type=float, nargs="+", default=[1.0, 2.0, 3.0, 4.0, 5.0])
+    simulation.add_argument("--reifegrad", type=float, nargs="+", default=[0.5, 1.0, 1.5, 2.0])
+    simulation.add_argument("--songs", type=int, default=5, help="Songs je Probe")
+    simulation.add_argument("--proben", type=int, default=None, help="Simulierte Proben je Lauf")
+    simulation.add_argument("--laeufe", type=int, default=None, help="Läufe je Kombination")
+    simulation.add_argument("--seed", type=int, default=None)
+    simulation.add_argument("--ausgabe", help="CSV-Datei statt Standardausgabe")
+
+    args = parser.parse_args(argv)
+    if args.befehl == "plane":
+        teile = fuehre_aus(plane_band, args.bands, args.prozesse, args.proben, args.songs, args.start,
+                           args.abstand, args.ziehungen, args.must_play, args.seed)
+        ausgabe = open(args.ausgabe, "w", newline="", encoding="utf-8") if args.ausgabe else sys.stdout
+        try:
+            schreiber = csv.writer(ausgabe, delimiter=';')
+            schreiber.writerow(["Band", "Probe", "Songtitel"])
+            for zeilen in teile:
+                schreiber.writerows(zeilen)
+        finally:
+            if args.ausgabe:
+                ausgabe.close()
+    elif args.befehl == "statistik":
+        for ergebnis in fuehre_aus(statistik_band, args.bands, args.prozesse, args.schreiben):
+            print(f"{ergebnis['band']}: {ergebnis['geaendert']} Songs geändert"
+                  + (" (gespeichert)" if ergebnis['geschrieben'] else ""))
+    elif args.befehl == "simuliere":
+        # Bands nacheinander, jede Simulation verteilt ihre Blöcke selbst auf die Prozesse
+        raster = pd.concat([simuliere_band(os.path.abspath(band), args.must_play, args.reifegrad, args.songs,
+                                           args.proben, args.laeufe, args.prozesse, args.seed)
+                            for band in args.bands])
+        raster.to_csv(args.ausgabe or sys.stdout, sep=';', index=False, float_format='%.4f')
+    elif args.befehl == "bericht":
+        print(json.dumps(fuehre_aus(bericht_band, args.bands, args.prozesse), indent=2,
+                         ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    main()
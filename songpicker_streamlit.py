@@ -1,19 +1,28 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import random
+import time
 import os
-import io
-import zipfile
-import base64
-import json
-from streamlit_echarts import st_echarts
-from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
-
-from config import APP_CONFIG
-from utils import color_for_reifegrad, kommentar_fuer_reifegrad, color_for_reifegrad_mpl
-from data_manager import DataManager
+import startprofil
+import messung
+
+# matplotlib (charts) und streamlit_echarts werden erst in den Ansichten geladen
+with startprofil.messe("import pandas"):
+    import pandas as pd
+with startprofil.messe("import App-Module"):
+    from config import APP_CONFIG
+    import charts
+    from utils import color_for_reifegrad, kommentar_fuer_reifegrad, color_for_reifegrad_mpl, backup_dateien
+    from backup_store import get_backup_store
+    from data_manager import DataManager
+    from selection import waehle_songs
+    from optimierung import plane_setlist
+    from simulation import simuliere
+    import analyse
+    import nachbereitung
+    import export
+    import mandant
+    from datensatz_cache import get_datensatz_cache
 
 # ======= EINRICHTUNG DER STREAMLIT-SEITE =======
 st.set_page_config(
@@ -83,38 +92,157 @@ html, body, .stApp {
 '''
 st.markdown(responsive_css, unsafe_allow_html=True)
 
-# Cache für häufig verwendete Daten
-@st.cache_data(ttl=300)  # Cache für 5 Minuten
+# Cache für häufig verwendete Daten, gültig bis zum nächsten Schreibvorgang.
+# Die Datenversion (mit der Band) ist Teil des Cache-Schlüssels; alte Versionen fallen heraus.
+# Songliste und History liegen einmal je Band im prozessweiten Datensatz-Cache; jeder Aufruf
+# liefert nur eine flache Kopie, die Ansichten dürfen sie also ohne .copy() verändern.
+@messung.gecacht("songliste")
+def _lade_songliste(version):
+    return DataManager.songliste(version)
+
+@messung.gecacht("history")
+def _lade_history(version):
+    return DataManager.history(version)
+
 def get_cached_songliste():
-    return DataManager.lade_songliste()
+    return _lade_songliste(DataManager.songs_version())
 
-@st.cache_data(ttl=300)
 def get_cached_history():
-    return DataManager.lade_history()
-
-NAECHSTE_PROBE_FILE = "naechste_probe.csv"
+    return _lade_history(DataManager.history_version())
+
+@messung.gecacht("tag_index")
+def _baue_tag_index(version):
+    return DataManager.tag_index(_lade_songliste(version), version)
+
+def get_tag_index():
+    """Tag-Index der aktuellen Songliste, einmal je Datenversion und Band gebaut"""
+    return _baue_tag_index(DataManager.songs_version())
+
+# Diagramme als fertige PNG-Bytes bzw. echarts-Optionen je Datenversion
+@messung.gecacht("chart_top_songs")
+@st.cache_data(max_entries=2)
+def _top_songs_chart(songs_version, history_version, anzahl=10):
+    messung.cache_verfehlt()
+    top = DataManager.history_aggregat().meistgespielt(anzahl)
+    reifegrad_map = _lade_songliste(songs_version).set_index('Songtitel')['Reifegrad'].to_dict()
+    farben = [color_for_reifegrad_mpl(reifegrad_map.get(song, 5)) for song in top.index]
+    return charts.top_songs_png(top.index, top.values, farben)
+
+@messung.gecacht("chart_reifegrad")
+@st.cache_data(max_entries=2)
+def _reifegrad_chart(songs_version):
+    messung.cache_verfehlt()
+    return charts.reifegrad_histogramm_png(_lade_songliste(songs_version)['Reifegrad'])
+
+@messung.gecacht("band_health")
+@st.cache_data(max_entries=2)
+def _band_health_option(songs_version):
+    messung.cache_verfehlt()
+    songs_df = _lade_songliste(songs_version)
+    return charts.band_health_option(songs_df['Reifegrad'].mean() if not songs_df.empty else 0)
+
+# Raster der beiden Regler in ihren Schritten
+MUST_PLAY_STUFEN = [x / 2 for x in range(2, 11)]
+REIFEGRAD_STUFEN = [x / 10 for x in range(5, 21)]
+
+@messung.gecacht("simulation")
+@st.cache_data(max_entries=4)
+def _simuliere_gewichte(songs_version, anzahl):
+    messung.cache_verfehlt()
+    return simuliere(_lade_songliste(songs_version), MUST_PLAY_STUFEN, REIFEGRAD_STUFEN, anzahl=anzahl, seed=0)
+
+def _export_bundle(band, versionen, von, bis):
+    # Läuft erst beim Klick auf den Download; das Bündel liegt je Datenstand und Zeitraum auf der Platte
+    with mandant.verwende(band):
+        def lade_daten():
+            history_df = _lade_history(versionen[1])
+            return (_lade_songliste(versionen[0]), history_df,
+                    DataManager.history_index(history_df, versionen[1]))
+        pfad = export.bundle_datei(versionen, lade_daten, von, bis)
+    with open(pfad, 'rb') as f:
+        return f.read()
+
+# Zustand der Sitzung, der zu den Daten einer Band gehört
+BAND_SCHLUESSEL = ("selected_songs", "optimierung_bericht", "songs_to_remove", "commitments", "undo_removed_songs",
+                   "songliste_editor_zeilen", "songliste_vorgemerkt",
+                   "nachbereitung_probedatum_select", "export_von", "export_bis")
+
+def _band_gewechselt():
+    for schluessel in BAND_SCHLUESSEL:
+        st.session_state.pop(schluessel, None)
+    _neuer_editor()
+
+def _editor_schluessel():
+    return f"songliste_editor_{st.session_state.get('songliste_editor_runde', 0)}"
+
+def _neuer_editor():
+    # Neuer Schlüssel: auch das Frontend vergisst die Zeilennummern des alten Editors
+    st.session_state.pop(_editor_schluessel(), None)
+    st.session_state['songliste_editor_runde'] = st.session_state.get('songliste_editor_runde', 0) + 1
+
+def _editor_aenderungen(zeilen):
+    """Änderungen im Editor, über die Titel der Zeilen ``zeilen`` statt über Positionen.
+
+    ``zeilen`` sind die Songtitel der Tabelle, auf die sich der Editor-Zustand bezieht.
+    Dazu kommen die vorgemerkten Änderungen früherer Tabellen (siehe ``zeige_songliste_bearbeiten``).
+    """
+    editor = st.session_state.get(_editor_schluessel(), {})
+    geaendert, neu, geloescht = st.session_state.get("songliste_vorgemerkt", ({}, [], []))
+    geaendert = {titel: dict(felder) for titel, felder in geaendert.items()}
+    for zeile, felder in editor.get("edited_rows", {}).items():
+        geaendert.setdefault(zeilen[int(zeile)], {}).update(felder)
+    neu = neu + list(editor.get("added_rows", []))
+    geloescht = list(dict.fromkeys(geloescht + [zeilen[int(zeile)] for zeile in editor.get("deleted_rows", [])]))
+    return geaendert, neu, geloescht
 
 # ======= UI-START =======
-if os.path.exists(APP_CONFIG["files"]["logo"]):
-    st.image(APP_CONFIG["files"]["logo"], width=120)
+# Zeitmessung dieses Durchlaufs: Panel per Konfiguration oder ?debug=1, Log per Konfiguration
+debug_panel = APP_CONFIG["messung"]["debug_panel"] or st.query_params.get("debug") == "1"
+if debug_panel or APP_CONFIG["messung"]["log"]:
+    messung.starte_lauf(tab=st.session_state.get("tab"))
+
+# Mehrere Bands: jede hat ihr eigenes Datenverzeichnis, die Auswahl steht in der URL (?band=...)
+bands = mandant.bands()
+if bands:
+    band = st.sidebar.selectbox("Band", bands, key="band", on_change=_band_gewechselt, bind="query-params")
+    mandant.setze(mandant.verzeichnis_der_band(band))
+# Fragmente laufen bei ihrem eigenen Rerun in einem neuen Thread ohne die Kontextvariable
+st.session_state["mandant"] = mandant.aktiv()
+
+# Platz für Fehlermeldungen; gefüllt wird er erst, nachdem die Ansicht gelaufen ist
+fehler_bereich = st.container()
+
+# Ein Logo im Verzeichnis der Band ersetzt das allgemeine
+logo = next((p for p in (mandant.pfad(APP_CONFIG["files"]["logo"]), APP_CONFIG["files"]["logo"])
+             if os.path.exists(p)), None)
+if logo:
+    st.image(logo, width=120)
 
 st.title("Songpicker for Foo Fightclub")
 
 # Tabs mit verbessertem Layout
 probe_tabs = ["Nächste Probe"] + ["🎲 Auswahl", "📊 Analyse", "📜 History", "🎯 Nachbereitung", "✏️ Songliste bearbeiten"]
-tabs = st.tabs(probe_tabs)
-if 'tab_index' in st.session_state:
-    st.experimental_set_query_params(tab=st.session_state['tab_index'])
+# Nur der sichtbare Tab wird ausgeführt; der aktive Tab steht in der URL (?tab=...)
+tabs = st.tabs(probe_tabs, key="tab", on_change="rerun", bind="query-params")
+
+def zeige_view(label, view):
+    """Führt eine Tab-Ansicht aus und merkt sich ihre Laufzeit für die Seitenleiste"""
+    start = time.perf_counter()
+    with startprofil.messe(f"erster Durchlauf: {label}"), messung.spanne(f"tab:{label}"):
+        view()
+    st.session_state.setdefault('view_zeiten', {})[label] = (time.perf_counter() - start) * 1000
 
 # --- TAB 0: Nächste Probe ---
-with tabs[0]:
+# Als Fragment: ein Klick auf 👍 führt nur diese Ansicht erneut aus
+@st.fragment
+def zeige_naechste_probe():
+    with mandant.verwende(st.session_state["mandant"]):
+        _zeige_naechste_probe()
+
+def _zeige_naechste_probe():
     st.header("📝 Nächste Probe: Song-Übersicht")
     demo_user = "Demo-User"
-    if os.path.exists(NAECHSTE_PROBE_FILE):
-        with open(NAECHSTE_PROBE_FILE, "r", encoding="utf-8") as f:
-            selected_songs = [line.strip() for line in f if line.strip()]
-    else:
-        selected_songs = []
+    selected_songs = DataManager.lade_naechste_probe()
     if not selected_songs:
         st.info("Es wurde noch keine Songauswahl für die nächste Probe gespeichert.")
     else:
@@ -130,54 +258,18 @@ with tabs[0]:
             with col2:
                 if st.button("👍" if not committed else "✅", key=key):
                     st.session_state['commitments'][song] = not committed
-                    st.rerun()
+                    st.rerun(scope="fragment")
                 if committed:
                     st.caption(f"{demo_user} committed")
 
 # --- TAB 1: Auswahl ---
-with tabs[1]:
+def zeige_auswahl():
     # Band-Health-Meter (Gauge)
     st.markdown('<h3 style="text-align:center; margin-bottom: 0.5em;">Band-Health</h3>', unsafe_allow_html=True)
     songs_df = get_cached_songliste()
-    avg_reifegrad = songs_df['Reifegrad'].mean() if not songs_df.empty else 0
-    option = {
-        "series": [
-            {
-                "type": "gauge",
-                "startAngle": 210,
-                "endAngle": -30,
-                "min": 0,
-                "max": 10,
-                "progress": {"show": True, "width": 18},
-                "axisLine": {
-                    "lineStyle": {
-                        "width": 18,
-                        "color": [
-                            [0.4, "#fc5454"],   # Rot
-                            [0.8, "#fcdf1f"],   # Gelb
-                            [1,   "#3cb371"]    # Grün
-                        ]
-                    }
-                },
-                "pointer": {"icon": "rect", "width": 8, "length": "70%", "offsetCenter": [0, "8%"]},
-                "axisTick": {"show": False},
-                "splitLine": {"show": False},
-                "axisLabel": {"distance": 25, "fontSize": 14, "color": "#fafafa"},
-                "detail": {
-                    "valueAnimation": True,
-                    "formatter": "{value} / 10",
-                    "fontSize": 24,
-                    "color": "#fafafa",
-                    "backgroundColor": "#222a",
-                    "borderRadius": 8,
-                    "padding": [6, 12],
-                    "offsetCenter": [0, '60%']
-                },
-                "data": [{"value": round(avg_reifegrad, 1)}]
-            }
-        ],
-        "backgroundColor": "#0e1117"
-    }
+    option = _band_health_option(DataManager.songs_version())
+    with startprofil.messe("import streamlit_echarts"):
+        from streamlit_echarts import st_echarts
     st_echarts(option, height="260px")
     st.info("Das Band-Health-Meter zeigt den aktuellen durchschnittlichen Reifegrad aller Songs.")
 
@@ -192,12 +284,16 @@ with tabs[1]:
     # Step 1: Filter
     with st.expander("1️⃣ Filter (Tags)", expanded=True):
         songs_df = get_cached_songliste()
-        alle_tags = set()
-        for tags in songs_df['Tags'].dropna():
-            for tag in [t.strip() for t in str(tags).split(',') if t.strip()]:
-                alle_tags.add(tag)
-        alle_tags = sorted(alle_tags)
-        selected_tags = st.multiselect("Nach Tags filtern", alle_tags, key="auswahl_tagfilter")
+        tag_index = get_tag_index()
+        selected_tags = st.multiselect("Nach Tags filtern", tag_index.tags, key="auswahl_tagfilter")
+        alle_tags_noetig = st.checkbox("Nur Songs mit allen gewählten Tags", value=False, key="auswahl_tagfilter_alle")
+        ausgeschlossene_tags = st.multiselect("Tags ausschließen", tag_index.tags, key="auswahl_tagfilter_ohne")
+        if alle_tags_noetig:
+            tag_maske = tag_index.maske(alle=selected_tags, keins=ausgeschlossene_tags)
+        else:
+            tag_maske = tag_index.maske(irgendein=selected_tags, keins=ausgeschlossene_tags)
+        if selected_tags or ausgeschlossene_tags:
+            st.caption(f"{int(tag_maske.sum())} von {len(songs_df)} Songs passen zum Filter.")
 
     # Step 2: Einstellungen
     with st.expander("2️⃣ Einstellungen", expanded=True):
@@ -211,36 +307,113 @@ with tabs[1]:
                                     help="Bestimmt, wie stark Must-Play Songs bevorzugt werden")
         reifegrad_weight = st.slider("Gewichtung für Reifegrad", 0.5, 2.0, 1.0, 0.1,
                                     help="Bestimmt, wie stark der Reifegrad die Auswahl beeinflusst")
+        must_play_pflicht = st.checkbox("Must-Play Songs immer einplanen", value=False,
+                                        help="Must-Play Songs werden fest in jede Auswahl übernommen")
+        ziehungen = st.number_input("Beste aus N Ziehungen", 1, 10000, 1,
+                                    help="Zieht N Vorschläge und übernimmt den mit dem höchsten Gesamtgewicht")
+        proben = APP_CONFIG["simulation"]["proben"]
+        if st.checkbox("📈 Gewichtungen simulieren", key="gewichte_simulieren",
+                       help=f"Spielt für jede Stellung der beiden Regler {proben} künftige Proben "
+                            f"{APP_CONFIG['simulation']['laeufe']}-mal durch"):
+            raster = _simuliere_gewichte(DataManager.songs_version(), anzahl_songs)
+            aktuell = raster[((raster['must_play_weight'] - must_play_weight).abs() < 1e-9)
+                             & ((raster['reifegrad_weight'] - reifegrad_weight).abs() < 1e-9)]
+            if not aktuell.empty:
+                z = aktuell.iloc[0]
+                st.caption(f"Aktuelle Einstellung über {proben} Proben: {z['Abdeckung']:.0%} der Songs kommen dran, "
+                           f"längste Pause im Median {z['Luecke_Median']:.0f} Proben, Fairness {z['Fairness']:.2f}, "
+                           f"{z['Must_Play_Anteil']:.0%} Must-Play, Reifegrad gespielter Songs {z['Reifegrad_gespielt']:.1f}")
+            st.dataframe(raster.sort_values(['Abdeckung', 'Fairness'], ascending=False), hide_index=True,
+                         column_config={
+                             "must_play_weight": st.column_config.NumberColumn("Must-Play", format="%.1f"),
+                             "reifegrad_weight": st.column_config.NumberColumn("Reifegrad", format="%.1f"),
+                             "Abdeckung": st.column_config.NumberColumn(format="percent"),
+                             "Max_Luecke": st.column_config.NumberColumn("Längste Pause", format="%.1f",
+                                                                          help="Längste Pause eines Songs in Proben"),
+                             "Luecke_Median": st.column_config.NumberColumn("Pause (Median)", format="%.1f"),
+                             "Fairness": st.column_config.NumberColumn(format="%.2f",
+                                                                       help="Jain-Index der Einsätze je Song, 1 = alle gleich oft"),
+                             "Must_Play_Anteil": st.column_config.NumberColumn("Must-Play-Anteil", format="percent"),
+                             "Reifegrad_gespielt": st.column_config.NumberColumn("Ø Reifegrad", format="%.1f"),
+                         })
+    # Vorgaben gelten nur für "Setlist optimieren"
+    with st.expander("🧮 Vorgaben für die optimierte Setlist", expanded=False):
+        dauer_max = st.number_input("Gesamtdauer höchstens (Minuten, 0 = ohne Grenze)", 0, 600, 0, 5,
+                                    help="Dauer je Song aus der Spalte 'Dauer', sonst "
+                                         f"{APP_CONFIG['optimierung']['dauer_standard_min']:g} Minuten")
+        sperre_proben = st.number_input("Keine Songs aus den letzten N Proben", 0, 10, 0)
+        begrenzte_tags = st.multiselect("Tags begrenzen", tag_index.tags, key="optimierung_tags")
+        tag_hoechstens = st.number_input("Höchstens so viele Songs je begrenztem Tag", 0, 10, 2)
+        zeitbudget = st.slider("Rechenzeit (Sekunden)", 0.1, 5.0, float(APP_CONFIG["optimierung"]["zeitbudget_s"]), 0.1)
 
     # Step 3: Songauswahl & Aktionen
     with st.expander("3️⃣ Songauswahl & Aktionen", expanded=True):
         if songs_df.empty:
             st.error("Die Datei songliste.csv wurde nicht gefunden oder ist leer.")
         else:
-            # Gewichtete Auswahl mit verbesserten Gewichtungen (wie vorher)
-            max_days = (datetime.today() - songs_df['Zuletzt_gespielt']).dt.days.max()
-            if max_days == 0: max_days = 1
-            weights = (
-                (11 - songs_df['Reifegrad']) * must_play_weight +
-                (songs_df['Zuletzt_gespielt'].apply(lambda d: (datetime.today() - d).days) / max_days * 5) +
-                (songs_df['Must_Play'] * reifegrad_weight)
-            )
-            weights = weights.clip(lower=0.1)
-            weights = weights / weights.sum()
+            if not tag_maske.any():
+                st.warning("Kein Song passt zum aktuellen Tag-Filter.")
             selected_songs_container = st.container()
             if st.button("🎲 Songs auswählen", use_container_width=True, help="Erstellt eine neue zufällige Songauswahl nach den aktuellen Kriterien."):
-                n_songs = min(anzahl_songs, len(songs_df))
-                auswahl = songs_df.sample(n=n_songs, weights=weights, random_state=random.randint(0, 10000))
-                st.session_state.selected_songs = auswahl['Songtitel'].tolist()
+                # Gewichtete Auswahl, vektorisiert im Auswahl-Modul
+                st.session_state.selected_songs = waehle_songs(
+                    songs_df, anzahl_songs,
+                    must_play_weight=must_play_weight,
+                    reifegrad_weight=reifegrad_weight,
+                    maske=tag_maske,
+                    must_play_pflicht=must_play_pflicht,
+                    ziehungen=int(ziehungen),
+                    seed=random.randint(0, 10000)
+                )
+                st.session_state.pop('optimierung_bericht', None)
                 st.rerun()
+            if st.button("🧮 Setlist optimieren", use_container_width=True,
+                         help="Sucht die Auswahl mit dem höchsten Gesamtgewicht, die alle Vorgaben einhält."):
+                try:
+                    ergebnis = plane_setlist(
+                        songs_df, anzahl_songs,
+                        dauer_max=dauer_max or None,
+                        must_play_pflicht=must_play_pflicht,
+                        sperre_proben=sperre_proben,
+                        probetage=DataManager.history_aggregat().probetage if sperre_proben else (),
+                        tag_grenzen={tag: tag_hoechstens for tag in begrenzte_tags},
+                        tag_index=tag_index,
+                        maske=tag_maske,
+                        must_play_weight=must_play_weight,
+                        reifegrad_weight=reifegrad_weight,
+                        zeitbudget=zeitbudget,
+                        seed=random.randint(0, 10000)
+                    )
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    st.session_state.selected_songs = ergebnis['titel']
+                    st.session_state['optimierung_bericht'] = {k: v for k, v in ergebnis.items() if k != 'positionen'}
+                    st.rerun()
             if 'selected_songs' not in st.session_state:
                 st.session_state.selected_songs = []
             with selected_songs_container:
                 if st.session_state.selected_songs:
                     st.subheader("🎵 Ausgewählte Songs")
                     st.write(f"Anzahl ausgewählter Songs: {len(st.session_state.selected_songs)}")
+                    bericht = st.session_state.get('optimierung_bericht')
+                    if bericht:
+                        anteil = bericht['wert'] / bericht['obere_schranke'] if bericht['obere_schranke'] else 1
+                        text = (f"Optimiert ({bericht['verfahren']}, {bericht['sekunden']:.2f} s): Gesamtgewicht "
+                                f"{bericht['wert']:.3f}, " + ("beweisbar optimal." if bericht['optimal'] else
+                                f"mindestens {anteil:.0%} des bestmöglichen Werts."))
+                        zufall = bericht['zufall']
+                        if zufall:
+                            text += (f" Von {zufall['ziehungen']} Zufallsziehungen halten {zufall['anteil_zulaessig']:.0%}"
+                                     " alle Vorgaben ein" + (f" (Median {zufall['median']:.3f})" if zufall['median'] else "")
+                                     + f"; die optimierte Setlist erreicht oder übertrifft {zufall['erreicht_oder_besser_als']:.0%}.")
+                        st.caption(text)
+                    song_index = DataManager.song_index(songs_df)
                     for song in st.session_state.selected_songs:
-                        song_data = songs_df[songs_df['Songtitel'] == song].iloc[0]
+                        position = song_index.position(song)
+                        if position < 0:
+                            continue
+                        song_data = songs_df.iloc[position]
                         farbe = color_for_reifegrad(song_data['Reifegrad'])
                         status = kommentar_fuer_reifegrad(song_data['Reifegrad'])
                         must_play_badge = "⭐ " if song_data['Must_Play'] else ""
@@ -268,6 +441,7 @@ with tabs[1]:
                         with col2:
                             if st.button("➕ Hinzufügen", use_container_width=True, help="Fügt den ausgewählten Song zur aktuellen Auswahl hinzu.", key="add_song_button"):
                                 st.session_state.selected_songs.append(neuer_song)
+                                st.session_state.pop('optimierung_bericht', None)
                                 st.rerun()
                         st.caption("Fügt den ausgewählten Song zur aktuellen Auswahl hinzu.")
                     else:
@@ -275,24 +449,22 @@ with tabs[1]:
                     st.divider()
                     # Auswahl speichern Button
                     if st.button("💾 Auswahl speichern", use_container_width=True, help="Speichert die aktuelle Songauswahl für die nächste Probe."):
-                        with open(NAECHSTE_PROBE_FILE, "w", encoding="utf-8") as f:
-                            for song in st.session_state.selected_songs:
-                                f.write(song + "\n")
+                        DataManager.speichere_naechste_probe(st.session_state.selected_songs)
                         st.success("Songauswahl für die nächste Probe gespeichert!")
                         st.rerun()
 
 # --- TAB 2: Analyse ---
-with tabs[2]:
+def zeige_analyse():
     st.info("""
     **Analyse:**
     - Sieh dir Statistiken zu gespielten Songs und Reifegraden an.
-    - Exportiere History und Songliste als CSV.
+    - Exportiere History und Songliste als ZIP (CSV und Parquet), optional nur einen Zeitraum der History.
     """)
     st.header("📊 Analyse")
-    history_df = get_cached_history()
+    kennzahlen = DataManager.history_aggregat()
     songs_df = get_cached_songliste()
     
-    if history_df.empty or songs_df.empty:
+    if kennzahlen.zeilen == 0 or songs_df.empty:
         st.warning("Nicht genügend Daten für Analyse.")
     else:
         # Verbesserte Analyse mit mehr Visualisierungen
@@ -300,82 +472,48 @@ with tabs[2]:
         
         with col1:
             st.subheader("Meistgespielte Songs (Top 10)")
-            top = history_df['Songtitel'].value_counts().head(10)
-            reifegrad_map = songs_df.set_index('Songtitel')['Reifegrad'].to_dict()
-            farben = [color_for_reifegrad_mpl(reifegrad_map.get(song, 5)) for song in top.index]
-            plt.style.use('dark_background')
-            fig, ax = plt.subplots(figsize=(10, 6))
-            fig.patch.set_facecolor('#0e1117')
-            ax.set_facecolor('#0e1117')
-            ax.tick_params(colors='#fafafa')
-            ax.xaxis.label.set_color('#fafafa')
-            ax.yaxis.label.set_color('#fafafa')
-            ax.title.set_color('#fafafa')
-            ax.barh(y=top.index, width=top.values, color=farben)
-            ax.set_xlabel("Anzahl gespielt")
-            ax.set_ylabel("Songtitel")
-            plt.tight_layout()
-            st.pyplot(fig)
+            st.image(_top_songs_chart(DataManager.songs_version(), DataManager.history_version()),
+                     use_container_width=True)
         
         with col2:
             st.subheader("Reifegrad-Verteilung")
-            plt.style.use('dark_background')
-            fig, ax = plt.subplots(figsize=(10, 6))
-            fig.patch.set_facecolor('#0e1117')
-            ax.set_facecolor('#0e1117')
-            ax.tick_params(colors='#fafafa')
-            ax.xaxis.label.set_color('#fafafa')
-            ax.yaxis.label.set_color('#fafafa')
-            ax.title.set_color('#fafafa')
-            songs_df['Reifegrad'].hist(bins=11, ax=ax, color='skyblue')
-            ax.set_xlabel("Reifegrad")
-            ax.set_ylabel("Anzahl Songs")
-            plt.tight_layout()
-            st.pyplot(fig)
+            st.image(_reifegrad_chart(DataManager.songs_version()), use_container_width=True)
         
         # Neue Metriken
-        anzahl_proben = history_df['Gespielt_am'].dt.date.nunique()
-        avg_songs_per_probe = history_df.shape[0] / anzahl_proben if anzahl_proben > 0 else 0
-        meistgespielter_song = history_df['Songtitel'].value_counts().idxmax() if not history_df.empty else "-"
-        # Längste Song-Pause
-        last_played = songs_df.set_index('Songtitel')['Zuletzt_gespielt']
-        heute = pd.to_datetime(datetime.today())
-        song_pauses = (heute - last_played).dt.days
-        song_with_longest_pause = song_pauses.idxmax() if not song_pauses.empty else "-"
-        longest_pause_days = song_pauses.max() if not song_pauses.empty else 0
-        avg_reifegrad = songs_df['Reifegrad'].mean()
-        low_reifegrad_count = (songs_df['Reifegrad'] < 4).sum()
-        never_played_count = songs_df['Anzahl_gespielt'].eq(0).sum()
+        kpi = analyse.kennzahlen(songs_df, kennzahlen)
 
         # KPIs wieder als klassische st.metric()-Werte anzeigen
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Anzahl Proben", anzahl_proben)
-            st.metric("Ø Songs/Probe", f"{avg_songs_per_probe:.1f}")
-            st.metric("Songs mit Reifegrad < 4", low_reifegrad_count)
+            st.metric("Anzahl Proben", kpi["anzahl_proben"])
+            st.metric("Ø Songs/Probe", f"{kpi['songs_pro_probe']:.1f}")
+            st.metric("Songs mit Reifegrad < 4", kpi["reifegrad_unter_4"])
         with col2:
-            st.metric("Meistgespielter Song", meistgespielter_song)
-            st.metric("Song mit längster Pause", f"{song_with_longest_pause} ({longest_pause_days} Tage)")
-            st.metric("Songs nie gespielt", never_played_count)
+            st.metric("Meistgespielter Song", kpi["meistgespielt"])
+            st.metric("Song mit längster Pause", f"{kpi['laengste_pause_song']} ({kpi['laengste_pause_tage']} Tage)")
+            st.metric("Songs nie gespielt", kpi["nie_gespielt"])
         with col3:
-            st.metric("Ø Reifegrad", f"{avg_reifegrad:.1f}")
-            unique_songs = len(songs_df)
-            st.metric("Anzahl Songs in Liste", unique_songs)
+            st.metric("Ø Reifegrad", f"{kpi['avg_reifegrad']:.1f}")
+            st.metric("Anzahl Songs in Liste", kpi["anzahl_songs"])
 
-        # Export-Optionen
+        # Export-Optionen: das Bündel entsteht erst beim Klick auf den Download
         st.subheader("📤 Export")
-        col1, col2 = st.columns(2)
-        with col1:
-            csv = history_df.to_csv(index=False, sep=';').encode('utf-8-sig')
-            st.download_button("History als CSV herunterladen", data=csv, 
-                             file_name="spielhistorie_export.csv", mime="text/csv")
-        with col2:
-            csv = songs_df.to_csv(index=False, sep=';').encode('utf-8-sig')
-            st.download_button("Songliste als CSV herunterladen", data=csv,
-                             file_name="songliste_export.csv", mime="text/csv")
+        von = bis = None
+        if st.checkbox("Nur History eines Zeitraums exportieren", key="export_zeitraum"):
+            tage = kennzahlen.probetage
+            col1, col2 = st.columns(2)
+            with col1:
+                von = st.date_input("Von", value=min(tage), key="export_von")
+            with col2:
+                bis = st.date_input("Bis", value=max(tage), key="export_bis")
+        versionen = (DataManager.songs_version(), DataManager.history_version())
+        st.download_button("📦 Songliste & History herunterladen (ZIP: CSV + Parquet)",
+                           data=lambda band=mandant.aktiv(): _export_bundle(band, versionen, von, bis),
+                           file_name=f"songpicker_export_{datetime.today().strftime('%Y%m%d')}.zip",
+                           mime="application/zip", on_click="ignore")
 
 # --- TAB 3: History ---
-with tabs[3]:
+def zeige_history():
     st.info("""
     **History:**
     - Durchsuche und filtere die Spielhistorie nach Datum.
@@ -387,24 +525,22 @@ with tabs[3]:
     if history_df.empty:
         st.info("Noch keine History-Daten vorhanden.")
     else:
-        # Verbesserte Filterung
+        # Verbesserte Filterung: Jahre und Bereiche kommen aus dem nach Datum sortierten Index
+        history_index = DataManager.history_index(history_df)
         col1, col2 = st.columns(2)
         with col1:
             jahr = st.selectbox("Filter nach Jahr", 
-                              options=["Alle"] + sorted(history_df['Gespielt_am'].dt.year.dropna().unique().astype(str)))
+                              options=["Alle"] + [str(j) for j in history_index.jahre])
         with col2:
             monat = st.selectbox("Filter nach Monat", 
                                options=["Alle"] + [str(m) for m in range(1, 13)])
         
-        filtered_df = history_df.copy()
-        if jahr != "Alle":
-            filtered_df = filtered_df[filtered_df['Gespielt_am'].dt.year == int(jahr)]
-        if monat != "Alle":
-            filtered_df = filtered_df[filtered_df['Gespielt_am'].dt.month == int(monat)]
+        filtered_df = history_index.jahr_monat(None if jahr == "Alle" else int(jahr),
+                                               None if monat == "Alle" else int(monat))
         
-        # Verbesserte Darstellung
+        # Verbesserte Darstellung, neueste zuerst
         st.dataframe(
-            filtered_df.sort_values(by="Gespielt_am", ascending=False),
+            filtered_df.iloc[::-1],
             use_container_width=True,
             column_config={
                 "Gespielt_am": st.column_config.DatetimeColumn(
@@ -415,7 +551,7 @@ with tabs[3]:
         )
 
 # --- TAB 4: Nachbereitung ---
-with tabs[4]:
+def zeige_nachbereitung():
     st.info("""
     **Nachbereitung:**
     - Passe Reifegrade und Kommentare für die letzte Probe an.
@@ -429,7 +565,8 @@ with tabs[4]:
         st.info("Noch keine Spieldaten vorhanden.")
     else:
         # Verbesserte Datumsauswahl
-        datum_optionen = sorted(history_df['Gespielt_am'].dropna().dt.date.unique(), reverse=True)
+        history_index = DataManager.history_index(history_df)
+        datum_optionen = nachbereitung.probedaten(history_index)
         auswahl_datum = st.selectbox("📅 Probedatum auswählen", datum_optionen, key="nachbereitung_probedatum_select")
         
         # --- Song entfernen ---
@@ -437,7 +574,7 @@ with tabs[4]:
             st.session_state.songs_to_remove = []
         
         # --- Song hinzufügen ---
-        weitere_songs = sorted(set(songs_df['Songtitel']) - set(history_df[history_df['Gespielt_am'].dt.date == auswahl_datum]['Songtitel']))
+        weitere_songs = nachbereitung.weitere_songs(songs_df, history_index, auswahl_datum)
         st.divider()
         st.subheader("➕ Weiteren Song dieser Probe hinzufügen")
         if weitere_songs:
@@ -446,17 +583,14 @@ with tabs[4]:
                 neuer_song = st.selectbox("Song aus Songliste auswählen", weitere_songs, key="neuer_probe_song")
             with col2:
                 if st.button("➕ Song hinzufügen", use_container_width=True):
-                    neue_zeile = pd.DataFrame({'Songtitel': [neuer_song], 'Gespielt_am': [pd.to_datetime(auswahl_datum)]})
-                    neue_zeile.to_csv(APP_CONFIG["files"]["history"], sep=';', mode='a', header=False, index=False)
+                    DataManager.aktualisiere_history([neuer_song], pd.to_datetime(auswahl_datum))
                     st.success(f"{neuer_song} wurde zur Probe am {auswahl_datum} hinzugefügt.")
                     st.rerun()
         else:
             st.info("Alle Songs dieser Probe sind bereits gelistet.")
         
-        # --- History und gespielt nach jedem Hinzufügen/Entfernen neu laden ---
-        history_df = pd.read_csv(APP_CONFIG["files"]["history"], sep=';', parse_dates=["Gespielt_am"])  # immer aktuell laden
-        gespielt = history_df[history_df['Gespielt_am'].dt.date == auswahl_datum]
-        gespielt = gespielt.merge(songs_df[['Songtitel', 'Reifegrad', 'Kommentar']], on='Songtitel', how='left')
+        gespielt = nachbereitung.mit_songdaten(nachbereitung.songs_der_probe(history_index, auswahl_datum),
+                                               songs_df, DataManager.song_index(songs_df))
 
         st.write("🎵 Gespielte Songs und Anpassung:")
         neue_werte = []
@@ -475,40 +609,31 @@ with tabs[4]:
 
         # Entferne Songs aus der History, falls gewünscht
         if songs_to_remove:
-            # Speichere entfernte Songs für Undo
+            # Ereignis-IDs für Undo merken
             if 'undo_removed_songs' not in st.session_state:
                 st.session_state['undo_removed_songs'] = []
-            for removed_song in songs_to_remove:
-                removed_row = history_df[(history_df['Songtitel'] == removed_song) & (history_df['Gespielt_am'].dt.date == auswahl_datum)]
-                if not removed_row.empty:
-                    st.session_state['undo_removed_songs'].append(removed_row.iloc[0].to_dict())
-            history_df = history_df[~((history_df['Songtitel'].isin(songs_to_remove)) & (history_df['Gespielt_am'].dt.date == auswahl_datum))]
-            history_df.to_csv(APP_CONFIG["files"]["history"], sep=';', index=False)
+            event_ids = DataManager.entferne_aus_history(songs_to_remove, auswahl_datum)
+            for event_id, removed_song in zip(event_ids, songs_to_remove):
+                st.session_state['undo_removed_songs'].append(
+                    {'event_id': event_id, 'Songtitel': removed_song, 'Gespielt_am': auswahl_datum})
             st.success(f"{', '.join(songs_to_remove)} aus der Probe am {auswahl_datum} entfernt.")
             st.rerun()
 
-            # Undo-Button anzeigen, falls Songs entfernt wurden
-            if st.session_state.get('undo_removed_songs'):
-                if st.button("Rückgängig machen (letzten entfernten Song wiederherstellen)"):
-                    last_removed = st.session_state['undo_removed_songs'].pop()
-                    # Füge den Song wieder zur History hinzu
-                    df = pd.DataFrame([last_removed])
-                    df.to_csv(APP_CONFIG["files"]["history"], sep=';', mode='a', header=False, index=False)
-                    st.success(f"Song '{last_removed['Songtitel']}' wurde wiederhergestellt.")
-                    st.rerun()
+        # Undo-Button anzeigen, falls Songs entfernt wurden
+        if st.session_state.get('undo_removed_songs'):
+            if st.button("Rückgängig machen (letzten entfernten Song wiederherstellen)"):
+                last_removed = st.session_state['undo_removed_songs'].pop()
+                DataManager.stelle_history_wieder_her(last_removed['event_id'], last_removed['Songtitel'], last_removed['Gespielt_am'])
+                st.success(f"Song '{last_removed['Songtitel']}' wurde wiederhergestellt.")
+                st.rerun()
 
         if gespielt.shape[0] > 0:
             if st.button("💾 Änderungen speichern"):
-                for titel, grad, kommentar in neue_werte:
-                    idx = songs_df[songs_df['Songtitel'] == titel].index
-                    if not idx.empty:
-                        songs_df.loc[idx, 'Reifegrad'] = grad
-                        songs_df.loc[idx, 'Kommentar'] = kommentar
-                DataManager.speichere_songliste(songs_df)
+                DataManager.aktualisiere_songs(pd.DataFrame(neue_werte, columns=['Songtitel', 'Reifegrad', 'Kommentar']))
                 st.success("Änderungen erfolgreich gespeichert.")
 
 # --- TAB 5: Songliste bearbeiten ---
-with tabs[5]:
+def zeige_songliste_bearbeiten():
     st.info("""
     **Songliste bearbeiten:**
     - Bearbeite, ergänze oder lösche Songs direkt in der Tabelle.
@@ -518,8 +643,22 @@ with tabs[5]:
     st.header("✏️ Songliste bearbeiten")
     # Backup-Button jetzt hier:
     if st.button("🔄 Backup erstellen"):
-        backup_path = backup_dateien()
-        st.success(f"Backup erstellt: {os.path.basename(backup_path)}")
+        snapshot_id = backup_dateien()
+        st.success(f"Backup erstellt: {snapshot_id}")
+    if st.button("🔧 Statistik aus History neu berechnen",
+                 help="Setzt 'Zuletzt gespielt' und 'Anzahl gespielt' aller Songs anhand der Spielhistorie neu."):
+        geaendert = DataManager.repariere_songstatistik().result()
+        st.success(f"{geaendert} Songs aktualisiert.")
+    with st.expander("🗄️ Backup wiederherstellen", expanded=False):
+        snapshots = list(reversed(get_backup_store().snapshots()))
+        if snapshots:
+            snapshot_id = st.selectbox("Snapshot", snapshots, key="backup_snapshot_select")
+            if st.button("♻️ Snapshot wiederherstellen", key="backup_restore"):
+                DataManager.stelle_backup_wieder_her(snapshot_id)
+                st.success(f"Snapshot {snapshot_id} wird wiederhergestellt.")
+                st.rerun()
+        else:
+            st.info("Noch keine Backups vorhanden.")
     songs_df = get_cached_songliste()
 
     # Stelle sicher, dass Kommentar und Notiz als String vorliegen
@@ -533,20 +672,35 @@ with tabs[5]:
         songs_df['Favorit'] = False
 
     # Tag-Filter
-    alle_tags = set()
-    for tags in songs_df['Tags'].dropna():
-        for tag in [t.strip() for t in str(tags).split(',') if t.strip()]:
-            alle_tags.add(tag)
-    alle_tags = sorted(alle_tags)
-    selected_tags = st.multiselect("Nach Tags filtern", alle_tags, key="bearbeiten_tagfilter")
-    filtered_df = songs_df.copy()
+    tag_index = get_tag_index()
+    selected_tags = st.multiselect("Nach Tags filtern", tag_index.tags, key="bearbeiten_tagfilter")
+    filtered_df = songs_df
     if selected_tags:
-        filtered_df = filtered_df[filtered_df['Tags'].apply(lambda x: any(tag in str(x).split(',') for tag in selected_tags))]
+        filtered_df = filtered_df[tag_index.maske(irgendein=selected_tags)].reset_index(drop=True)
+
+    doppelte_titel = DataManager.song_index(songs_df).duplikate
+    if doppelte_titel:
+        st.warning(f"Doppelte Songtitel (abweichende Schreibweise): {', '.join(doppelte_titel)}")
+
+    # Der Editor-Zustand zählt Zeilen der Tabelle, wie sie beim Bearbeiten angezeigt war. Zeigt die
+    # Tabelle jetzt andere Zeilen (Filter, fremde Änderung), werden die Änderungen über die Titel
+    # vorgemerkt und der Editor neu begonnen, statt sie auf andere Songs anzuwenden.
+    zeilen = filtered_df['Songtitel'].tolist()
+    angezeigt = st.session_state.get("songliste_editor_zeilen")
+    if angezeigt is not None and angezeigt != zeilen and st.session_state.get(_editor_schluessel()):
+        st.session_state["songliste_vorgemerkt"] = _editor_aenderungen(angezeigt)
+        _neuer_editor()
+    st.session_state["songliste_editor_zeilen"] = zeilen
+    vorgemerkt = st.session_state.get("songliste_vorgemerkt")
+    if vorgemerkt and any(vorgemerkt):
+        geaendert, neu, geloescht = vorgemerkt
+        st.caption(f"Vorgemerkt, noch nicht gespeichert: {len(geaendert)} geänderte, {len(neu)} neue, "
+                   f"{len(geloescht)} gelöschte Songs")
 
     st.info("Du kannst die Songliste direkt in der Tabelle bearbeiten. Neue Songs als neue Zeile hinzufügen, Zeilen löschen, Felder anpassen. Klicke anschließend auf 'Änderungen speichern'.")
 
     # Data Editor für die Songliste
-    edited_df = st.data_editor(
+    st.data_editor(
         filtered_df,
         num_rows="dynamic",
         use_container_width=True,
@@ -562,26 +716,55 @@ with tabs[5]:
             "Notiz": st.column_config.TextColumn("Notiz", required=False),
         },
         hide_index=True,
-        key="songliste_editor"
+        key=_editor_schluessel()
     )
 
     # Änderungen speichern
+    # Änderungen speichern: nur die Zeilen, die im Editor geändert, ergänzt oder gelöscht wurden.
+    # Die Zeilennummern des Editors werden über die Titel der angezeigten Tabelle zugeordnet.
     if st.button("💾 Änderungen speichern", key="save_songlist_edits"):
-        edited_df = edited_df[edited_df['Songtitel'].str.strip() != ""]
-        if 'Zuletzt_gespielt' in edited_df:
-            edited_df['Zuletzt_gespielt'] = pd.to_datetime(edited_df['Zuletzt_gespielt'], errors='coerce')
-        if 'Reifegrad' in edited_df:
-            edited_df['Reifegrad'] = pd.to_numeric(edited_df['Reifegrad'], errors='coerce').fillna(5).astype(int)
-        if 'Anzahl_gespielt' in edited_df:
-            edited_df['Anzahl_gespielt'] = pd.to_numeric(edited_df['Anzahl_gespielt'], errors='coerce').fillna(0).astype(int)
-        if 'Must_Play' in edited_df:
-            edited_df['Must_Play'] = edited_df['Must_Play'].fillna(False).astype(bool)
-        if 'Favorit' in edited_df:
-            edited_df['Favorit'] = edited_df['Favorit'].fillna(False).astype(bool)
-        DataManager.speichere_songliste(edited_df)
+        DataManager.aendere_songliste(*_editor_aenderungen(zeilen))
+        # Der Editor-Zustand gehört zur alten Tabelle und würde sonst erneut angewendet
+        st.session_state.pop("songliste_vorgemerkt", None)
+        _neuer_editor()
         st.success("Songliste erfolgreich gespeichert.")
         st.rerun()
 
+views = [zeige_naechste_probe, zeige_auswahl, zeige_analyse, zeige_history,
+         zeige_nachbereitung, zeige_songliste_bearbeiten]
+try:
+    for label, tab, view in zip(probe_tabs, tabs, views):
+        with tab:
+            if tab.open is not False:
+                zeige_view(label, view)
+finally:
+    # Auch bei st.rerun() mitten in einer Ansicht wird der Durchlauf protokolliert
+    lauf = messung.beende_lauf()
+
+# Fehler beim Laden und aus Schreibaufträgen, die seit dem letzten Durchlauf fehlgeschlagen sind
+with fehler_bereich:
+    for fehler in DataManager.hole_fehler():
+        st.error(fehler)
+    pruefbericht = DataManager.pruefbericht()
+    if pruefbericht:
+        with st.expander(f"⚠️ Datenprüfung: {sum(e['Anzahl'] for e in pruefbericht)} ungültige Werte"):
+            st.dataframe(pd.DataFrame(pruefbericht), hide_index=True)
+
+with st.sidebar.expander("⏱️ Laufzeiten", expanded=False):
+    for label, ms in st.session_state.get('view_zeiten', {}).items():
+        st.caption(f"{label}: {ms:.0f} ms")
+    if startprofil.AKTIV:
+        st.caption(f"**Startprofil** ({startprofil.melde():.0f} ms seit Prozessstart)")
+        for name, ms in startprofil.messungen().items():
+            st.caption(f"{name}: {ms:.0f} ms")
+
+if debug_panel and lauf:
+    with st.sidebar.expander("🐞 Performance", expanded=True):
+        st.caption(f"Dieser Durchlauf: {lauf['gesamt_ms']:.0f} ms")
+        st.dataframe(pd.DataFrame(messung.zusammenfassen(lauf['spannen'])), hide_index=True,
+                     column_config={"ms": st.column_config.NumberColumn("ms", format="%.1f")})
+        st.caption("Datensatz-Cache: " + ", ".join(f"{k} {v}" for k, v in get_datensatz_cache().statistik().items()))
+
 # --- Nach oben Button (global, sticky unten rechts) ---
 scroll_to_top_html = '''
 <style>
@@ -0,0 +1,64 @@
+"""Aus der History abgeleitete Spalten der Songliste: ``Zuletzt_gespielt`` und ``Anzahl_gespielt``.
+
+Der DataManager gleicht nach jedem Eintragen, Entfernen oder
+Wiederherstellen die betroffenen Songs mit dem ``HistoryAggregate`` ab
+(``songstatistik_aenderungen``) und schreibt nur deren Zeilen. ``berechne_songstatistik`` setzt beide
+Spalten für alle Songs in einem Durchgang neu, zur Reparatur oder nach
+einem Import.
+"""
+import numpy as np
+import pandas as pd
+from song_index import SongIndex
+
+# Zuletzt_gespielt eines Songs, der nicht mehr in der History vorkommt
+NIE_GESPIELT = pd.Timestamp('1900-01-01')
+
+
+def berechne_songstatistik(songs_df, history_df):
+    """Setzt ``Anzahl_gespielt`` und ``Zuletzt_gespielt`` aus der History neu.
+
+    Songs ohne History-Eintrag behalten ihr bisheriges ``Zuletzt_gespielt``.
+    Liefert eine neue Songliste und die Anzahl der geänderten Songs.
+    """
+    ergebnis = songs_df.copy(deep=False)
+    positionen = SongIndex(songs_df).positionen(history_df['Songtitel'])
+    gefunden = positionen >= 0
+    anzahl = np.bincount(positionen[gefunden], minlength=len(songs_df))
+    zuletzt = ergebnis['Zuletzt_gespielt'].copy()
+    maxima = pd.Series(history_df['Gespielt_am'].to_numpy()[gefunden]).groupby(positionen[gefunden]).max()
+    zuletzt.iloc[maxima.index.to_numpy()] = maxima.to_numpy()
+    geaendert = (ergebnis['Anzahl_gespielt'].to_numpy() != anzahl) | (ergebnis['Zuletzt_gespielt'] != zuletzt).to_numpy()
+    ergebnis['Anzahl_gespielt'] = anzahl.astype(songs_df['Anzahl_gespielt'].dtype)
+    ergebnis['Zuletzt_gespielt'] = zuletzt
+    return ergebnis, int(geaendert.sum())
+
+
+def songstatistik_aenderungen(songs_df, songnamen, aggregat, index=None):
+    """Anzahl und letztes Datum der Songs ``songnamen`` laut Aggregat, soweit sie sich ändern.
+
+    ``aggregat`` muss den Stand der History nach der Änderung haben.
+    Schreibweisen eines Titels in der History werden wie in
+    ``berechne_songstatistik`` zusammengezählt. Liefert die Änderungen im
+    Format von ``StorageBackend.aendere_songs`` (gespeicherter Titel ->
+    Felder); ``songs_df`` bleibt unverändert.
+    """
+    index = index or SongIndex(songs_df)
+    ziele = np.unique(index.positionen(list(dict.fromkeys(songnamen))))
+    ziele = ziele[ziele >= 0]
+    if not len(ziele):
+        return {}
+    # Alle Titel des Aggregats einmal zuordnen (so viele wie verschiedene Songs in der History)
+    titel = list(aggregat.anzahl_je_song)
+    positionen = index.positionen(titel)
+    betroffen = np.isin(positionen, ziele)
+    titel = [t for t, ok in zip(titel, betroffen) if ok]
+    positionen = positionen[betroffen]
+    anzahl = pd.Series([aggregat.anzahl_je_song[t] for t in titel]).groupby(positionen).sum()
+    zuletzt = pd.Series([aggregat.zuletzt_je_song[t] for t in titel], dtype='datetime64[us]').groupby(positionen).max()
+    anzahl = anzahl.reindex(ziele, fill_value=0).to_numpy()
+    zuletzt = pd.Series(zuletzt.reindex(ziele).fillna(NIE_GESPIELT).to_numpy())
+    geaendert = ((songs_df['Anzahl_gespielt'].to_numpy()[ziele] != anzahl)
+                 | (songs_df['Zuletzt_gespielt'].to_numpy()[ziele] != zuletzt.to_numpy()))
+    gespeichert = songs_df['Songtitel'].to_numpy()[ziele]
+    return {gespeichert[i]: {'Anzahl_gespielt': int(anzahl[i]), 'Zuletzt_gespielt': zuletzt[i]}
+            for i in np.flatnonzero(geaendert)}
@@ -0,0 +1,65 @@
+"""Startprofil für den Kaltstart.
+
+Mit der Umgebungsvariable ``SONGPICKER_STARTPROFIL=1`` misst die App die
+Importe und den ersten Durchlauf jeder Ansicht und meldet die Aufschlüsselung
+einmal je Prozess im Log sowie in der Seitenleiste. Ohne die Variable sind
+die Messpunkte wirkungslos.
+
+``python startprofil.py`` misst die Importzeiten ohne laufenden Server.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+AKTIV = os.environ.get("SONGPICKER_STARTPROFIL") == "1"
+
+logger = logging.getLogger(__name__)
+_start = time.perf_counter()
+_messungen = {}
+_gemeldet = False
+
+
+@contextmanager
+def messe(name):
+    """Misst den Block beim ersten Durchlaufen unter ``name`` (in ms)"""
+    if not AKTIV or name in _messungen:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _messungen[name] = (time.perf_counter() - start) * 1000
+
+
+def messungen():
+    """Bisherige Messungen in Reihenfolge, Name -> ms"""
+    return dict(_messungen)
+
+
+def melde():
+    """Schreibt die Aufschlüsselung einmal ins Log; liefert die Zeit seit Prozessstart in ms"""
+    global _gemeldet
+    gesamt = (time.perf_counter() - _start) * 1000
+    if AKTIV and not _gemeldet:
+        _gemeldet = True
+        zeilen = [f"  {name:<40} {ms:8.1f} ms" for name, ms in _messungen.items()]
+        logger.warning("Startprofil (%.0f ms bis zum ersten fertigen Durchlauf):\n%s", gesamt, "\n".join(zeilen))
+    return gesamt
+
+
+if __name__ == "__main__":
+    # Kumulative Importzeiten in der Reihenfolge, in der die App sie lädt
+    import importlib
+    module = ["streamlit", "pandas", "numpy", "config", "storage", "data_manager", "selection",
+              "tag_index", "charts", "matplotlib.figure", "matplotlib.backends.backend_agg",
+              "streamlit_echarts"]
+    for modul in module:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(modul)
+        except Exception as e:
+            print(f"{modul:<40} nicht verfügbar ({e})")
+            continue
+        print(f"{modul:<40} {(time.perf_counter() - start) * 1000:8.1f} ms")
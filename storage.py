@@ -0,0 +1,660 @@
+"""Speicher-Backends für Songliste und Spielhistorie.
+
+Der DataManager greift nur noch über ein Backend auf die Daten zu. Neben dem
+bisherigen CSV-Format gibt es eine SQLite-Datenbank (WAL-Modus) und ein
+spaltenorientiertes Dateiformat (Parquet oder Feather), die beim Laden kein
+erneutes Parsen und Typ-Erkennen der Texte benötigen. CSV bleibt als Import-
+und Exportformat erhalten.
+"""
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from config import APP_CONFIG
+import mandant
+
+SONG_SPALTEN = ['Songtitel', 'Zuletzt_gespielt', 'Reifegrad',
+                'Anzahl_gespielt', 'Kommentar', 'Tags', 'Must_Play']
+HISTORY_SPALTEN = ['Songtitel', 'Gespielt_am']
+EVENT_SPALTEN = ['Event_ID', 'Typ', 'Songtitel', 'Gespielt_am', 'Bezug']
+# Datumsformate der Textdateien: zuerst das übliche Format, dann ISO (so schreibt to_csv)
+SONG_DATUMSFORMATE = ('%m/%d/%Y', 'ISO8601')
+HISTORY_DATUMSFORMATE = ('%Y-%m-%d', 'ISO8601')
+
+
+class StorageBackend:
+    """Basisklasse: liest und schreibt die Rohtabellen eines Speicherformats"""
+    name = None
+
+    def existiert(self):
+        raise NotImplementedError
+
+    def dateien(self):
+        """Liefert alle Dateien, in denen das Backend seine Daten ablegt"""
+        raise NotImplementedError
+
+    def version(self, tabelle):
+        """Stand einer Tabelle ("songs" oder "history") als vergleichbares Tupel"""
+        return tuple(_datei_stand(pfad) for pfad in self._dateien_fuer(tabelle))
+
+    def _dateien_fuer(self, tabelle):
+        return self.dateien()
+
+    def vor_backup(self):
+        """Bringt die Dateien in einen konsistenten Stand, bevor sie kopiert werden"""
+
+    def lade_songs(self):
+        raise NotImplementedError
+
+    def speichere_songs(self, df):
+        raise NotImplementedError
+
+    def aendere_songs(self, geaendert, neu, geloescht):
+        """Wendet Zeilenänderungen auf die gespeicherte Songliste an.
+
+        ``geaendert`` ordnet bisherige Titel den neuen Feldwerten zu, ``neu``
+        ist eine Liste ganzer Zeilen, ``geloescht`` eine Liste bisheriger
+        Titel. Dateiformate lassen sich nicht zeilenweise ändern und werden
+        hier geladen, geändert und ganz neu geschrieben.
+        """
+        df = self.lade_songs()
+        if df is None:
+            df = pd.DataFrame(columns=SONG_SPALTEN)
+        self.speichere_songs(wende_songaenderungen_an(df, geaendert, neu, geloescht))
+
+    def lade_history(self):
+        raise NotImplementedError
+
+    def speichere_history(self, df):
+        raise NotImplementedError
+
+    def haenge_history_an(self, df):
+        raise NotImplementedError
+
+    def anzahl_history(self):
+        df = self.lade_history()
+        return 0 if df is None else len(df)
+
+    # Ereignisprotokoll der History (siehe history_log.py). Standardmäßig eine
+    # CSV-Datei neben den Daten, die nur angehängt und inkrementell gelesen wird.
+    events_datei = None
+    _events_reader = None
+
+    def lade_history_events(self):
+        if self._events_reader is None:
+            self._events_reader = CSVTailReader(self.events_datei, konverter=_parse_event_daten)
+        return self._events_reader.lade()
+
+    def haenge_history_events_an(self, df):
+        csv_anhaengen(self.events_datei, df[EVENT_SPALTEN])
+
+    def speichere_history_events(self, df):
+        """Ersetzt das ganze Protokoll durch ``df``"""
+        atomar_schreiben(self.events_datei, lambda tmp: df[EVENT_SPALTEN].to_csv(tmp, sep=';', index=False))
+        if self._events_reader is not None:
+            self._events_reader.zuruecksetzen()
+
+    def leere_history_events(self, bis_event_id):
+        """Entfernt alle Ereignisse bis einschließlich ``bis_event_id``"""
+        events = self.lade_history_events()
+        if events is None:
+            return
+        self.speichere_history_events(events[events['Event_ID'] > bis_event_id])
+
+    def ersetze_history(self, df, bis_event_id):
+        """Schreibt die verdichtete History und verwirft die darin enthaltenen Ereignisse"""
+        self.speichere_history(df)
+        self.leere_history_events(bis_event_id)
+
+
+def atomar_schreiben(pfad, schreiber):
+    """Schreibt über eine temporäre Datei im selben Verzeichnis und ersetzt dann atomar.
+
+    ``schreiber`` bekommt den temporären Pfad. Leser sehen so immer entweder
+    die alte oder die neue Datei, nie einen halb geschriebenen Stand.
+    """
+    verzeichnis = os.path.dirname(pfad) or '.'
+    fd, tmp = tempfile.mkstemp(dir=verzeichnis, prefix=os.path.basename(pfad) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        schreiber(tmp)
+        os.replace(tmp, pfad)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def csv_anhaengen(pfad, df):
+    """Hängt Zeilen an eine CSV-Datei an; fehlt der Datei der letzte Zeilenumbruch, kommt er davor"""
+    with open(pfad, 'a+b') as f:
+        neu = f.tell() == 0
+        if not neu:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+        f.write(df.to_csv(sep=';', header=neu, index=False).encode('utf-8'))
+
+
+def wende_songaenderungen_an(df, geaendert, neu, geloescht):
+    """Songliste mit den Änderungen aus ``StorageBackend.aendere_songs``; Titel gelten exakt"""
+    titel = df['Songtitel']
+    spalten = dict.fromkeys(col for felder in geaendert.values() for col in felder)
+    for col in spalten:
+        werte = pd.Series({alt: felder[col] for alt, felder in geaendert.items() if col in felder}, dtype=object)
+        # Maske über die bisherigen Titel, auch wenn die Änderung selbst den Titel betrifft
+        maske = titel.isin(werte.index).to_numpy()
+        if col not in df.columns:
+            df[col] = None
+        neue_werte = titel[maske].map(werte).to_numpy()
+        try:
+            df.loc[maske, col] = neue_werte
+        except (TypeError, ValueError):
+            # z.B. Text in eine bisher leere (float) Kommentarspalte
+            df[col] = df[col].astype(object)
+            df.loc[maske, col] = neue_werte
+    if geloescht:
+        df = df[~titel.isin(geloescht).to_numpy()]
+    if neu:
+        df = pd.concat([df, pd.DataFrame(neu)], ignore_index=True)
+    return df
+
+
+def _datei_stand(pfad):
+    """mtime und Größe einer Datei; ändert sich bei jedem Schreibvorgang"""
+    try:
+        stat = os.stat(pfad)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class CSVTailReader:
+    """Liest eine nur wachsende CSV-Datei inkrementell.
+
+    Gemerkt werden Byte-Offset, Inode und mtime der zuletzt gelesenen Stelle
+    sowie ein Fingerabdruck der Bytes direkt davor. Ist die Datei seitdem nur
+    gewachsen, werden ausschließlich die neuen Zeilen geparst und an den
+    gehaltenen DataFrame angehängt. Wurde sie gekürzt oder neu geschrieben,
+    wird vollständig neu geladen.
+
+    Eine letzte Zeile ohne Zeilenumbruch kann halb geschrieben sein. Beim
+    inkrementellen Lesen bleibt sie zurück, bis die Datei bei einem Aufruf
+    gleich groß geblieben ist; beim vollständigen Laden wird sie gleich
+    übernommen. Wächst die Datei danach weiter, wird diese Zeile neu gelesen.
+    """
+    FINGERABDRUCK = 64
+
+    def __init__(self, pfad, sep=';', konverter=None):
+        self.pfad = pfad
+        self.sep = sep
+        self.konverter = konverter
+        self._lock = threading.Lock()
+        self.zuruecksetzen()
+
+    def zuruecksetzen(self):
+        """Verwirft den gehaltenen Stand; der nächste Aufruf lädt komplett neu"""
+        self._df = None
+        self._spalten = None
+        # Ende der letzten vollständigen Zeile und Größe beim letzten Lesen
+        self._offset = 0
+        self._groesse = 0
+        # Zeilen im DataFrame aus vollständigen Zeilen der Datei
+        self._zeilen = 0
+        # Unvollständige letzte Zeile noch nicht übernommen
+        self._zurueckgehalten = False
+        self._inode = None
+        self._mtime = None
+        self._fingerabdruck = b''
+
+    def lade(self):
+        with self._lock:
+            try:
+                stat = os.stat(self.pfad)
+            except FileNotFoundError:
+                self.zuruecksetzen()
+                return None
+            if self._df is not None and stat.st_ino == self._inode and self._offset > 0:
+                gleich_gross = stat.st_size == self._groesse
+                if gleich_gross and stat.st_mtime_ns == self._mtime and not self._zurueckgehalten:
+                    return self._df.copy(deep=False)
+                if ((stat.st_size > self._groesse or gleich_gross and self._zurueckgehalten)
+                        and self._fingerabdruck == self._lese_fingerabdruck()):
+                    self._lese_ab(self._offset, mit_rest=gleich_gross)
+                    return self._df.copy(deep=False)
+            self.zuruecksetzen()
+            self._lese_ab(0, mit_rest=True)
+            return None if self._df is None else self._df.copy(deep=False)
+
+    def _lese_fingerabdruck(self):
+        start = max(0, self._offset - self.FINGERABDRUCK)
+        with open(self.pfad, 'rb') as f:
+            f.seek(start)
+            return f.read(self._offset - start)
+
+    def _lese_ab(self, start, mit_rest):
+        with open(self.pfad, 'rb') as f:
+            f.seek(start)
+            daten = f.read()
+            stat = os.fstat(f.fileno())
+        ende = daten.rfind(b'\n') + 1
+        # Eine Datenzeile ohne Umbruch am Ende (am Dateianfang wäre es die Kopfzeile)
+        rest = bool(daten[ende:].strip()) and (start > 0 or ende > 0)
+        if not mit_rest:
+            daten = daten[:ende]
+        if self._df is not None:
+            # Eine früher übernommene unvollständige Zeile wird mit den neuen Daten neu gelesen
+            self._df = self._df.iloc[:self._zeilen]
+        if start == 0:
+            if not daten.strip():
+                return
+            neu = pd.read_csv(io.BytesIO(daten), sep=self.sep, encoding='utf-8-sig')
+            neu.columns = neu.columns.str.strip()
+            self._spalten = list(neu.columns)
+        elif daten:
+            neu = pd.read_csv(io.BytesIO(daten), sep=self.sep, encoding='utf-8',
+                              header=None, names=self._spalten)
+        else:
+            neu = None
+        if neu is not None:
+            if self.konverter is not None:
+                neu = self.konverter(neu)
+            self._df = neu if self._df is None else pd.concat([self._df, neu], ignore_index=True)
+        self._zeilen = len(self._df) - (1 if rest and mit_rest else 0)
+        self._zurueckgehalten = rest and not mit_rest
+        self._offset = start + ende
+        self._groesse = stat.st_size
+        self._inode = stat.st_ino
+        self._mtime = stat.st_mtime_ns
+        self._fingerabdruck = daten[max(0, ende - self.FINGERABDRUCK):ende] if ende >= self.FINGERABDRUCK \
+            else self._lese_fingerabdruck()
+
+
+def parse_datum(werte, formate):
+    """Datumswerte mit festen Formaten; was keinem passt, per Format-Erkennung, sonst NaT.
+
+    Geparst wird jeder verschiedene Wert nur einmal, Probetage wiederholen
+    sich in der History ständig.
+    """
+    if pd.api.types.is_datetime64_any_dtype(werte):
+        return werte
+    codes, eindeutig = pd.factorize(werte)
+    eindeutig = pd.Series(eindeutig, dtype=object)
+    daten = pd.Series(pd.NaT, index=eindeutig.index, dtype='datetime64[us]')
+    for format_ in (*formate, 'mixed'):
+        offen = daten.isna().to_numpy()
+        if not offen.any():
+            break
+        daten[offen] = pd.to_datetime(eindeutig[offen], format=format_, errors='coerce')
+    return pd.Series(daten.reindex(codes).to_numpy(), index=werte.index, name=werte.name)
+
+
+def _parse_history_daten(df):
+    df['Gespielt_am'] = parse_datum(df['Gespielt_am'], HISTORY_DATUMSFORMATE)
+    return df
+
+
+def _parse_event_daten(df):
+    df['Gespielt_am'] = parse_datum(df['Gespielt_am'], HISTORY_DATUMSFORMATE)
+    df['Event_ID'] = df['Event_ID'].astype('int64')
+    df['Bezug'] = pd.to_numeric(df['Bezug'], errors='coerce').astype('Int64')
+    return df
+
+
+class CSVBackend(StorageBackend):
+    """Das ursprüngliche Format: zwei Semikolon-getrennte CSV-Dateien"""
+    name = "csv"
+
+    def __init__(self, songs_datei=None, history_datei=None):
+        self.songs_datei = songs_datei or mandant.pfad(APP_CONFIG["files"]["songs"])
+        self.history_datei = history_datei or mandant.pfad(APP_CONFIG["files"]["history"])
+        self.events_datei = os.path.splitext(self.history_datei)[0] + "_events.csv"
+        # spielhistorie.csv wird praktisch nur angehängt: neue Zeilen inkrementell lesen
+        self._history_reader = CSVTailReader(self.history_datei, konverter=_parse_history_daten)
+
+    def existiert(self):
+        return os.path.exists(self.songs_datei)
+
+    def dateien(self):
+        return [self.songs_datei, self.history_datei, self.events_datei]
+
+    def _dateien_fuer(self, tabelle):
+        return [self.songs_datei] if tabelle == "songs" else [self.history_datei, self.events_datei]
+
+    def lade_songs(self):
+        if not os.path.exists(self.songs_datei):
+            return None
+        df = pd.read_csv(self.songs_datei, sep=';', encoding='utf-8-sig')
+        df.columns = df.columns.str.strip()
+        return df
+
+    def speichere_songs(self, df):
+        atomar_schreiben(self.songs_datei, lambda tmp: df.to_csv(tmp, sep=';', index=False))
+
+    def lade_history(self):
+        return self._history_reader.lade()
+
+    def speichere_history(self, df):
+        atomar_schreiben(self.history_datei, lambda tmp: df.to_csv(tmp, sep=';', index=False))
+        self._history_reader.zuruecksetzen()
+
+    def haenge_history_an(self, df):
+        csv_anhaengen(self.history_datei, df)
+
+
+class SQLiteBackend(StorageBackend):
+    """Songliste und History als Tabellen einer SQLite-Datenbank im WAL-Modus"""
+    name = "sqlite"
+
+    def __init__(self, pfad=None):
+        self.pfad = pfad or mandant.pfad(APP_CONFIG["storage"]["sqlite"])
+
+    @contextmanager
+    def _verbindung(self):
+        """Öffnet eine Verbindung, schreibt die Transaktion fest und schließt sie wieder"""
+        neu = not os.path.exists(self.pfad)
+        con = sqlite3.connect(self.pfad, timeout=30)
+        try:
+            if neu:
+                # WAL ist persistent und muss nur einmal gesetzt werden
+                con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def vor_backup(self):
+        # Inhalt des Write-Ahead-Logs in die Datenbankdatei übernehmen
+        if os.path.exists(self.pfad):
+            with self._verbindung() as con:
+                con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _tabelle_existiert(self, con, tabelle):
+        return con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                           (tabelle,)).fetchone() is not None
+
+    def existiert(self):
+        if not os.path.exists(self.pfad):
+            return False
+        with self._verbindung() as con:
+            return self._tabelle_existiert(con, "songs")
+
+    def dateien(self):
+        return [self.pfad]
+
+    def _dateien_fuer(self, tabelle):
+        # Commits landen zuerst im Write-Ahead-Log
+        return [self.pfad, self.pfad + "-wal"]
+
+    def lade_songs(self):
+        if not os.path.exists(self.pfad):
+            return None
+        with self._verbindung() as con:
+            if not self._tabelle_existiert(con, "songs"):
+                return None
+            return pd.read_sql("SELECT * FROM songs", con)
+
+    def speichere_songs(self, df):
+        df = df.copy()
+        if 'Zuletzt_gespielt' in df:
+            df['Zuletzt_gespielt'] = pd.to_datetime(df['Zuletzt_gespielt'], errors='coerce')
+        with self._verbindung() as con:
+            df.to_sql("songs", con, if_exists='replace', index=False)
+
+    def aendere_songs(self, geaendert, neu, geloescht):
+        # Nur die betroffenen Zeilen, alles in einer Transaktion
+        with self._verbindung() as con:
+            if not self._tabelle_existiert(con, "songs"):
+                return StorageBackend.aendere_songs(self, geaendert, neu, geloescht)
+            vorhanden = {zeile[1] for zeile in con.execute("PRAGMA table_info(songs)")}
+            benoetigt = dict.fromkeys(col for felder in [*geaendert.values(), *neu] for col in felder)
+            for col in benoetigt:
+                if col not in vorhanden:
+                    con.execute(f'ALTER TABLE songs ADD COLUMN "{col}"')
+            for alt, felder in geaendert.items():
+                zuweisungen = ", ".join(f'"{col}" = ?' for col in felder)
+                con.execute(f"UPDATE songs SET {zuweisungen} WHERE Songtitel = ?",
+                            [*map(_sql_wert, felder.values()), alt])
+            con.executemany("DELETE FROM songs WHERE Songtitel = ?", [(t,) for t in geloescht])
+            for zeile in neu:
+                spalten = ", ".join(f'"{col}"' for col in zeile)
+                con.execute(f"INSERT INTO songs ({spalten}) VALUES ({', '.join('?' * len(zeile))})",
+                            [_sql_wert(w) for w in zeile.values()])
+
+    def lade_history(self):
+        if not os.path.exists(self.pfad):
+            return None
+        with self._verbindung() as con:
+            if not self._tabelle_existiert(con, "history"):
+                return None
+            df = pd.read_sql("SELECT Songtitel, Gespielt_am FROM history ORDER BY rowid", con)
+        return _parse_history_daten(df)
+
+    def speichere_history(self, df):
+        with self._verbindung() as con:
+            self._schreibe_history(con, df, if_exists='replace')
+            con.execute("CREATE INDEX IF NOT EXISTS idx_history_datum ON history (Gespielt_am)")
+
+    def haenge_history_an(self, df):
+        with self._verbindung() as con:
+            self._schreibe_history(con, df, if_exists='append')
+
+    def anzahl_history(self):
+        if not os.path.exists(self.pfad):
+            return 0
+        with self._verbindung() as con:
+            if not self._tabelle_existiert(con, "history"):
+                return 0
+            return con.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def lade_history_events(self):
+        if not os.path.exists(self.pfad):
+            return None
+        with self._verbindung() as con:
+            if not self._tabelle_existiert(con, "history_events"):
+                return None
+            df = pd.read_sql("SELECT * FROM history_events ORDER BY Event_ID", con)
+        return _parse_event_daten(df)
+
+    def haenge_history_events_an(self, df):
+        df = df[EVENT_SPALTEN].copy()
+        df['Gespielt_am'] = pd.to_datetime(df['Gespielt_am'], errors='coerce')
+        with self._verbindung() as con:
+            df.to_sql("history_events", con, if_exists='append', index=False)
+
+    def speichere_history_events(self, df):
+        df = df[EVENT_SPALTEN].copy()
+        df['Gespielt_am'] = pd.to_datetime(df['Gespielt_am'], errors='coerce')
+        with self._verbindung() as con:
+            # Leeren statt ersetzen: die Spaltentypen bleiben, auch bei leerem ``df``
+            if self._tabelle_existiert(con, "history_events"):
+                con.execute("DELETE FROM history_events")
+            if len(df):
+                df.to_sql("history_events", con, if_exists='append', index=False)
+
+    def leere_history_events(self, bis_event_id):
+        with self._verbindung() as con:
+            self._leere_events(con, bis_event_id)
+
+    def ersetze_history(self, df, bis_event_id):
+        # Verdichtete History und Bereinigung des Protokolls in einer Transaktion
+        with self._verbindung() as con:
+            self._schreibe_history(con, df, if_exists='replace')
+            con.execute("CREATE INDEX IF NOT EXISTS idx_history_datum ON history (Gespielt_am)")
+            self._leere_events(con, bis_event_id)
+
+    def _leere_events(self, con, bis_event_id):
+        if self._tabelle_existiert(con, "history_events"):
+            con.execute("DELETE FROM history_events WHERE Event_ID <= ?", (int(bis_event_id),))
+
+    @staticmethod
+    def _schreibe_history(con, df, if_exists):
+        df = df[HISTORY_SPALTEN].copy()
+        df['Gespielt_am'] = pd.to_datetime(df['Gespielt_am'], errors='coerce')
+        df.to_sql("history", con, if_exists=if_exists, index=False)
+
+
+def _sql_wert(wert):
+    """Einzelwert so, wie ``DataFrame.to_sql`` ihn ablegen würde"""
+    if wert is None or (not isinstance(wert, str) and pd.isna(wert)):
+        return None
+    if isinstance(wert, pd.Timestamp):
+        return str(wert.to_pydatetime())
+    if hasattr(wert, 'item'):
+        # numpy-Skalare
+        return wert.item()
+    return wert
+
+
+class ColumnarBackend(StorageBackend):
+    """Songliste und History als Parquet- oder Feather-Dateien.
+
+    Spaltenformate lassen sich nicht anhängen; ``haenge_history_an`` schreibt
+    die History daher neu. Das Laden liest dafür typisierte Spalten direkt ein.
+    """
+
+    def __init__(self, format="parquet", verzeichnis=None):
+        if format not in ("parquet", "feather"):
+            raise ValueError(f"Unbekanntes Spaltenformat: {format}")
+        self.name = format
+        self.format = format
+        self.verzeichnis = verzeichnis or mandant.pfad(APP_CONFIG["storage"]["columnar_dir"])
+        self.songs_datei = os.path.join(self.verzeichnis, f"songliste.{format}")
+        self.history_datei = os.path.join(self.verzeichnis, f"spielhistorie.{format}")
+        # Parquet und Feather teilen sich das Verzeichnis, nicht aber das Protokoll
+        self.events_datei = os.path.join(self.verzeichnis, f"spielhistorie_events_{format}.csv")
+
+    def existiert(self):
+        return os.path.exists(self.songs_datei)
+
+    def dateien(self):
+        return [self.songs_datei, self.history_datei, self.events_datei]
+
+    def _dateien_fuer(self, tabelle):
+        return [self.songs_datei] if tabelle == "songs" else [self.history_datei, self.events_datei]
+
+    def _lese(self, pfad):
+        if not os.path.exists(pfad):
+            return None
+        if self.format == "parquet":
+            return pd.read_parquet(pfad)
+        return pd.read_feather(pfad)
+
+    def _schreibe(self, df, pfad):
+        os.makedirs(self.verzeichnis, exist_ok=True)
+        df = df.reset_index(drop=True)
+        if self.format == "parquet":
+            atomar_schreiben(pfad, lambda tmp: df.to_parquet(tmp, index=False))
+        else:
+            atomar_schreiben(pfad, lambda tmp: df.to_feather(tmp))
+
+    def lade_songs(self):
+        return self._lese(self.songs_datei)
+
+    def speichere_songs(self, df):
+        df = df.copy()
+        if 'Zuletzt_gespielt' in df:
+            df['Zuletzt_gespielt'] = pd.to_datetime(df['Zuletzt_gespielt'], errors='coerce')
+        # Gemischte Objektspalten (z.B. leere Kommentare als NaN) als Text ablegen
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].astype(str).where(df[col].notna(), None)
+        self._schreibe(df, self.songs_datei)
+
+    def lade_history(self):
+        return self._lese(self.history_datei)
+
+    def speichere_history(self, df):
+        df = df[HISTORY_SPALTEN].copy()
+        df['Gespielt_am'] = pd.to_datetime(df['Gespielt_am'], errors='coerce')
+        self._schreibe(df, self.history_datei)
+
+    def haenge_history_an(self, df):
+        bisher = self.lade_history()
+        if bisher is not None:
+            df = pd.concat([bisher, df[HISTORY_SPALTEN]], ignore_index=True)
+        self.speichere_history(df)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def erstelle_backend(name):
+    """Erzeugt ein Backend anhand seines Namens aus der Konfiguration (für die aktive Band)"""
+    if name == "csv":
+        return CSVBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name in ("parquet", "feather"):
+        return ColumnarBackend(format=name)
+    raise ValueError(f"Unbekanntes Speicher-Backend: {name}")
+
+
+def get_backend():
+    """Liefert das konfigurierte Backend der aktiven Band und migriert beim ersten Zugriff die CSV-Dateien"""
+    schluessel = (mandant.aktiv(), APP_CONFIG["storage"]["backend"])
+    with _backends_lock:
+        if schluessel not in _backends:
+            backend = erstelle_backend(schluessel[1])
+            if backend.name != "csv" and not backend.existiert():
+                migriere_csv(backend)
+            _backends[schluessel] = backend
+        return _backends[schluessel]
+
+
+def entlade(band):
+    """Vergisst die Backends einer Band samt eingelesener Daten; sie werden bei Bedarf neu angelegt"""
+    with _backends_lock:
+        for schluessel in [k for k in _backends if k[0] == band]:
+            del _backends[schluessel]
+
+
+def migriere_csv(ziel, quelle=None):
+    """Übernimmt Songliste und History einmalig aus den CSV-Dateien in ein anderes Backend"""
+    quelle = quelle or CSVBackend()
+    songs = quelle.lade_songs()
+    if songs is None:
+        return False
+    ziel.speichere_songs(songs)
+    history = quelle.lade_history()
+    if history is None:
+        history = pd.DataFrame(columns=HISTORY_SPALTEN)
+    ziel.speichere_history(history)
+    # Ein vorhandenes Protokoll des Ziels gehört zu dessen alter History und wird ersetzt
+    events = quelle.lade_history_events()
+    if events is None:
+        events = pd.DataFrame(columns=EVENT_SPALTEN)
+    ziel.speichere_history_events(events)
+    return True
+
+
+def exportiere_csv(quelle, songs_datei, history_datei):
+    """Schreibt die Daten eines Backends als CSV-Dateien (z.B. für Excel)"""
+    ziel = CSVBackend(songs_datei, history_datei)
+    songs = quelle.lade_songs()
+    if songs is not None:
+        ziel.speichere_songs(songs)
+    from history_log import materialisiere
+    history = quelle.lade_history()
+    if history is not None:
+        ziel.speichere_history(materialisiere(history, quelle.lade_history_events()))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Migriert die CSV-Dateien in ein anderes Speicher-Backend")
+    parser.add_argument("backend", choices=["sqlite", "parquet", "feather"])
+    parser.add_argument("--force", action="store_true", help="Vorhandene Zieldaten überschreiben")
+    args = parser.parse_args()
+    ziel = erstelle_backend(args.backend)
+    if ziel.existiert() and not args.force:
+        parser.exit(1, f"{args.backend}: Zieldaten existieren bereits (--force zum Überschreiben)\n")
+    if migriere_csv(ziel):
+        print(f"CSV-Daten nach {args.backend} migriert: {', '.join(ziel.dateien())}")
+    else:
+        parser.exit(1, "Keine CSV-Songliste gefunden\n")
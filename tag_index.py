@@ -0,0 +1,66 @@
+"""Invertierter Index über die kommagetrennte Tags-Spalte der Songliste.
+
+Jeder Tag zeigt auf ein Bitset (``np.packbits``) der Zeilenpositionen, in
+denen er vorkommt. UND-, ODER- und NICHT-Abfragen sind damit bitweise
+Operationen über n/8 Bytes statt einer zeilenweisen Zerlegung der Texte.
+Der Index wird einmal je Datenversion gebaut und danach nur gelesen.
+"""
+import numpy as np
+import pandas as pd
+
+
+class TagIndex:
+    """Tag -> Bitset der Zeilenpositionen einer Songliste"""
+
+    def __init__(self, tags):
+        self.anzahl = len(tags)
+        einzeln = tags.reset_index(drop=True).astype('string').str.split(',').explode().str.strip()
+        einzeln = einzeln[einzeln.notna() & (einzeln != '')]
+        codes, namen = pd.factorize(einzeln, sort=True)
+        # Positionen nach Tag gruppieren, damit jeder Tag ein zusammenhängender Abschnitt ist
+        ordnung = np.argsort(codes, kind='stable')
+        positionen = einzeln.index.to_numpy()[ordnung]
+        grenzen = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(namen)))])
+        self._bits = {}
+        self._haeufigkeit = {}
+        for code, name in enumerate(namen):
+            maske = np.zeros(self.anzahl, dtype=bool)
+            maske[positionen[grenzen[code]:grenzen[code + 1]]] = True
+            self._bits[str(name)] = np.packbits(maske)
+            self._haeufigkeit[str(name)] = int(maske.sum())
+
+    @property
+    def tags(self):
+        """Alle vorkommenden Tags, alphabetisch sortiert"""
+        return list(self._bits)
+
+    def _leer(self, wert):
+        return np.full((self.anzahl + 7) // 8, 0xFF if wert else 0, dtype=np.uint8)
+
+    def _bitset(self, tag):
+        bits = self._bits.get(tag)
+        return bits if bits is not None else self._leer(False)
+
+    def maske(self, alle=(), irgendein=(), keins=()):
+        """Boolesche Maske der Zeilen, die die Abfrage erfüllen.
+
+        ``alle``: jeder dieser Tags muss vorkommen (UND),
+        ``irgendein``: mindestens einer muss vorkommen (ODER),
+        ``keins``: keiner darf vorkommen (NICHT).
+        Leere Bedingungen schränken nicht ein.
+        """
+        ergebnis = self._leer(True)
+        for tag in alle:
+            ergebnis &= self._bitset(tag)
+        if irgendein:
+            oder = self._leer(False)
+            for tag in irgendein:
+                oder |= self._bitset(tag)
+            ergebnis &= oder
+        for tag in keins:
+            ergebnis &= ~self._bitset(tag)
+        return np.unpackbits(ergebnis, count=self.anzahl).astype(bool)
+
+    def anzahl_je_tag(self):
+        """Wie viele Songs jeden Tag tragen"""
+        return dict(self._haeufigkeit)
@@ -0,0 +1,41 @@
+"""Gemeinsame Einstellungen der Tests.
+
+Die Module liegen flach im Projektverzeichnis und beziehen ihre Dateipfade
+auf das Arbeitsverzeichnis; jeder Test, der Dateien braucht, läuft deshalb
+in einem eigenen leeren Verzeichnis (``arbeitsverzeichnis``); ``datenstand``
+legt dort eine kleine Songliste mit History an.
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+
+@pytest.fixture
+def arbeitsverzeichnis(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def datenstand(arbeitsverzeichnis):
+    import backup_store
+    import storage
+    from data_manager import DataManager
+
+    pd.DataFrame({'Songtitel': ["Everlong", "Walk"], 'Zuletzt_gespielt': ["2025-05-12", "2025-05-08"],
+                  'Anzahl_gespielt': [1, 1], 'Reifegrad': [5, 5]}).to_csv("songliste.csv", sep=';', index=False)
+    pd.DataFrame({'Songtitel': ["Everlong", "Walk"], 'Gespielt_am': ["2025-05-12", "2025-05-08"]}
+                 ).to_csv("spielhistorie.csv", sep=';', index=False)
+
+    def vergessen():
+        DataManager.warte_auf_schreibvorgaenge(timeout=10)
+        DataManager._vergiss(".")
+        storage._backends.clear()
+        backup_store._stores.clear()
+    vergessen()
+    yield arbeitsverzeichnis
+    vergessen()
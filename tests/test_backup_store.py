@@ -0,0 +1,108 @@
+import os
+
+import backup_store
+import storage
+from backup_store import BackupStore
+from data_manager import DataManager
+
+
+def _schreibe(pfad, inhalt):
+    with open(pfad, 'wb') as f:
+        f.write(inhalt)
+
+
+def _lese(pfad):
+    with open(pfad, 'rb') as f:
+        return f.read()
+
+
+def test_wiederherstellen_schreibt_den_gesicherten_stand(arbeitsverzeichnis):
+    store = BackupStore("backups")
+    _schreibe("a.csv", b"alt\n" * 1000)
+    snapshot_id = store.sichere(["a.csv"])
+    _schreibe("a.csv", b"neu\n")
+    assert store.stelle_wieder_her(snapshot_id) == ["a.csv"]
+    assert _lese("a.csv") == b"alt\n" * 1000
+
+
+def test_unveraenderte_dateien_ergeben_keinen_neuen_snapshot(arbeitsverzeichnis):
+    store = BackupStore("backups")
+    _schreibe("a.csv", b"x")
+    assert store.sichere(["a.csv"]) == store.sichere(["a.csv"])
+    assert len(store.snapshots()) == 1
+
+
+def test_dateien_ohne_snapshot_werden_entfernt(arbeitsverzeichnis):
+    store = BackupStore("backups")
+    _schreibe("history.csv", b"basis\n")
+    snapshot_id = store.sichere(["history.csv", "events.csv"])
+    _schreibe("events.csv", b"neueres Ereignis\n")
+    store.stelle_wieder_her(snapshot_id, dateien=["history.csv", "events.csv"])
+    assert not os.path.exists("events.csv")
+    assert _lese("history.csv") == b"basis\n"
+
+
+def test_wiederherstellen_in_anderes_verzeichnis_laesst_originale_stehen(arbeitsverzeichnis):
+    store = BackupStore("backups")
+    _schreibe("history.csv", b"basis\n")
+    snapshot_id = store.sichere(["history.csv"])
+    _schreibe("events.csv", b"neueres Ereignis\n")
+    assert store.stelle_wieder_her(snapshot_id, "ziel", ["history.csv", "events.csv"]) == [
+        os.path.join("ziel", "history.csv")]
+    assert os.path.exists("events.csv")
+
+
+def _objekte(store):
+    return {name for _, _, namen in os.walk(store.objekte) for name in namen}
+
+
+def _benutzt(store):
+    return {hash_ for snapshot_id in store.snapshots()
+            for eintrag in store.lade_snapshot(snapshot_id)["dateien"].values() for hash_ in eintrag["bloecke"]}
+
+
+def test_aufbewahrung_liest_nur_geloeschte_snapshots(arbeitsverzeichnis):
+    store = BackupStore("backups")
+    gelesen = []
+    lade_snapshot = store.lade_snapshot
+    store.lade_snapshot = lambda snapshot_id: gelesen.append(snapshot_id) or lade_snapshot(snapshot_id)
+    for i in range(6):
+        _schreibe("a.csv", f"stand {i}\n".encode())
+        _schreibe("b.csv", b"gleich\n")
+        store.sichere(["a.csv", "b.csv"])
+        gelesen.clear()
+        geloescht = store.wende_aufbewahrung_an(letzte=2, stuendlich=0, taeglich=0, woechentlich=0)
+        assert gelesen == geloescht
+        assert len(store.snapshots()) == min(i + 1, 2)
+        assert _objekte(store) == _benutzt(store)
+
+
+def test_referenzen_werden_aus_vorhandenen_snapshots_aufgebaut(arbeitsverzeichnis):
+    store = BackupStore("backups")
+    _schreibe("a.csv", b"alt\n")
+    store.sichere(["a.csv"])
+    _schreibe("a.csv", b"neu\n")
+    store.sichere(["a.csv"])
+    # Stand vor der Referenzzählung, mit einem verwaisten Objekt
+    os.remove(store.referenz_datei)
+    store._schreibe_objekt(b"verwaist")
+    store.wende_aufbewahrung_an(letzte=1, stuendlich=0, taeglich=0, woechentlich=0)
+    assert _objekte(store) == _benutzt(store)
+    assert store.stelle_wieder_her(store.snapshots()[-1]) == ["a.csv"]
+    assert _lese("a.csv") == b"neu\n"
+
+
+def test_datamanager_stellt_history_ohne_spaetere_ereignisse_wieder_her(datenstand):
+    assert len(DataManager.history()) == 2
+    snapshot_id = backup_store.get_backup_store().sichere(storage.get_backend().dateien())
+    DataManager.aktualisiere_history(["Everlong", "Walk"], "2025-06-01")
+    DataManager.warte_auf_schreibvorgaenge(timeout=10)
+    assert len(DataManager.history()) == 4
+
+    DataManager.stelle_backup_wieder_her(snapshot_id).result(timeout=10)
+    assert len(DataManager.history()) == 2
+    # Neue Ereignisse setzen auf dem wiederhergestellten Stand auf
+    DataManager.aktualisiere_history(["Walk"], "2025-06-08")
+    DataManager.warte_auf_schreibvorgaenge(timeout=10)
+    assert len(DataManager.history()) == 3
+    assert DataManager.hole_fehler() == []
@@ -0,0 +1,105 @@
+import os
+
+import pandas as pd
+
+from storage import CSVTailReader, csv_anhaengen
+
+
+def _haenge_an(pfad, text):
+    with open(pfad, 'a', encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_liest_nur_angehaengte_zeilen(arbeitsverzeichnis):
+    _haenge_an("h.csv", "Songtitel;Gespielt_am\nWalk;2025-05-08\n")
+    leser = CSVTailReader("h.csv")
+    assert list(leser.lade()['Songtitel']) == ["Walk"]
+    offset = leser._offset
+    _haenge_an("h.csv", "Everlong;2025-05-12\nMy Hero;2025-05-12\n")
+    df = leser.lade()
+    assert leser._offset > offset
+    pd.testing.assert_frame_equal(df, pd.read_csv("h.csv", sep=';'))
+
+
+def test_halbe_zeile_wartet_auf_ihr_ende(arbeitsverzeichnis):
+    _haenge_an("h.csv", "Songtitel;Gespielt_am\nWalk;2025-05-08\n")
+    leser = CSVTailReader("h.csv")
+    leser.lade()
+    _haenge_an("h.csv", "Everl")
+    assert list(leser.lade()['Songtitel']) == ["Walk"]
+    _haenge_an("h.csv", "ong;2025-05-12\n")
+    assert list(leser.lade()['Songtitel']) == ["Walk", "Everlong"]
+
+
+def test_letzte_zeile_ohne_umbruch(arbeitsverzeichnis):
+    _haenge_an("h.csv", "Songtitel;Gespielt_am\nWalk;2025-05-08\nEverlong;2025-05-12")
+    leser = CSVTailReader("h.csv")
+    assert list(leser.lade()['Songtitel']) == ["Walk", "Everlong"]
+    assert list(leser.lade()['Songtitel']) == ["Walk", "Everlong"]
+
+
+def test_zeile_ohne_umbruch_kommt_sobald_die_datei_steht(arbeitsverzeichnis):
+    _haenge_an("h.csv", "Songtitel;Gespielt_am\nWalk;2025-05-08\n")
+    leser = CSVTailReader("h.csv")
+    leser.lade()
+    _haenge_an("h.csv", "Everlong;2025-05-12")
+    assert list(leser.lade()['Songtitel']) == ["Walk"]
+    assert list(leser.lade()['Songtitel']) == ["Walk", "Everlong"]
+    # Wächst die Datei weiter, wird die Zeile mit den neuen Daten neu gelesen
+    _haenge_an("h.csv", "\nMy Hero;2025-05-19\n")
+    df = leser.lade()
+    assert list(df['Songtitel']) == ["Walk", "Everlong", "My Hero"]
+    pd.testing.assert_frame_equal(df, pd.read_csv("h.csv", sep=';'))
+
+
+def test_anhaengen_ergaenzt_fehlenden_umbruch(arbeitsverzeichnis):
+    _haenge_an("h.csv", "Songtitel;Gespielt_am\nWalk;2025-05-08")
+    leser = CSVTailReader("h.csv")
+    leser.lade()
+    csv_anhaengen("h.csv", pd.DataFrame({'Songtitel': ["Everlong"], 'Gespielt_am': ["2025-05-12"]}))
+    assert list(leser.lade()['Songtitel']) == ["Walk", "Everlong"]
+    assert list(pd.read_csv("h.csv", sep=';')['Songtitel']) == ["Walk", "Everlong"]
+
+
+def test_neu_geschriebene_datei_wird_komplett_gelesen(arbeitsverzeichnis):
+    _haenge_an("h.csv", "Songtitel;Gespielt_am\nWalk;2025-05-08\nEverlong;2025-05-12\n")
+    leser = CSVTailReader("h.csv")
+    leser.lade()
+    # Gleich lang wie vorher, aber anderer Inhalt: der Fingerabdruck passt nicht mehr
+    with open("neu.csv", 'w', encoding='utf-8') as f:
+        f.write("Songtitel;Gespielt_am\nDOA;2025-05-08\nMy Hero;2025-05-12\nRun;2025-05-19\n")
+    os.replace("neu.csv", "h.csv")
+    assert list(leser.lade()['Songtitel']) == ["DOA", "My Hero", "Run"]
+
+
+def test_gekuerzte_datei_wird_komplett_gelesen(arbeitsverzeichnis):
+    _haenge_an("h.csv", "Songtitel;Gespielt_am\nWalk;2025-05-08\nEverlong;2025-05-12\n")
+    leser = CSVTailReader("h.csv")
+    leser.lade()
+    with open("h.csv", 'w', encoding='utf-8') as f:
+        f.write("Songtitel;Gespielt_am\nRun;2025-05-19\n")
+    assert list(leser.lade()['Songtitel']) == ["Run"]
+
+
+def test_fehlende_datei(arbeitsverzeichnis):
+    leser = CSVTailReader("h.csv")
+    assert leser.lade() is None
+    _haenge_an("h.csv", "Songtitel;Gespielt_am\nWalk;2025-05-08\n")
+    assert len(leser.lade()) == 1
+    os.remove("h.csv")
+    assert leser.lade() is None
+
+
+def test_konverter_nur_fuer_neue_zeilen(arbeitsverzeichnis):
+    aufrufe = []
+
+    def konverter(df):
+        aufrufe.append(len(df))
+        return df
+    _haenge_an("h.csv", "Songtitel;Gespielt_am\nWalk;2025-05-08\nDOA;2025-05-08\n")
+    leser = CSVTailReader("h.csv", konverter=konverter)
+    leser.lade()
+    _haenge_an("h.csv", "Run;2025-05-19\n")
+    leser.lade()
+    leser.lade()
+    assert aufrufe == [2, 1]
@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+
+import pandas as pd
+
+import mandant
+from data_manager import DataManager
+from datensatz_cache import get_datensatz_cache
+
+
+def test_history_eintrag_waehrend_die_songliste_kalt_laedt(datenstand):
+    # Hält den Schreib-Thread an, bis der Leser seinen Ladevorgang begonnen hat
+    tor = threading.Event()
+    DataManager._einreihen(lambda: tor.wait(10))
+    stand = DataManager._songs_stand()
+    DataManager.aktualisiere_history(["Walk"], "2025-06-01")
+    leser = threading.Thread(target=DataManager.songliste, args=(stand,), daemon=True)
+    leser.start()
+    ladesperren = get_datensatz_cache()._ladesperren
+    frist = time.monotonic() + 5
+    while (stand[0], "songs", stand) not in ladesperren and time.monotonic() < frist:
+        time.sleep(0.01)
+    tor.set()
+
+    assert DataManager.warte_auf_schreibvorgaenge(timeout=5)
+    leser.join(timeout=5)
+    assert not leser.is_alive()
+    songs = DataManager.songliste().set_index('Songtitel')
+    assert songs.loc["Walk", 'Anzahl_gespielt'] == 2
+    assert DataManager.hole_fehler() == []
+
+
+def test_tag_index_je_band_ohne_verdraengen(arbeitsverzeichnis):
+    bands = ["a", "b", "c", "d"]
+    for i, band in enumerate(bands):
+        os.mkdir(band)
+        pd.DataFrame({'Songtitel': ["Everlong", "Walk"], 'Tags': [f"rock,band{i}", "ballad"]}
+                     ).to_csv(os.path.join(band, "songliste.csv"), sep=';', index=False)
+    try:
+        indizes = {}
+        for band in bands:
+            with mandant.verwende(band):
+                indizes[band] = DataManager.tag_index(DataManager.songliste())
+        for i, band in enumerate(bands):
+            with mandant.verwende(band):
+                assert DataManager.tag_index(DataManager.songliste()) is indizes[band]
+                assert indizes[band].tags == ["ballad", f"band{i}", "rock"]
+    finally:
+        DataManager.warte_auf_schreibvorgaenge(timeout=10)
+        for band in bands:
+            DataManager._vergiss(band)
@@ -0,0 +1,84 @@
+import random
+
+import pandas as pd
+import pytest
+
+from history_log import HistoryLog, materialisiere
+from storage import CSVBackend
+
+
+@pytest.fixture
+def backend(arbeitsverzeichnis):
+    pd.DataFrame({'Songtitel': ["Everlong", "Walk", "My Hero", "Walk"],
+                  'Gespielt_am': ["2025-05-12", "2025-05-08", "2025-05-12", "2025-05-01"]}
+                 ).to_csv("spielhistorie.csv", sep=';', index=False)
+    return CSVBackend("songliste.csv", "spielhistorie.csv")
+
+
+def _inhalt(df):
+    return sorted(zip(df['Songtitel'], df['Gespielt_am'].dt.strftime('%Y-%m-%d')))
+
+
+def _neu_gelesen(backend):
+    return materialisiere(backend.lade_history(), backend.lade_history_events())
+
+
+def test_ohne_protokoll_nach_datum_und_titel_sortiert(backend):
+    df = HistoryLog(backend).lade()
+    assert list(df['Songtitel']) == ["Walk", "Walk", "Everlong", "My Hero"]
+    assert df['Gespielt_am'].is_monotonic_increasing
+
+
+def test_reihenfolge_unabhaengig_von_der_kompaktierung(backend):
+    log = HistoryLog(backend)
+    log.hinzufuegen(["Best Of You", "Arlandria"], "2025-05-08")
+    mit_protokoll = log.lade()
+    log.kompaktiere()
+    assert backend.lade_history_events() is None or backend.lade_history_events().empty
+    pd.testing.assert_frame_equal(HistoryLog(backend).lade(), mit_protokoll)
+
+
+def test_nachspielen_nach_kompaktierung(backend):
+    log = HistoryLog(backend)
+    entfernt = log.entfernen(["Walk"], "2025-05-08")
+    log.hinzufuegen(["Walk", "Walk"], "2025-05-12")
+    log.kompaktiere()
+    entfernt_danach = log.entfernen(["Everlong"], "2025-05-12")
+    # Das Entfernen vor der Kompaktierung ist verdichtet: es kommt genau ein Eintrag zurück
+    log.wiederherstellen(entfernt[0], "Walk", "2025-05-08")
+    log.wiederherstellen(entfernt_danach[0], "Everlong", "2025-05-12")
+    erwartet = [("Everlong", "2025-05-12"), ("My Hero", "2025-05-12"), ("Walk", "2025-05-01"),
+                ("Walk", "2025-05-08"), ("Walk", "2025-05-12"), ("Walk", "2025-05-12")]
+    assert _inhalt(log.lade()) == erwartet
+    assert _inhalt(HistoryLog(backend).lade()) == erwartet
+
+
+def test_wiederherstellen_holt_alle_entfernten_eintraege_zurueck(backend):
+    log = HistoryLog(backend)
+    log.hinzufuegen(["Everlong"], "2025-05-12")
+    event_id = log.entfernen(["Everlong"], "2025-05-12")[0]
+    assert ("Everlong", "2025-05-12") not in _inhalt(log.lade())
+    log.wiederherstellen(event_id, "Everlong", "2025-05-12")
+    log.wiederherstellen(event_id, "Everlong", "2025-05-12")
+    assert _inhalt(log.lade()).count(("Everlong", "2025-05-12")) == 2
+
+
+def test_fortgeschriebene_sicht_gleich_vollstaendiger_neuberechnung(backend):
+    log = HistoryLog(backend)
+    songs = ["Everlong", "Walk", "My Hero", "Arlandria"]
+    tage = ["2025-05-01", "2025-05-08", "2025-05-12", "2025-06-01"]
+    zufall = random.Random(7)
+    entfernt = []
+    for schritt in range(60):
+        log.lade()
+        wurf = zufall.random()
+        if wurf < 0.5:
+            log.hinzufuegen(zufall.sample(songs, 2), zufall.choice(tage))
+        elif wurf < 0.8:
+            song, tag = zufall.choice(songs), zufall.choice(tage)
+            entfernt.append((log.entfernen([song], tag)[0], song, tag))
+        elif entfernt:
+            log.wiederherstellen(*zufall.choice(entfernt))
+        if schritt % 20 == 19:
+            log.kompaktiere()
+        pd.testing.assert_frame_equal(log.lade(), _neu_gelesen(backend))
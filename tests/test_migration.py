@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from history_log import HistoryLog, materialisiere
+from storage import CSVBackend, ColumnarBackend, SQLiteBackend, migriere_csv
+
+
+@pytest.fixture
+def quelle(arbeitsverzeichnis):
+    pd.DataFrame({'Songtitel': ["Everlong", "Walk", "My Hero"], 'Zuletzt_gespielt': ["2025-05-12"] * 3,
+                  'Anzahl_gespielt': [1, 2, 1]}).to_csv("songliste.csv", sep=';', index=False)
+    pd.DataFrame({'Songtitel': ["Everlong", "Walk", "My Hero", "Walk"],
+                  'Gespielt_am': ["2025-05-12", "2025-05-08", "2025-05-12", "2025-05-01"]}
+                 ).to_csv("spielhistorie.csv", sep=';', index=False)
+    backend = CSVBackend("songliste.csv", "spielhistorie.csv")
+    log = HistoryLog(backend)
+    log.hinzufuegen(["Walk", "Best Of You"], "2025-05-19")
+    log.entfernen(["My Hero"], "2025-05-12")
+    return backend
+
+
+def _anzahl_je_song(backend):
+    return materialisiere(backend.lade_history(), backend.lade_history_events())['Songtitel'].value_counts().to_dict()
+
+
+def test_erneute_migration_aendert_die_history_nicht(quelle):
+    erwartet = _anzahl_je_song(quelle)
+    assert erwartet == {"Walk": 3, "Everlong": 1, "Best Of You": 1}
+    for ziel in (ColumnarBackend("parquet", "daten"), SQLiteBackend("songpicker.db")):
+        for _ in range(2):
+            assert migriere_csv(ziel, quelle)
+            assert _anzahl_je_song(ziel) == erwartet
+
+
+def test_parquet_und_feather_im_selben_verzeichnis(quelle):
+    erwartet = _anzahl_je_song(quelle)
+    parquet, feather = ColumnarBackend("parquet", "daten"), ColumnarBackend("feather", "daten")
+    migriere_csv(parquet, quelle)
+    HistoryLog(parquet).hinzufuegen(["Everlong"], "2025-05-26")
+    migriere_csv(feather, quelle)
+    assert _anzahl_je_song(feather) == erwartet
+    assert _anzahl_je_song(parquet) == {**erwartet, "Everlong": 2}
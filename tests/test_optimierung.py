@@ -0,0 +1,72 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from optimierung import optimiere_setlist
+
+
+def _instanz(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(4, 11))
+    gewichte = np.round(rng.uniform(0, 10, n), 2) * (rng.random(n) > 0.1)
+    dauer = rng.integers(2, 9, n).astype(float)
+    pflicht = rng.random(n) < 0.15
+    gesperrt = rng.random(n) < 0.2
+    tag = rng.random(n) < 0.5
+    return dict(gewichte=gewichte, anzahl=int(rng.integers(1, n + 1)), dauer=dauer,
+                dauer_max=float(rng.integers(8, 30)), pflicht=pflicht, gesperrt=gesperrt,
+                tag_grenzen=[(tag, int(rng.integers(1, 3)))])
+
+
+def _zulaessig(auswahl, v):
+    auswahl = np.asarray(auswahl, dtype=int)
+    drin = np.zeros(len(v["gewichte"]), dtype=bool)
+    drin[auswahl] = True
+    erlaubt = ~v["gesperrt"] | v["pflicht"]
+    return (len(auswahl) <= v["anzahl"] and v["dauer"][auswahl].sum() <= v["dauer_max"] + 1e-9
+            and drin[v["pflicht"]].all() and erlaubt[auswahl].all()
+            and all(drin[maske].sum() <= grenze for maske, grenze in v["tag_grenzen"]))
+
+
+def _brute_force(v):
+    """Bester Wert über alle Teilmengen, None wenn keine zulässig ist"""
+    n = len(v["gewichte"])
+    werte = [v["gewichte"][list(auswahl)].sum()
+             for k in range(n + 1) for auswahl in itertools.combinations(range(n), k)
+             if _zulaessig(auswahl, v)]
+    return max(werte) if werte else None
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_exakt_wie_brute_force(seed):
+    v = _instanz(seed)
+    bester = _brute_force(v)
+    if bester is None:
+        with pytest.raises(ValueError):
+            optimiere_setlist(**v, zeitbudget=5, vergleich=0, seed=seed)
+        return
+    ergebnis = optimiere_setlist(**v, zeitbudget=5, vergleich=0, seed=seed)
+    assert ergebnis["optimal"]
+    assert _zulaessig(ergebnis["positionen"], v)
+    assert ergebnis["wert"] == pytest.approx(bester)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_heuristik_zulaessig_und_schranke_gueltig(seed):
+    v = _instanz(seed)
+    bester = _brute_force(v)
+    if bester is None:
+        return
+    ergebnis = optimiere_setlist(**v, zeitbudget=0.02, exakt_bis=0, vergleich=0, seed=seed)
+    assert _zulaessig(ergebnis["positionen"], v)
+    assert ergebnis["wert"] <= bester + 1e-9
+    assert ergebnis["obere_schranke"] >= bester - 1e-9
+
+
+def test_vergleich_mit_zufallsziehungen():
+    v = _instanz(3)
+    ergebnis = optimiere_setlist(**v, zeitbudget=1, vergleich=200, seed=1)
+    zufall = ergebnis["zufall"]
+    assert zufall["ziehungen"] == 200
+    assert zufall["bester"] is None or zufall["bester"] <= ergebnis["wert"] + 1e-9
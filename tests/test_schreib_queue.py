@@ -0,0 +1,70 @@
+import threading
+
+from schreib_queue import SchreibQueue
+
+
+def _blockierte_queue():
+    """Queue, deren Schreib-Thread im ersten Auftrag wartet, bis ``frei`` gesetzt wird"""
+    queue, frei, laeuft = SchreibQueue(), threading.Event(), threading.Event()
+
+    def blockieren():
+        laeuft.set()
+        frei.wait(5)
+    queue.einreihen(blockieren, "songs")
+    assert laeuft.wait(5)
+    return queue, frei
+
+
+def test_auftraege_laufen_in_reihenfolge():
+    queue, frei = _blockierte_queue()
+    ergebnis = []
+    for i in range(5):
+        queue.einreihen(lambda i=i: ergebnis.append(i), "songs")
+    frei.set()
+    assert queue.warte(timeout=5)
+    assert ergebnis == [0, 1, 2, 3, 4]
+
+
+def test_gleicher_schluessel_wird_zusammengefasst():
+    queue, frei = _blockierte_queue()
+    ergebnis = []
+    erstes = queue.einreihen(lambda: ergebnis.append("df1") or "df1", "songs", schluessel="songs")
+    zweites = queue.einreihen(lambda: ergebnis.append("df2") or "df2", "songs", schluessel="songs")
+    assert erstes is zweites
+    frei.set()
+    assert zweites.result(timeout=5) == "df2"
+    assert ergebnis == ["df2"]
+
+
+def test_zusammengefasster_auftrag_laeuft_nach_dazwischen_eingereihten():
+    # speichere(df1), aendere(delta), speichere(df2): am Ende steht df2 ohne das Delta darauf
+    queue, frei = _blockierte_queue()
+    datei = []
+    queue.einreihen(lambda: datei.__setitem__(slice(None), ["df1"]), "songs", schluessel="songs")
+    queue.einreihen(lambda: datei.append("delta"), "songs")
+    queue.einreihen(lambda: datei.__setitem__(slice(None), ["df2"]), "songs", schluessel="songs")
+    frei.set()
+    assert queue.warte(timeout=5)
+    assert datei == ["df2"]
+
+
+def test_warte_nur_auf_die_eigene_tabelle():
+    queue, frei = _blockierte_queue()
+    queue.einreihen(lambda: None, "history")
+    assert queue.warte("songs", timeout=0) is False
+    assert queue.warte("andere", timeout=0) is True
+    frei.set()
+    assert queue.warte(timeout=5)
+
+
+def test_fehler_je_gruppe():
+    queue = SchreibQueue()
+
+    def fehlschlag():
+        raise OSError("Platte voll")
+    queue.einreihen(fehlschlag, "songs", gruppe="band_a")
+    queue.einreihen(lambda: None, "songs", gruppe="band_b")
+    assert queue.warte(timeout=5)
+    assert queue.hole_fehler("band_b") == []
+    assert queue.hole_fehler("band_a") == ["Platte voll"]
+    assert queue.hole_fehler("band_a") == []
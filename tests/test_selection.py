@@ -0,0 +1,42 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from selection import ziehe_setlists
+
+
+def _wahrscheinlichkeiten(gewichte, anzahl):
+    """Exakte Verteilung der geordneten Setlists beim schrittweisen Ziehen ohne Zurücklegen"""
+    ergebnis = {}
+    for folge in itertools.permutations(range(len(gewichte)), anzahl):
+        p, rest = 1.0, gewichte.sum()
+        for i in folge:
+            p *= gewichte[i] / rest
+            rest -= gewichte[i]
+        ergebnis[folge] = p
+    return ergebnis
+
+
+@pytest.mark.parametrize("gewichte", [
+    [1.0, 2.0, 3.0, 4.0, 5.0],
+    # Ein dominanter Song: viele Zeilen gehen ins exakte Nachziehen
+    [60.0, 1.0, 1.0, 0.5, 0.5],
+])
+def test_verteilung_wie_schrittweises_ziehen(gewichte):
+    gewichte = np.array(gewichte)
+    ziehungen = 200_000
+    setlists = ziehe_setlists(gewichte, 3, ziehungen, seed=7)
+    folgen, anzahl = np.unique(setlists, axis=0, return_counts=True)
+    beobachtet = dict(zip(map(tuple, folgen.tolist()), anzahl / ziehungen))
+    for folge, p in _wahrscheinlichkeiten(gewichte, 3).items():
+        assert abs(beobachtet.get(folge, 0.0) - p) < 5 * np.sqrt(p * (1 - p) / ziehungen) + 1e-4
+
+
+def test_keine_wiederholungen_und_pflichtsongs():
+    gewichte = np.array([100.0, 0.01, 0.01, 0.01, 0.01, 0.01, 0.0])
+    pflicht = np.array([False, False, True, False, False, False, False])
+    setlists = ziehe_setlists(gewichte, 5, 5_000, pflicht=pflicht, seed=1)
+    assert (setlists[:, 0] == 2).all()
+    assert all(len(set(zeile)) == 5 for zeile in setlists.tolist())
+    assert not (setlists == 6).any()
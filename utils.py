@@ -1,18 +1,21 @@
-import os
-import zipfile
-from datetime import datetime
-from config import APP_CONFIG
+from backup_store import get_backup_store, sichere_im_hintergrund
+from storage import get_backend
+from messung import gemessen
 
+@gemessen("backup_dateien")
 def backup_dateien():
-    """Erstellt ein ZIP-Backup der Song- und History-Dateien"""
-    os.makedirs(APP_CONFIG["files"]["backup_dir"], exist_ok=True)
-    backup_name = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-    backup_path = os.path.join(APP_CONFIG["files"]["backup_dir"], backup_name)
-    with zipfile.ZipFile(backup_path, 'w') as zipf:
-        for fname in [APP_CONFIG["files"]["songs"], APP_CONFIG["files"]["history"]]:
-            if os.path.exists(fname):
-                zipf.write(fname)
-    return backup_path
+    """Erstellt sofort einen Snapshot der Dateien des aktiven Speicher-Backends"""
+    backend = get_backend()
+    backend.vor_backup()
+    store = get_backup_store()
+    snapshot_id = store.sichere(backend.dateien())
+    store.wende_aufbewahrung_an()
+    return snapshot_id
+
+def backup_im_hintergrund():
+    """Wie backup_dateien, aber im Backup-Thread; liefert ein Future mit der Snapshot-ID"""
+    backend = get_backend()
+    return sichere_im_hintergrund(backend.dateien(), vorbereitung=backend.vor_backup)
 
 def color_for_reifegrad(grad):
     """